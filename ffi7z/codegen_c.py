@@ -8,10 +8,17 @@ Generate C source and definitions from `interfaces.py`
 
 import importlib.resources
 import sys
-from typing import TextIO
-
-from .codegen_shared import InterfaceNames, thunk_name
-from .interfaces import INTERFACES, CInterface, CMethod, CTypeDecl
+from typing import Dict, List, TextIO
+
+from .codegen_shared import InterfaceNames, NativeImplNames, iid_name, thunk_name
+from .interfaces import (
+    INTERFACES,
+    NATIVE_IMPLS,
+    CInterface,
+    CMethod,
+    CTypeDecl,
+    NativeImpl,
+)
 
 INTERFACES_BY_NAME = {interface.name: interface for interface in INTERFACES}
 
@@ -42,11 +49,18 @@ def mangle_dtype(typedecl: CTypeDecl) -> CTypeDecl:
     return CTypeDecl(tokens)
 
 
+def method_args_str(method: CMethod, this_decl: str = "void* this") -> str:
+    """
+    Get the C argument list of `method`, with `this_decl` as the first argument.
+    """
+    return ", ".join((this_decl, *(f"{mangle_dtype(dt)} {name}" for dt, name in method.arguments)))
+
+
 def append_vtable_method_cdecl(stream: TextIO, method: CMethod) -> None:
     """
     Append declaration of vtable method `method` to `stream`.
     """
-    args_str = ", ".join(("void* this", *(f"{mangle_dtype(dt)} {name}" for dt, name in method.arguments)))
+    args_str = method_args_str(method)
     stream.write(f"    {method.return_type} (WINAPI * {method.name})({args_str});\n")
 
 
@@ -89,7 +103,7 @@ def append_thunk_method_cdecl(stream: TextIO, interface: CInterface, method: CMe
     """
     Append thunk method declarations for `interface`.`method` to `stream`.
     """
-    args_str = ", ".join(("void* this", *(f"{mangle_dtype(dt)} {name}" for dt, name in method.arguments)))
+    args_str = method_args_str(method)
     stream.write(f"{method.return_type} {thunk_name(interface, method)}({args_str});\n")
 
 
@@ -138,6 +152,168 @@ def append_common_cdecls(stream: TextIO) -> None:
         append_python_impl_cdecl(stream, interface)
 
 
+def append_iid_definition(stream: TextIO, interface: CInterface) -> None:
+    """
+    Append the GUID constant for `interface` to `stream`.
+    """
+    guid = interface.guid
+    data4 = ", ".join(f"0x{byte:02X}" for byte in guid.bytes[8:])
+    stream.write(f"static const GUID {iid_name(interface)} = {{0x{guid.time_low:08X}, 0x{guid.time_mid:04X}, 0x{guid.time_hi_version:04X}, {{{data4}}}}};\n")
+
+
+def append_iid_definitions(stream: TextIO) -> None:
+    """
+    Append GUID constants for all interfaces to `stream`.
+    """
+    for interface in INTERFACES:
+        append_iid_definition(stream, interface)
+    stream.write("\n")
+
+
+def native_impl_methods(impl: NativeImpl) -> List[CMethod]:
+    """
+    Get the hand-written methods of `impl`, i.e. everything but IUnknown's.
+    """
+    methods: Dict[str, CMethod] = {}
+    for interface in impl.interfaces:
+        for method_origin, method in interface.all_methods_with_origin:
+            if method_origin.parent is not None:
+                methods.setdefault(method.name, method)
+    return list(methods.values())
+
+
+def append_native_impl_cdecl(stream: TextIO, impl: NativeImpl) -> None:
+    """
+    Append the object struct of native implementation `impl`, and prototypes
+    for its hand-written methods, to `stream`.
+    """
+    names = NativeImplNames(impl)
+    stream.write(f"typedef struct {names.impl_struct}_tag {{\n")
+    for interface in impl.interfaces:
+        stream.write(f"    const {InterfaceNames(interface).vtable_struct}* {names.vtable_field(interface)};\n")
+    stream.write("    volatile LONG refs;\n")
+    stream.write(f"    {names.state_struct} state;\n")
+    stream.write(f"}} {names.impl_struct};\n\n")
+    for method in native_impl_methods(impl):
+        args_str = method_args_str(method, f"{names.state_struct} *state")
+        stream.write(f"static {method.return_type} {names.method(method)}({args_str});\n")
+    stream.write(f"static void {names.destroy_function}({names.state_struct} *state);\n\n")
+
+
+def append_native_query_interface(stream: TextIO, impl: NativeImpl) -> None:
+    """
+    Append the QueryInterface implementation shared by all of `impl`'s interfaces to `stream`.
+    """
+    names = NativeImplNames(impl)
+    stream.write(f"static HRESULT {names.query_interface_function}({names.impl_struct} *self, const GUID *iid, void **out_object)\n")
+    stream.write("{\n")
+    claimed = set()
+    keyword = "if"
+    for interface in impl.interfaces:
+        iids = [ancestor for ancestor in interface.ancestry if ancestor.name not in claimed]
+        claimed.update(ancestor.name for ancestor in iids)
+        condition = " || ".join(f"memcmp(iid, &{iid_name(ancestor)}, sizeof(GUID)) == 0" for ancestor in iids)
+        stream.write(f"    {keyword} ({condition})\n")
+        stream.write("    {\n")
+        stream.write(f"        *out_object = &self->{names.vtable_field(interface)};\n")
+        stream.write("    }\n")
+        keyword = "else if"
+    stream.write("    else\n")
+    stream.write("    {\n")
+    stream.write("        *out_object = NULL;\n")
+    stream.write("        return E_NOINTERFACE;\n")
+    stream.write("    }\n")
+    stream.write("    InterlockedIncrement(&self->refs);\n")
+    stream.write("    return S_OK;\n")
+    stream.write("}\n\n")
+
+
+def append_native_adapter(stream: TextIO, impl: NativeImpl, interface: CInterface, method: CMethod) -> None:
+    """
+    Append the vtable entry for `method`, reached through `impl`'s `interface`, to `stream`.
+
+    The entry recovers the object from the interface pointer, then either
+    handles IUnknown itself or forwards to the hand-written method.
+    """
+    names = NativeImplNames(impl)
+    stream.write(f"static {method.return_type} WINAPI {names.adapter(interface, method)}({method_args_str(method)})\n")
+    stream.write("{\n")
+    stream.write(f"    {names.impl_struct} *self = FFI7Z_NATIVE_SELF({names.impl_struct}, {names.vtable_field(interface)}, this);\n")
+    if method.name == "QueryInterface":
+        stream.write(f"    return {names.query_interface_function}(self, iid, out_object);\n")
+    elif method.name == "AddRef":
+        stream.write("    return (uint32_t)InterlockedIncrement(&self->refs);\n")
+    elif method.name == "Release":
+        stream.write("    LONG refs = InterlockedDecrement(&self->refs);\n")
+        stream.write("    if (refs == 0)\n")
+        stream.write("    {\n")
+        stream.write(f"        {names.destroy_function}(&self->state);\n")
+        stream.write("        HeapFree(GetProcessHeap(), 0, self);\n")
+        stream.write("    }\n")
+        stream.write("    return (uint32_t)refs;\n")
+    else:
+        args_str = ", ".join(("&self->state", *(name for _, name in method.arguments)))
+        stream.write(f"    return {names.method(method)}({args_str});\n")
+    stream.write("}\n\n")
+
+
+def append_native_vtable(stream: TextIO, impl: NativeImpl, interface: CInterface) -> None:
+    """
+    Append the vtable of `impl`'s `interface` to `stream`.
+    """
+    names = NativeImplNames(impl)
+    for _, method in interface.all_methods_with_origin:
+        append_native_adapter(stream, impl, interface, method)
+    stream.write(f"static const {InterfaceNames(interface).vtable_struct} {names.vtable(interface)} = {{\n")
+    for _, method in interface.all_methods_with_origin:
+        stream.write(f"    .{method.name} = {names.adapter(interface, method)},\n")
+    stream.write("};\n\n")
+
+
+def append_native_new(stream: TextIO, impl: NativeImpl) -> None:
+    """
+    Append the allocation function of `impl` to `stream`.
+
+    New objects are zeroed, have their vtables set and one reference.
+    """
+    names = NativeImplNames(impl)
+    stream.write(f"static {names.impl_struct} *{names.new_function}(void)\n")
+    stream.write("{\n")
+    stream.write(f"    {names.impl_struct} *self = ({names.impl_struct} *)HeapAlloc(GetProcessHeap(), HEAP_ZERO_MEMORY, sizeof({names.impl_struct}));\n")
+    stream.write("    if (self)\n")
+    stream.write("    {\n")
+    for interface in impl.interfaces:
+        stream.write(f"        self->{names.vtable_field(interface)} = &{names.vtable(interface)};\n")
+    stream.write("        self->refs = 1;\n")
+    stream.write("    }\n")
+    stream.write("    return self;\n")
+    stream.write("}\n\n")
+
+
+def append_native_impl(stream: TextIO, impl: NativeImpl) -> None:
+    """
+    Append the generated parts of native implementation `impl` to `stream`.
+    """
+    append_native_query_interface(stream, impl)
+    for interface in impl.interfaces:
+        append_native_vtable(stream, impl, interface)
+    append_native_new(stream, impl)
+
+
+def append_native_impls(stream: TextIO) -> None:
+    """
+    Append the native implementations, generated and hand-written, to `stream`.
+    """
+    append_iid_definitions(stream)
+    stream.write(load_text("ffi7z_native.h"))
+    stream.write("\n")
+    for impl in NATIVE_IMPLS:
+        append_native_impl_cdecl(stream, impl)
+    for impl in NATIVE_IMPLS:
+        append_native_impl(stream, impl)
+    stream.write(load_text("ffi7z_native.c"))
+
+
 def append_static_cdefs(stream: TextIO) -> None:
     """
     Append static C definitions to `stream`.
@@ -151,6 +327,7 @@ def append_cdefs(stream: TextIO) -> None:
     """
     append_static_cdefs(stream)
     append_common_cdecls(stream)
+    stream.write(load_text("ffi7z_native.cdef"))
     stream.write('extern "Python" {\n')
     append_thunk_cdecls(stream)
     stream.write("}\n\n")
@@ -172,3 +349,4 @@ def append_cimpl(stream: TextIO) -> None:
     append_thunk_cdecls(stream)
     stream.write("\n")
     append_thunk_vtables(stream)
+    append_native_impls(stream)
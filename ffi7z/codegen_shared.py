@@ -5,7 +5,7 @@
 Generate C source and definitions from `interfaces.py`
 """
 
-from .interfaces import CInterface, CMethod
+from .interfaces import CInterface, CMethod, NativeImpl
 
 
 class InterfaceNames:
@@ -50,3 +50,78 @@ def thunk_name(interface: CInterface, method: CMethod) -> str:
     Get the name of a the thunk for `interface`.`method`.
     """
     return f"FFI7Z_Py_{interface.name}_{method.name}"
+
+
+class NativeImplNames:
+    """
+    Helper class to get native implementation struct and function names.
+    """
+
+    @property
+    def impl_struct(self) -> str:
+        """
+        Native implementation (object) struct name.
+        """
+        return f"FFI7Z_Native{self.impl.name}"
+
+    @property
+    def state_struct(self) -> str:
+        """
+        Hand-written state struct name.
+        """
+        return f"FFI7Z_Native{self.impl.name}_state"
+
+    @property
+    def new_function(self) -> str:
+        """
+        Allocation function name.
+        """
+        return f"FFI7Z_Native{self.impl.name}_New"
+
+    @property
+    def destroy_function(self) -> str:
+        """
+        Hand-written destructor name.
+        """
+        return f"FFI7Z_Native{self.impl.name}_Destroy"
+
+    @property
+    def query_interface_function(self) -> str:
+        """
+        Shared QueryInterface implementation name.
+        """
+        return f"FFI7Z_Native{self.impl.name}_QueryInterface"
+
+    def vtable_field(self, interface: CInterface) -> str:
+        """
+        Name of the vtable pointer field for `interface`.
+        """
+        return f"vtable_{interface.name}"
+
+    def vtable(self, interface: CInterface) -> str:
+        """
+        Vtable instance name for `interface`.
+        """
+        return f"FFI7Z_Native{self.impl.name}_{interface.name}_vtable"
+
+    def adapter(self, interface: CInterface, method: CMethod) -> str:
+        """
+        Name of the vtable entry for `method`, as reached through `interface`.
+        """
+        return f"FFI7Z_Native{self.impl.name}_{interface.name}_{method.name}"
+
+    def method(self, method: CMethod) -> str:
+        """
+        Name of the hand-written implementation of `method`.
+        """
+        return f"FFI7Z_Native{self.impl.name}_{method.name}"
+
+    def __init__(self, impl: NativeImpl) -> None:
+        self.impl = impl
+
+
+def iid_name(interface: CInterface) -> str:
+    """
+    Get the name of the C GUID constant for `interface`.
+    """
+    return f"FFI7Z_IID_{interface.name}"
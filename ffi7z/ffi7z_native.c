@@ -0,0 +1,412 @@
+/* Native Streams: shared helpers */
+
+static HRESULT FFI7Z_NativeSeek(uint64_t *position, uint64_t size, int64_t offset, uint32_t origin, uint64_t *new_position)
+{
+    int64_t base;
+    switch (origin)
+    {
+    case FILE_BEGIN:
+        base = 0;
+        break;
+    case FILE_CURRENT:
+        base = (int64_t)*position;
+        break;
+    case FILE_END:
+        base = (int64_t)size;
+        break;
+    default:
+        return STG_E_INVALIDFUNCTION;
+    }
+    if (base + offset < 0)
+    {
+        return HRESULT_FROM_WIN32(ERROR_NEGATIVE_SEEK);
+    }
+    *position = (uint64_t)(base + offset);
+    if (new_position)
+    {
+        *new_position = *position;
+    }
+    return S_OK;
+}
+
+static HRESULT FFI7Z_DuplicateFdHandle(int fd, HANDLE *out_handle)
+{
+    HANDLE handle = (HANDLE)_get_osfhandle(fd);
+    if (handle == INVALID_HANDLE_VALUE)
+    {
+        return E_INVALIDARG;
+    }
+    if (!DuplicateHandle(GetCurrentProcess(), handle, GetCurrentProcess(), out_handle, 0, FALSE, DUPLICATE_SAME_ACCESS))
+    {
+        DWORD last_error = GetLastError();
+        return HRESULT_FROM_WIN32(last_error);
+    }
+    return S_OK;
+}
+
+static HRESULT FFI7Z_GetHandleSize(HANDLE handle, uint64_t *size)
+{
+    LARGE_INTEGER file_size;
+    if (!GetFileSizeEx(handle, &file_size))
+    {
+        DWORD last_error = GetLastError();
+        return HRESULT_FROM_WIN32(last_error);
+    }
+    *size = (uint64_t)file_size.QuadPart;
+    return S_OK;
+}
+
+static void FFI7Z_SetOverlappedOffset(OVERLAPPED *overlapped, uint64_t offset)
+{
+    ZeroMemory(overlapped, sizeof(OVERLAPPED));
+    overlapped->Offset = (DWORD)offset;
+    overlapped->OffsetHigh = (DWORD)(offset >> 32);
+}
+
+/* Native Streams: file descriptor input stream */
+
+static HRESULT FFI7Z_NativeFdInStream_Read(FFI7Z_NativeFdInStream_state *state, void *data, uint32_t size, uint32_t *processed_size)
+{
+    OVERLAPPED overlapped;
+    DWORD count = 0;
+    if (processed_size)
+    {
+        *processed_size = 0;
+    }
+    /* Positional reads: the handle's own file pointer may be shared with a Python file object. */
+    FFI7Z_SetOverlappedOffset(&overlapped, state->position);
+    if (size && !ReadFile(state->handle, data, size, &count, &overlapped))
+    {
+        DWORD last_error = GetLastError();
+        if (last_error != ERROR_HANDLE_EOF)
+        {
+            return HRESULT_FROM_WIN32(last_error);
+        }
+    }
+    state->position += count;
+    if (processed_size)
+    {
+        *processed_size = count;
+    }
+    return S_OK;
+}
+
+static HRESULT FFI7Z_NativeFdInStream_Seek(FFI7Z_NativeFdInStream_state *state, int64_t offset, uint32_t seekOrigin, uint64_t *newPosition)
+{
+    uint64_t size = 0;
+    if (seekOrigin == FILE_END)
+    {
+        HRESULT result = FFI7Z_GetHandleSize(state->handle, &size);
+        if (FAILED(result))
+        {
+            return result;
+        }
+    }
+    return FFI7Z_NativeSeek(&state->position, size, offset, seekOrigin, newPosition);
+}
+
+static HRESULT FFI7Z_NativeFdInStream_GetSize(FFI7Z_NativeFdInStream_state *state, uint64_t *size)
+{
+    return FFI7Z_GetHandleSize(state->handle, size);
+}
+
+static void FFI7Z_NativeFdInStream_Destroy(FFI7Z_NativeFdInStream_state *state)
+{
+    CloseHandle(state->handle);
+}
+
+/* Native Streams: file descriptor output stream */
+
+static HRESULT FFI7Z_NativeFdOutStream_Write(FFI7Z_NativeFdOutStream_state *state, const void *data, uint32_t size, uint32_t *processed_size)
+{
+    OVERLAPPED overlapped;
+    DWORD count = 0;
+    if (processed_size)
+    {
+        *processed_size = 0;
+    }
+    FFI7Z_SetOverlappedOffset(&overlapped, state->position);
+    if (size && !WriteFile(state->handle, data, size, &count, &overlapped))
+    {
+        DWORD last_error = GetLastError();
+        return HRESULT_FROM_WIN32(last_error);
+    }
+    state->position += count;
+    if (processed_size)
+    {
+        *processed_size = count;
+    }
+    return S_OK;
+}
+
+static HRESULT FFI7Z_NativeFdOutStream_Seek(FFI7Z_NativeFdOutStream_state *state, int64_t offset, uint32_t seekOrigin, uint64_t *newPosition)
+{
+    uint64_t size = 0;
+    if (seekOrigin == FILE_END)
+    {
+        HRESULT result = FFI7Z_GetHandleSize(state->handle, &size);
+        if (FAILED(result))
+        {
+            return result;
+        }
+    }
+    return FFI7Z_NativeSeek(&state->position, size, offset, seekOrigin, newPosition);
+}
+
+static HRESULT FFI7Z_NativeFdOutStream_SetSize(FFI7Z_NativeFdOutStream_state *state, uint64_t new_size)
+{
+    FILE_END_OF_FILE_INFO info;
+    info.EndOfFile.QuadPart = (LONGLONG)new_size;
+    if (!SetFileInformationByHandle(state->handle, FileEndOfFileInfo, &info, sizeof(info)))
+    {
+        DWORD last_error = GetLastError();
+        return HRESULT_FROM_WIN32(last_error);
+    }
+    return S_OK;
+}
+
+static void FFI7Z_NativeFdOutStream_Destroy(FFI7Z_NativeFdOutStream_state *state)
+{
+    CloseHandle(state->handle);
+}
+
+/* Native Streams: memory input stream */
+
+static HRESULT FFI7Z_NativeMemInStream_Read(FFI7Z_NativeMemInStream_state *state, void *data, uint32_t size, uint32_t *processed_size)
+{
+    uint64_t count = 0;
+    if (state->position < state->size)
+    {
+        count = state->size - state->position;
+        if (count > size)
+        {
+            count = size;
+        }
+        memcpy(data, state->data + state->position, (size_t)count);
+        state->position += count;
+    }
+    if (processed_size)
+    {
+        *processed_size = (uint32_t)count;
+    }
+    return S_OK;
+}
+
+static HRESULT FFI7Z_NativeMemInStream_Seek(FFI7Z_NativeMemInStream_state *state, int64_t offset, uint32_t seekOrigin, uint64_t *newPosition)
+{
+    return FFI7Z_NativeSeek(&state->position, state->size, offset, seekOrigin, newPosition);
+}
+
+static HRESULT FFI7Z_NativeMemInStream_GetSize(FFI7Z_NativeMemInStream_state *state, uint64_t *size)
+{
+    *size = state->size;
+    return S_OK;
+}
+
+static void FFI7Z_NativeMemInStream_Destroy(FFI7Z_NativeMemInStream_state *state)
+{
+    /* The data is borrowed; its owner keeps it alive. */
+    (void)state;
+}
+
+/* Native Streams: memory output stream */
+
+static HRESULT FFI7Z_NativeMemOutStream_Reserve(FFI7Z_NativeMemOutStream_state *state, uint64_t capacity)
+{
+    uint8_t *data;
+    if (capacity <= state->capacity)
+    {
+        return S_OK;
+    }
+    if (capacity < state->capacity * 2)
+    {
+        capacity = state->capacity * 2;
+    }
+    if (capacity > (SIZE_T)-1)
+    {
+        return E_OUTOFMEMORY;
+    }
+    if (state->data && !state->borrowed)
+    {
+        data = (uint8_t *)HeapReAlloc(GetProcessHeap(), HEAP_ZERO_MEMORY, state->data, (SIZE_T)capacity);
+    }
+    else
+    {
+        data = (uint8_t *)HeapAlloc(GetProcessHeap(), HEAP_ZERO_MEMORY, (SIZE_T)capacity);
+    }
+    if (data == NULL)
+    {
+        return E_OUTOFMEMORY;
+    }
+    if (state->borrowed)
+    {
+        /* Output outgrew the caller's buffer: carry on in our own. */
+        memcpy(data, state->data, (size_t)state->size);
+        state->borrowed = 0;
+    }
+    state->data = data;
+    state->capacity = capacity;
+    return S_OK;
+}
+
+static HRESULT FFI7Z_NativeMemOutStream_Resize(FFI7Z_NativeMemOutStream_state *state, uint64_t new_size)
+{
+    if (new_size > state->size)
+    {
+        HRESULT result = FFI7Z_NativeMemOutStream_Reserve(state, new_size);
+        if (FAILED(result))
+        {
+            return result;
+        }
+        /* The gap may hold stale bytes from before an earlier shrink. */
+        memset(state->data + state->size, 0, (size_t)(new_size - state->size));
+    }
+    state->size = new_size;
+    return S_OK;
+}
+
+static HRESULT FFI7Z_NativeMemOutStream_Write(FFI7Z_NativeMemOutStream_state *state, const void *data, uint32_t size, uint32_t *processed_size)
+{
+    uint64_t end = state->position + size;
+    if (processed_size)
+    {
+        *processed_size = 0;
+    }
+    if (end > state->size)
+    {
+        HRESULT result = FFI7Z_NativeMemOutStream_Resize(state, end);
+        if (FAILED(result))
+        {
+            return result;
+        }
+    }
+    if (size)
+    {
+        memcpy(state->data + state->position, data, size);
+    }
+    state->position = end;
+    if (processed_size)
+    {
+        *processed_size = size;
+    }
+    return S_OK;
+}
+
+static HRESULT FFI7Z_NativeMemOutStream_Seek(FFI7Z_NativeMemOutStream_state *state, int64_t offset, uint32_t seekOrigin, uint64_t *newPosition)
+{
+    return FFI7Z_NativeSeek(&state->position, state->size, offset, seekOrigin, newPosition);
+}
+
+static HRESULT FFI7Z_NativeMemOutStream_SetSize(FFI7Z_NativeMemOutStream_state *state, uint64_t new_size)
+{
+    return FFI7Z_NativeMemOutStream_Resize(state, new_size);
+}
+
+static void FFI7Z_NativeMemOutStream_Destroy(FFI7Z_NativeMemOutStream_state *state)
+{
+    if (state->data && !state->borrowed)
+    {
+        HeapFree(GetProcessHeap(), 0, state->data);
+    }
+}
+
+/* Native Streams: constructors */
+
+HRESULT CreateNativeFdInStream(int fd, FFI7Z_IInStream **out_stream)
+{
+    FFI7Z_NativeFdInStream *self;
+    HANDLE handle;
+    HRESULT result = FFI7Z_DuplicateFdHandle(fd, &handle);
+    if (FAILED(result))
+    {
+        return result;
+    }
+    self = FFI7Z_NativeFdInStream_New();
+    if (self == NULL)
+    {
+        CloseHandle(handle);
+        return E_OUTOFMEMORY;
+    }
+    self->state.handle = handle;
+    *out_stream = (FFI7Z_IInStream *)&self->vtable_IInStream;
+    return S_OK;
+}
+
+HRESULT CreateNativeFdOutStream(int fd, FFI7Z_IOutStream **out_stream)
+{
+    FFI7Z_NativeFdOutStream *self;
+    HANDLE handle;
+    HRESULT result = FFI7Z_DuplicateFdHandle(fd, &handle);
+    if (FAILED(result))
+    {
+        return result;
+    }
+    self = FFI7Z_NativeFdOutStream_New();
+    if (self == NULL)
+    {
+        CloseHandle(handle);
+        return E_OUTOFMEMORY;
+    }
+    self->state.handle = handle;
+    *out_stream = (FFI7Z_IOutStream *)&self->vtable_IOutStream;
+    return S_OK;
+}
+
+HRESULT CreateNativeMemInStream(const void *data, uint64_t size, FFI7Z_IInStream **out_stream)
+{
+    FFI7Z_NativeMemInStream *self = FFI7Z_NativeMemInStream_New();
+    if (self == NULL)
+    {
+        return E_OUTOFMEMORY;
+    }
+    self->state.data = (const uint8_t *)data;
+    self->state.size = size;
+    *out_stream = (FFI7Z_IInStream *)&self->vtable_IInStream;
+    return S_OK;
+}
+
+HRESULT CreateNativeMemOutStream(uint64_t capacity, FFI7Z_IOutStream **out_stream)
+{
+    HRESULT result;
+    FFI7Z_NativeMemOutStream *self = FFI7Z_NativeMemOutStream_New();
+    if (self == NULL)
+    {
+        return E_OUTOFMEMORY;
+    }
+    result = FFI7Z_NativeMemOutStream_Reserve(&self->state, capacity);
+    if (FAILED(result))
+    {
+        HeapFree(GetProcessHeap(), 0, self);
+        return result;
+    }
+    *out_stream = (FFI7Z_IOutStream *)&self->vtable_IOutStream;
+    return S_OK;
+}
+
+HRESULT CreateNativeBufferOutStream(void *data, uint64_t capacity, FFI7Z_IOutStream **out_stream)
+{
+    FFI7Z_NativeMemOutStream *self = FFI7Z_NativeMemOutStream_New();
+    if (self == NULL)
+    {
+        return E_OUTOFMEMORY;
+    }
+    /* The buffer is borrowed until output outgrows it; its owner keeps it alive. */
+    self->state.data = (uint8_t *)data;
+    self->state.capacity = capacity;
+    self->state.borrowed = 1;
+    *out_stream = (FFI7Z_IOutStream *)&self->vtable_IOutStream;
+    return S_OK;
+}
+
+HRESULT GetNativeMemOutStreamBuffer(FFI7Z_IOutStream *stream, void **data, uint64_t *size)
+{
+    FFI7Z_NativeMemOutStream *self;
+    if (stream == NULL || stream->vtable != &FFI7Z_NativeMemOutStream_IOutStream_vtable)
+    {
+        return E_INVALIDARG;
+    }
+    self = FFI7Z_NATIVE_SELF(FFI7Z_NativeMemOutStream, vtable_IOutStream, stream);
+    *data = self->state.data;
+    *size = self->state.size;
+    return S_OK;
+}
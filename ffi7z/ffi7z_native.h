@@ -0,0 +1,35 @@
+/* Native Streams: state */
+
+#include <io.h>
+#include <stddef.h>
+#include <string.h>
+
+#define FFI7Z_NATIVE_SELF(type, field, this) ((type *)((char *)(this) - offsetof(type, field)))
+
+typedef struct FFI7Z_NativeFdInStream_state_tag
+{
+    HANDLE handle;
+    uint64_t position;
+} FFI7Z_NativeFdInStream_state;
+
+typedef struct FFI7Z_NativeFdOutStream_state_tag
+{
+    HANDLE handle;
+    uint64_t position;
+} FFI7Z_NativeFdOutStream_state;
+
+typedef struct FFI7Z_NativeMemInStream_state_tag
+{
+    const uint8_t *data;
+    uint64_t size;
+    uint64_t position;
+} FFI7Z_NativeMemInStream_state;
+
+typedef struct FFI7Z_NativeMemOutStream_state_tag
+{
+    uint8_t *data;
+    uint64_t size;
+    uint64_t capacity;
+    uint64_t position;
+    int borrowed;
+} FFI7Z_NativeMemOutStream_state;
@@ -121,6 +121,30 @@ class CInterface:
         """
         yield from (method for intf, method in self.all_methods_with_origin)
 
+    @property
+    def ancestry(self):
+        """
+        The interface and all of its parents, most derived first.
+        """
+        interface = self
+        while interface:
+            yield interface
+            interface = interface.parent
+
+
+@dataclass
+class NativeImpl:
+    """
+    A COM class implemented in C.
+
+    Reference counting, QueryInterface and the vtables are generated; the
+    other methods and the `state` struct are hand-written in `ffi7z_native.c`.
+    The first interface is the primary one.
+    """
+
+    name: str
+    interfaces: List[CInterface]
+
 
 IUnknown = CInterface(
     "IUnknown",
@@ -201,7 +225,7 @@ ISequentialOutStream = CInterface(
 
 IOutStream = CInterface(
     "IOutStream",
-    make_7zip_iid(0x03, 0x05),
+    make_7zip_iid(0x03, 0x04),
     ISequentialOutStream,
     [
         CMethod(
@@ -211,7 +235,14 @@ IOutStream = CInterface(
                 ("uint32_t", "seekOrigin"),
                 ("uint64_t *", "newPosition"),
             ],
-        )
+        ),
+        # x(SetSize(UInt64 newSize))
+        CMethod(
+            "SetSize",
+            [
+                ("uint64_t", "new_size"),
+            ],
+        ),
     ],
 )
 
@@ -554,6 +585,210 @@ ISetCompressCodecsInfo = CInterface(
 )
 
 
+IInArchiveGetStream = CInterface(
+    "IInArchiveGetStream",
+    make_7zip_iid(0x06, 0x40),
+    IUnknown,
+    [
+        # x(GetStream(UInt32 index, ISequentialInStream **stream))
+        CMethod(
+            "GetStream",
+            [
+                ("uint32_t", "index"),
+                ("ISequentialInStream **", "stream"),
+            ],
+        ),
+    ],
+)
+
+
+IOutArchive = CInterface(
+    "IOutArchive",
+    make_7zip_iid(0x06, 0xA0),
+    IUnknown,
+    [
+        # x(UpdateItems(ISequentialOutStream *outStream, UInt32 numItems, IArchiveUpdateCallback *updateCallback))
+        CMethod(
+            "UpdateItems",
+            [
+                ("ISequentialOutStream *", "out_stream"),
+                ("uint32_t", "num_items"),
+                ("IArchiveUpdateCallback *", "update_callback"),
+            ],
+        ),
+        # x(GetFileTimeType(UInt32 *type))
+        CMethod(
+            "GetFileTimeType",
+            [
+                ("uint32_t *", "type"),
+            ],
+        ),
+    ],
+)
+
+IArchiveUpdateCallback = CInterface(
+    "IArchiveUpdateCallback",
+    make_7zip_iid(0x06, 0x80),
+    IProgress,
+    [
+        # x(GetUpdateItemInfo(UInt32 index, Int32 *newData, Int32 *newProps, UInt32 *indexInArchive))
+        CMethod(
+            "GetUpdateItemInfo",
+            [
+                ("uint32_t", "index"),
+                ("int32_t *", "new_data"),
+                ("int32_t *", "new_props"),
+                ("uint32_t *", "index_in_archive"),
+            ],
+        ),
+        # x(GetProperty(UInt32 index, PROPID propID, PROPVARIANT *value))
+        CMethod(
+            "GetProperty",
+            [
+                ("uint32_t", "index"),
+                ("PROPID", "prop_id"),
+                ("PROPVARIANT *", "value"),
+            ],
+        ),
+        # x(GetStream(UInt32 index, ISequentialInStream **inStream))
+        CMethod(
+            "GetStream",
+            [
+                ("uint32_t", "index"),
+                ("ISequentialInStream **", "in_stream"),
+            ],
+        ),
+        # x(SetOperationResult(Int32 operationResult))
+        CMethod(
+            "SetOperationResult",
+            [
+                ("int32_t", "op_result"),
+            ],
+        ),
+    ],
+)
+
+ISetProperties = CInterface(
+    "ISetProperties",
+    make_7zip_iid(0x06, 0x03),
+    IUnknown,
+    [
+        # x(SetProperties(const wchar_t * const *names, const PROPVARIANT *values, UInt32 numProps))
+        CMethod(
+            "SetProperties",
+            [
+                ("const wchar_t * const *", "names"),
+                ("const PROPVARIANT *", "values"),
+                ("uint32_t", "num_props"),
+            ],
+        ),
+    ],
+)
+
+
+ICompressCoder = CInterface(
+    "ICompressCoder",
+    make_7zip_iid(0x04, 0x05),
+    IUnknown,
+    [
+        # x(Code(ISequentialInStream *inStream, ISequentialOutStream *outStream,
+        #     const UInt64 *inSize, const UInt64 *outSize, ICompressProgressInfo *progress))
+        CMethod(
+            "Code",
+            [
+                ("ISequentialInStream *", "in_stream"),
+                ("ISequentialOutStream *", "out_stream"),
+                ("const uint64_t *", "in_size"),
+                ("const uint64_t *", "out_size"),
+                ("ICompressProgressInfo *", "progress"),
+            ],
+        ),
+    ],
+)
+
+ICompressSetCoderProperties = CInterface(
+    "ICompressSetCoderProperties",
+    make_7zip_iid(0x04, 0x20),
+    IUnknown,
+    [
+        # x(SetCoderProperties(const PROPID *propIDs, const PROPVARIANT *props, UInt32 numProps))
+        CMethod(
+            "SetCoderProperties",
+            [
+                ("const PROPID *", "prop_ids"),
+                ("const PROPVARIANT *", "props"),
+                ("uint32_t", "num_props"),
+            ],
+        ),
+    ],
+)
+
+ICompressSetDecoderProperties2 = CInterface(
+    "ICompressSetDecoderProperties2",
+    make_7zip_iid(0x04, 0x22),
+    IUnknown,
+    [
+        # x(SetDecoderProperties2(const Byte *data, UInt32 size))
+        CMethod(
+            "SetDecoderProperties2",
+            [
+                ("const uint8_t *", "data"),
+                ("uint32_t", "size"),
+            ],
+        ),
+    ],
+)
+
+ICompressWriteCoderProperties = CInterface(
+    "ICompressWriteCoderProperties",
+    make_7zip_iid(0x04, 0x23),
+    IUnknown,
+    [
+        # x(WriteCoderProperties(ISequentialOutStream *outStream))
+        CMethod(
+            "WriteCoderProperties",
+            [
+                ("ISequentialOutStream *", "out_stream"),
+            ],
+        ),
+    ],
+)
+
+ICompressSetCoderMt = CInterface(
+    "ICompressSetCoderMt",
+    make_7zip_iid(0x04, 0x25),
+    IUnknown,
+    [
+        # x(SetNumberOfThreads(UInt32 numThreads))
+        CMethod(
+            "SetNumberOfThreads",
+            [
+                ("uint32_t", "num_threads"),
+            ],
+        ),
+    ],
+)
+
+ICompressFilter = CInterface(
+    "ICompressFilter",
+    make_7zip_iid(0x04, 0x40),
+    IUnknown,
+    [
+        # x(Init())
+        CMethod("Init", []),
+        # x2(UInt32, Filter(Byte *data, UInt32 size))
+        CMethod(
+            "Filter",
+            return_type="uint32_t",
+            arguments=[
+                ("uint8_t *", "data"),
+                ("uint32_t", "size"),
+            ],
+        ),
+    ],
+)
+
+
 INTERFACES = [
     IUnknown,
     ISequentialInStream,
@@ -571,4 +806,21 @@ INTERFACES = [
     ICryptoGetTextPassword,
     ICryptoGetTextPassword2,
     IInArchive,
+    IInArchiveGetStream,
+    IArchiveUpdateCallback,
+    IOutArchive,
+    ISetProperties,
+    ICompressCoder,
+    ICompressSetCoderProperties,
+    ICompressSetDecoderProperties2,
+    ICompressWriteCoderProperties,
+    ICompressSetCoderMt,
+    ICompressFilter,
+]
+
+NATIVE_IMPLS = [
+    NativeImpl("FdInStream", [IInStream, IStreamGetSize]),
+    NativeImpl("FdOutStream", [IOutStream]),
+    NativeImpl("MemInStream", [IInStream, IStreamGetSize]),
+    NativeImpl("MemOutStream", [IOutStream]),
 ]
@@ -53,3 +53,6 @@ ffi.init_once(load_lib7z, __package__)
 
 
 from .archive import Archive, ArchiveItem  # pylint: disable=wrong-import-position
+from .format_registry import formats  # pylint: disable=wrong-import-position
+from .method_registry import methods  # pylint: disable=wrong-import-position
+from .writer import ArchiveWriter  # pylint: disable=wrong-import-position
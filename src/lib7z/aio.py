@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: asyncio interface
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from os import PathLike
+from threading import Event, Semaphore
+from types import TracebackType
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+)
+
+from .archive import Archive, ArchiveItem
+from .snapshot import ArchiveSnapshot
+
+__all__ = ("AsyncArchive",)
+
+T = TypeVar("T")
+
+# Decoded chunks allowed in flight between the extraction thread and the event loop.
+DEFAULT_MAX_PENDING_CHUNKS = 16
+
+_END = object()
+
+
+class AsyncArchive:
+    """
+    An archive usable from asyncio code.
+
+    Every call into 7-zip runs on the archive's own single-threaded executor,
+    so the event loop is never blocked and the underlying IInArchive is only
+    ever used by one thread at a time. Open with `await AsyncArchive.open(...)`.
+    """
+
+    def __init__(self, archive: Archive, executor: ThreadPoolExecutor) -> None:
+        self.archive = archive
+        self._executor = executor
+
+    @classmethod
+    async def open(cls, filename: Union[PathLike, str], **kwargs) -> "AsyncArchive":
+        """Open `filename`; keyword arguments are passed on to Archive."""
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lib7z-aio")
+        loop = asyncio.get_running_loop()
+        try:
+            archive = await loop.run_in_executor(executor, partial(Archive, filename, **kwargs))
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return cls(archive, executor)
+
+    async def _run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def __aenter__(self) -> "AsyncArchive":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the archive and shut down its executor."""
+        await self._run(self.archive.close)
+        self._executor.shutdown(wait=False)
+
+    async def items(self) -> List[ArchiveItem]:
+        """Get all items of the archive."""
+        return await self._run(list, self.archive)
+
+    async def item(self, index: Union[int, PathLike, str]) -> ArchiveItem:
+        """Get an item by index or path."""
+        return await self._run(self.archive.__getitem__, index)
+
+    async def snapshot(self, props: Sequence[str] = ("path", "is_dir", "size", "mtime", "crc")) -> ArchiveSnapshot:
+        """Read properties of every item in one pass. See `Archive.snapshot`."""
+        return await self._run(self.archive.snapshot, props)
+
+    async def getattr(self, item: ArchiveItem, name: str) -> Any:
+        """Read property `name` of `item` without blocking the event loop."""
+        return await self._run(getattr, item, name)
+
+    async def extract(self, dest_dir: PathLike, items: Optional[Sequence[ArchiveItem]] = None, **kwargs) -> None:
+        """Extract files into a directory. See `Archive.extract`."""
+        await self._run(self.archive.extract, dest_dir, items, **kwargs)
+
+    async def read_bytes(self, item: ArchiveItem, *, password: Union[None, str, bytes] = None) -> bytearray:
+        """Read `item` into a bytearray (see `Archive.read_item_bytes`)."""
+        return await self._run(self.archive.read_item_bytes, item, password=password)
+
+    async def read_text(self, item: ArchiveItem, encoding: str = "utf-8", *, password: Union[None, str, bytes] = None) -> str:
+        """Read `item` as text."""
+        return await self._run(self.archive.read_item_text, item, encoding, password=password)
+
+    async def iter_bytes(
+        self,
+        item: ArchiveItem,
+        *,
+        password: Union[None, str, bytes] = None,
+        max_pending: int = DEFAULT_MAX_PENDING_CHUNKS,
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream the contents of `item` as chunks of bytes.
+
+        Chunks are handed from the extraction thread to the event loop with
+        `call_soon_threadsafe`; extraction pauses while `max_pending` chunks
+        are waiting to be consumed. Other calls on this archive wait until the
+        iteration finishes or is closed.
+        """
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        slots = Semaphore(max_pending)
+        cancelled = Event()
+
+        def sink(view: memoryview) -> None:
+            slots.acquire()
+            if cancelled.is_set():
+                raise BrokenPipeError()
+            loop.call_soon_threadsafe(queue.put_nowait, bytes(view))
+
+        def run() -> None:
+            try:
+                self.archive.feed_item(item, sink, password=password)
+            finally:
+                if not cancelled.is_set():
+                    loop.call_soon_threadsafe(queue.put_nowait, _END)
+
+        future = loop.run_in_executor(self._executor, run)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _END:
+                    break
+                slots.release()
+                yield chunk
+            await future
+        finally:
+            if not future.done():
+                # Wake the extraction thread so that its next write fails and the extraction ends.
+                cancelled.set()
+                for _ in range(max_pending + 1):
+                    slots.release()
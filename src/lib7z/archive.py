@@ -5,35 +5,92 @@
 Python bindings for the 7-Zip Library: Archives
 """
 
+import os
+import stat
+import tempfile
 from enum import IntEnum, IntFlag
-from io import BytesIO
+from io import BufferedReader
+from itertools import chain
 from logging import getLogger
-from os import SEEK_SET, PathLike
-from pathlib import Path, PurePath
+from os import PathLike
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
 from types import TracebackType
-from typing import Any, Dict, Generator, List, Optional, Sequence, Type, Union
-from weakref import ReferenceType, ref
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+from weakref import ReferenceType, WeakSet, ref
 
+from .content_cache import ContentCache
 from .extract_callback import (
+    ArchiveExtractCallback,
+    ArchiveExtractToBuffersCallback,
     ArchiveExtractToDirectoryCallback,
     ArchiveExtractToStreamCallback,
+    ArchiveTestCallback,
     OperationResult,
 )
+from .extract_plan import PLAN_PROPS, ExtractPlan
 from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
-from .format_registry import FormatInfo, formats
+from .format_registry import FormatFlag, FormatInfo, formats
 from .iids import (
     CreateObject,
     IID_IArchiveExtractCallback,
     IID_IArchiveOpenCallback,
+    IID_IArchiveOpenSetSubArchiveName,
     IID_IInArchive,
+    IID_IInArchiveGetStream,
     IID_IInStream,
+    IID_ISequentialInStream,
+    QueryInterface,
+    ReleaseObject,
+    iid_opaque_impl_struct_name,
+)
+from .instrument import (
+    Instrument,
+    instrument_extract_callback,
+    instrument_open_callback,
 )
+from .listing_cache import ArchiveIdentity, Listing, ListingCache, archive_identity
 from .open_callback import ArchiveOpenCallback
+from .parallel import Progress, extract_parallel, verify_parallel
+from .path_index import PathIndex
+from .planner import batch_groups, group_by_block
 from .propvariant import VARTYPE, PropVariant
-from .stream import FileInStream
+from .reader import DEFAULT_BUFFER_SIZE, ArchiveItemReader, ArchiveItemStreamReader
+from .snapshot import ArchiveSnapshot, append_value, has_packed_column, make_column
+from .stream import (
+    ByteAccumulator,
+    NativeBufferOutStream,
+    NativeItemInStream,
+    RangeAccumulator,
+    RangeComplete,
+    Sink,
+    SinkOutStream,
+    SpoolInStream,
+    open_in_stream,
+)
+from .volumes import VolumeResolver, sibling_volume_resolver
 
 log = getLogger("lib7z")
 
+DEFAULT_BATCH_SIZE = 64 << 20
+
+# Properties always kept in cached listings, whether or not the handler advertises them.
+_LISTING_PROPS = (*PLAN_PROPS, "crc", "block", "pack_size", "encrypted")
+
 
 class ArchiveProps(IntEnum):
     """Archive and ArchiveItem Properties"""
@@ -186,47 +243,280 @@ class NotThisArchiveError(ArchiveError):
     pass
 
 
+class ArchiveBusyError(ArchiveError):
+    pass
+
+
+class UpdateError(ArchiveError):
+    pass
+
+
 class Archive:
     """An archive."""
 
     closed: bool
+    cache_item_properties: bool
+    _num_items: int
     _archive_properties: Dict[str, int]
+    _archive_property_types: Dict[int, VARTYPE]
     _archive_item_properties: Dict[str, int]
-    _item_indices_by_path: Dict[PurePath, int]
-
-    def __init__(self, filename: Union[PathLike, str], *, password: Union[None, str, bytes] = None) -> None:
+    _archive_item_property_types: Dict[int, VARTYPE]
+    _path_index: Optional[PathIndex]
+    _listing: Optional[ArchiveSnapshot]
+    _identity: Optional[ArchiveIdentity]
+    # Set for archives opened from an item of another archive (see IArchiveOpenSetSubArchiveName).
+    _subarchive_name: Optional[str] = None
+    # The Split handler and stream underneath an archive joined from volumes, e.g. a .7z.001 set.
+    _container: Optional[Tuple[ffi.CData, Any]] = None
+
+    def __init__(
+        self,
+        filename: Union[PathLike, str],
+        *,
+        password: Union[None, str, bytes] = None,
+        cache_item_properties: bool = True,
+        use_mmap: bool = True,
+        native_streams: bool = True,
+        case_sensitive_paths: bool = os.name != "nt",
+        listing_cache: Optional[ListingCache] = None,
+        content_cache: Optional[ContentCache] = None,
+        instrument: Optional[Instrument] = None,
+        volume_resolver: Optional[VolumeResolver] = None,
+        prefetch_volumes: int = 0,
+    ) -> None:
+        """
+        Open the archive at `filename`.
+
+        With a `listing_cache`, an archive already listed there is answered
+        from the cache; its 7-zip handler is only opened once contents (or
+        properties the cache lacks) are needed. With a `content_cache`,
+        `read_item_bytes` serves repeated reads of an item from memory. An
+        `instrument` receives progress and timing events, e.g. a MetricsCollector.
+
+        For multi-volume archives, `filename` is the first volume (e.g.
+        `.7z.001`, `.part1.rar` or, for split zips, `.zip`). The others are
+        found next to it, or by `volume_resolver`, which maps volume names to
+        paths (None for missing volumes). Volumes that are plain pieces of one
+        file (`.001`, `.002`, ...) are joined, and the archive they make up
+        is opened in their place. With `prefetch_volumes`, that many volumes
+        ahead of the one being decoded are read in the background.
+        """
         self.filename = filename
         self.password = password
-
-        self.stream = FileInStream(filename)
-        self.open_callback = ArchiveOpenCallback(password=password, stream=self.stream)
-
-        for fmt in self.__get_possible_formats():
-            if self.__try_open_as_format(fmt):
-                break
-        else:
-            raise RuntimeError("{self.filename}: Unknown or unsupported format.")
-
+        self.cache_item_properties = cache_item_properties
+        self.native_streams = native_streams
+        self.case_sensitive_paths = case_sensitive_paths
+        self._path_index = None
+        self._extract_lock = Lock()
+        self._readers: "WeakSet[Union[ArchiveItemReader, ArchiveItemStreamReader]]" = WeakSet()
+        self._use_mmap = use_mmap
+        self._archive: Optional[ffi.CData] = None
+        self._listing = None
+        self.stream = None
+        self.format: Optional[FormatInfo] = None
+        self.content_cache = content_cache
+        self.instrument = instrument
+        self._listing_cache = listing_cache
+        self.volume_resolver = volume_resolver
+        self.prefetch_volumes = prefetch_volumes
+        self.open_callback: Optional[ArchiveOpenCallback] = None
+        self.__load()
+
+    def __load(self) -> None:
+        """
+        List the archive, from the listing cache or by opening its handler.
+        """
+        listing_cache = self._listing_cache
+        identity = archive_identity(self.filename) if listing_cache is not None else None
+        self._identity = identity
+        if identity is not None:
+            listing = listing_cache.get(identity)  # type: ignore
+            if listing is not None:
+                self.__use_listing(listing)
+                self.closed = False
+                return
+
+        self.__open_handler(self.format)
         self.closed = False
 
         try:
             self.__read_archive_properties()
             self.__read_archive_item_properties()
+            self._num_items = self.__read_num_items()
+            if identity is not None:
+                listing_cache.put(identity, self.__make_listing())  # type: ignore
         except Exception:
             log.exception("Failed reading archive (item) property information.")
             self.close()
             raise
 
-        self._item_indices_by_path = {}
+    @property
+    def archive(self) -> ffi.CData:
+        """The archive's IInArchive handler, opened on first use if the archive was listed from a cache."""
+        if self._archive is None:
+            if self.closed:
+                raise ArchiveClosedError()
+            self.__open_handler(self.format)
+        return self._archive
+
+    @property
+    def volumes(self) -> List[str]:
+        """Paths of the archive's volumes, starting with `filename`, as far as its handler has opened them."""
+        return [os.fspath(self.filename), *(self.open_callback.volume_paths if self.open_callback is not None else ())]
+
+    def _open_in_stream(self) -> Any:
+        """Open the stream the handler reads the archive from."""
+        return open_in_stream(self.filename, use_mmap=self._use_mmap, native=self.native_streams)
+
+    def _reopenable(self) -> bool:
+        """Whether worker processes can open the archive themselves, from `filename`."""
+        return os.path.isfile(self.filename) and self.volume_resolver is None
+
+    def __open_handler(self, preferred: Optional[FormatInfo] = None) -> None:
+        self.stream = self._open_in_stream()
+        self.open_callback = ArchiveOpenCallback(
+            password=self.password,
+            stream=self.stream,
+            filename=self.filename,
+            resolver=self.volume_resolver or sibling_volume_resolver(self.filename),
+            prefetch_volumes=self.prefetch_volumes,
+            use_mmap=self._use_mmap,
+            native_streams=self.native_streams,
+        )
+        if self._subarchive_name is not None:
+            self.__set_subarchive_name(self._subarchive_name)
+        if self.instrument is not None:
+            instrument_open_callback(self.open_callback, self.instrument)
+
+        try:
+            fmt = self.__probe_formats(os.fspath(self.filename), preferred)
+            if fmt is None:
+                raise RuntimeError(f"{self.filename}: Unknown or unsupported format.")
+            self.format = fmt
+            if fmt.name == "Split":
+                self.__open_split_contents(preferred)
+        except BaseException:
+            # Probing reads the stream, which fails e.g. for nested archives with a wrong password; release it either way.
+            self.__release_handler()
+            raise
+        # Handlers read headers all over the volumes while opening; only later reads are decoding.
+        self.open_callback.start_prefetch()
+
+    def __set_subarchive_name(self, name: str) -> None:
+        # Tell the callback the way 7-zip's own clients do, through the interface.
+        assert self.open_callback is not None
+        setter = self.open_callback.get_instance(IID_IArchiveOpenSetSubArchiveName)
+        setter.vtable.SetSubArchiveName(setter, name)  # type: ignore
+
+    def __probe_formats(self, name: str, preferred: Optional[FormatInfo]) -> Optional[FormatInfo]:
+        """
+        Open `self.stream` with the first candidate format for `name` that accepts it.
+        """
+        candidates: Iterable[FormatInfo] = self.__get_possible_formats(name)
+        if preferred is not None:
+            candidates = chain((preferred,), (fmt for fmt in candidates if fmt.index != preferred.index))
+        instrument = self.instrument
+        for fmt in candidates:
+            start = perf_counter()
+            opened = self.__try_open_as_format(fmt)
+            if instrument is not None:
+                instrument.open_attempted(name, fmt.name, perf_counter() - start, opened)
+            if opened:
+                return fmt
+        return None
+
+    def __open_split_contents(self, preferred: Optional[FormatInfo]) -> None:
+        """
+        Open the archive a Split handler joins from volumes (e.g. the 7z of a
+        .7z.001 set) in its place, as 7-zip's own clients do. The Split
+        handler stays open underneath, reading the volumes. If the joined
+        file is no archive, the Split handler's single item is listed.
+        """
+        stream = self.__get_item_in_stream(0)
+        if stream is None:
+            return
+        self._container = (self._archive, self.stream)
+        self._archive = None
+        self.stream = NativeItemInStream(stream, lambda: None)
+        name = Path(self.filename).stem
+        self.__set_subarchive_name(name)
+        fmt = self.__probe_formats(name, preferred)
+        if fmt is None:
+            self.stream.close()
+            self._archive, self.stream = self._container
+            self._container = None
+            return
+        self.format = fmt
+
+    def __close_container(self) -> None:
+        if self._container is not None:
+            container, stream = self._container
+            self._container = None
+            container.vtable.Close(container)
+            ffi.release(container)
+            stream.close()
+
+    def __use_listing(self, listing: Listing) -> None:
+        self._archive_properties = listing.archive_properties
+        self._archive_property_types = listing.archive_property_types
+        self._archive_item_properties = listing.item_properties
+        self._archive_item_property_types = listing.item_property_types
+        self._num_items = listing.num_items
+        self._listing = listing.snapshot
+        self.format = formats.by_clsid.get(listing.clsid)
+
+    def __make_listing(self) -> Listing:
+        """
+        Snapshot the properties worth caching: every packed-column property
+        the handler advertises, plus those this library reads itself.
+        """
+        props = {*_LISTING_PROPS}
+        for name, prop_id in self._archive_item_properties.items():
+            if prop_id < 0x10000 and has_packed_column(self._archive_item_property_types[prop_id]):
+                props.add(ArchiveProps(prop_id).name.lower())
+        assert self.format is not None
+        return Listing(
+            self.format.clsid,
+            self._num_items,
+            self._archive_properties,
+            self._archive_property_types,
+            self._archive_item_properties,
+            self._archive_item_property_types,
+            self.snapshot(sorted(props)),
+        )
 
-    def __get_possible_formats(self) -> Generator[FormatInfo, None, None]:
+    def __get_possible_formats(self, name: str) -> Generator[FormatInfo, None, None]:
+        """
+        Rank candidate formats: signature matches, then extension matches,
+        then formats whose signature may appear anywhere and is found near the
+        start, then formats without signatures. Every other format is tried
+        last, e.g. for a misnamed archive whose signature is optional.
+        """
         extension = None
-        if suffix := Path(self.filename).suffix:
-            extension = suffix[1:]
-        for fmt in formats:
-            if extension and extension not in fmt.extensions:
-                continue
-            yield fmt
+        if suffix := Path(name).suffix:
+            extension = suffix[1:].lower()
+
+        signature_index = formats.signature_index
+        header = self.stream.read_head(signature_index.search_size)
+
+        by_extension = formats.by_extension.get(extension, ()) if extension else ()
+        extension_matches = {fmt.index for fmt in by_extension}
+
+        def allowed(fmt: FormatInfo) -> bool:
+            return FormatFlag.BY_EXT_ONLY_OPEN not in fmt.flags or fmt.index in extension_matches
+
+        tried = set()
+        candidates = chain(
+            (fmt for fmt in signature_index.match(header) if allowed(fmt)),
+            by_extension,
+            (fmt for fmt in signature_index.search(header) if allowed(fmt)),
+            (fmt for fmt in formats if not fmt.signatures and allowed(fmt)),
+            (fmt for fmt in formats if allowed(fmt)),
+        )
+        for fmt in candidates:
+            if fmt.index not in tried:
+                tried.add(fmt.index)
+                yield fmt
 
     def __try_open_as_format(self, fmt: FormatInfo) -> bool:
         log.debug("Trying to open %r as %s", self.filename, fmt.name)
@@ -234,19 +524,20 @@ class Archive:
             archive = CreateObject(fmt.clsid, IID_IInArchive)
         except RuntimeError:
             return False
-        self.stream.stream.seek(0, SEEK_SET)
+        self.stream.rewind()
         stream = self.stream.get_instance(IID_IInStream)
         open_callback = self.open_callback.get_instance(IID_IArchiveOpenCallback)
         result = archive.vtable.Open(archive, stream, ffi.NULL, open_callback)  # type: ignore
         if result & 0x80000000 or result == 1:
             ffi.release(archive)
+            self.open_callback.close_volumes()
             return False
 
         log.debug("%r opened successfully as %s", self.filename, fmt.name)
-        self.archive = archive
+        self._archive = archive
         return True
 
-    def __read_properties(self, get_num_props_fn, get_prop_fn) -> Dict[str, int]:
+    def __read_properties(self, get_num_props_fn, get_prop_fn) -> Tuple[Dict[str, int], Dict[int, VARTYPE]]:
         arc = self.archive
         with ffi.new("uint32_t *") as num_props_ptr:
             result = get_num_props_fn(arc, num_props_ptr)
@@ -255,6 +546,7 @@ class Archive:
             num_props = num_props_ptr[0]
 
         properties: Dict[str, int] = {}
+        property_types: Dict[int, VARTYPE] = {}
 
         name_ptr = ffi.new("wchar_t **")
         prop_id_ptr = ffi.new("PROPID *")
@@ -286,63 +578,147 @@ class Archive:
 
             # log.debug("Got property %d: %s (type: %s)", prop_id, prop_name, prop_type.name)
             properties[prop_name] = prop_id
+            property_types[prop_id] = prop_type
 
         ffi.release(var_type_ptr)
         ffi.release(prop_id_ptr)
         ffi.release(name_ptr)
 
-        return properties
+        return properties, property_types
 
     def __read_archive_properties(self) -> None:
         # log.debug("Reading archive property info.")
-        self._archive_properties = self.__read_properties(
+        self._archive_properties, self._archive_property_types = self.__read_properties(
             self.archive.vtable.GetNumberOfArchiveProperties,
             self.archive.vtable.GetArchivePropertyInfo,
         )
 
     def __read_archive_item_properties(self) -> None:
         # log.debug("Reading archive item property info.")
-        self._archive_item_properties = self.__read_properties(
+        self._archive_item_properties, self._archive_item_property_types = self.__read_properties(
             self.archive.vtable.GetNumberOfProperties,
             self.archive.vtable.GetPropertyInfo,
         )
 
+    def __read_num_items(self) -> int:
+        with ffi.new("uint32_t *") as number_of_items:
+            result = self.archive.vtable.GetNumberOfItems(self.archive, number_of_items)  # type: ignore
+            if result & 0x80000000:
+                raise RuntimeError(f"HRESULT(0x{result:#08x})")
+            return number_of_items[0]
+
     def __len__(self) -> int:
         if self.closed:
             raise ArchiveClosedError()
-        number_of_items = ffi.new("uint32_t *")
-        result = self.archive.vtable.GetNumberOfItems(self.archive, number_of_items)  # type: ignore
-        if result & 0x80000000:
-            raise RuntimeError()
-        return number_of_items[0]
+        return self._num_items
+
+    @property
+    def path_index(self) -> PathIndex:
+        """
+        Index of items by path, built from one pass over the item paths on first use.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if self._path_index is None:
+            snapshot = self.snapshot(("path", "is_dir"))
+            self._path_index = PathIndex(snapshot.column("path"), snapshot.column("is_dir"), case_sensitive=self.case_sensitive_paths)
+        return self._path_index
 
     def __getitem__(self, index: Union[int, PathLike, str]):
         if self.closed:
             raise ArchiveClosedError()
         if not isinstance(index, int):
-            index = PurePath(index)
-            if not self._item_indices_by_path:
-                self._item_indices_by_path = {PurePath(item.path): item.index for item in self}
             try:
-                return ArchiveItem(self, self._item_indices_by_path[index])
+                return ArchiveItem(self, self.path_index.lookup(index))
             except KeyError as exc:
                 raise FileNotFoundError() from exc
         if not (0 <= index < len(self)):
             raise IndexError()
         return ArchiveItem(self, index)
 
+    def __contains__(self, path: object) -> bool:
+        return path in self.path_index
+
+    def glob(self, pattern: Union[PathLike, str]) -> List["ArchiveItem"]:
+        """
+        Get the items whose paths match `pattern`, e.g. `"**/*.json"`.
+        """
+        return [ArchiveItem(self, index) for index in self.path_index.glob(pattern)]
+
+    def listdir(self, path: Union[PathLike, str] = "") -> List[str]:
+        """
+        List the names of the entries directly below directory `path`.
+        """
+        return self.path_index.listdir(path)
+
     def __iter__(self):
+        if self.closed:
+            raise ArchiveClosedError()
+        for index in range(self._num_items):
+            yield ArchiveItem(self, index)
+
+    def snapshot(self, props: Sequence[str] = ("path", "is_dir", "size", "mtime", "crc")) -> ArchiveSnapshot:
+        """
+        Read properties `props` of every item in one pass.
+
+        The result stores each property in a compact column, which is much
+        cheaper than reading the same attributes from each ArchiveItem.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+
+        prop_names = tuple(props)
+        prop_ids: List[int] = []
+        for name in prop_names:
+            try:
+                if not name.islower():
+                    raise KeyError(name)
+                prop_ids.append(ArchiveProps[name.upper()])
+            except KeyError as exc:
+                raise ValueError(f"Unknown archive item property: {name!r}") from exc
+
+        if self._listing is not None and all(name in self._listing.props for name in prop_names):
+            return self._listing.select(prop_names)
+
+        columns = [make_column(self._archive_item_property_types.get(prop_id)) for prop_id in prop_ids]
         num_items = len(self)
+
+        # The handler clears the PROPVARIANT before storing into it, so one buffer serves every call.
+        arc = self.archive
+        get_property = arc.vtable.GetProperty
+        prop_var = PropVariant()
+        cdata = prop_var.cdata
+        positions = tuple(enumerate(prop_ids))
         for index in range(num_items):
-            yield self[index]
+            for position, prop_id in positions:
+                result = get_property(arc, index, prop_id, cdata)
+                if result & 0x80000000:
+                    raise ArchiveError(f"HRESULT(0x{result:#08x})")
+                append_value(columns, position, cdata)
+
+        return ArchiveSnapshot(prop_names, columns, num_items)
 
     def close(self):
         """Explicitly close the Archive and free its resources."""
+        for reader in list(self._readers):
+            reader.close()
         if not self.closed:
-            self.archive.vtable.Close(self.archive)
-            ffi.release(self.archive)
+            self.__release_handler()
         self.closed = True
 
+    def __release_handler(self) -> None:
+        """Close the handler, and the streams and volumes it reads."""
+        if self._archive is not None:
+            self._archive.vtable.Close(self._archive)
+            ffi.release(self._archive)
+            self._archive = None
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.__close_container()
+        if self.open_callback is not None:
+            self.open_callback.close_volumes()
+
     def __enter__(self):
         return self
 
@@ -362,8 +738,42 @@ class Archive:
             item_indices.add(item.index)
         return sorted(item_indices)
 
-    def extract(self, dest_dir: PathLike, items: Optional[Sequence["ArchiveItem"]] = None, **kwargs) -> None:
-        """Extract files into a directory."""
+    def __begin_extract(self) -> None:
+        """
+        Claim the archive for an extraction; IInArchive can only run one at a time.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if not self._extract_lock.acquire(blocking=False):
+            raise ArchiveBusyError("Another extraction from this archive is in progress.")
+
+    def __end_extract(self) -> None:
+        self._extract_lock.release()
+
+    def extract(
+        self,
+        dest_dir: PathLike,
+        items: Optional[Sequence["ArchiveItem"]] = None,
+        *,
+        workers: int = 1,
+        progress: Optional[Progress] = None,
+        strip_components: int = 0,
+        restore_metadata: bool = True,
+        **kwargs,
+    ) -> None:
+        """
+        Extract files into a directory.
+
+        Destinations are planned from one snapshot of the archive, and all
+        directories are created before decoding starts. With
+        `restore_metadata`, item mtimes and modes are applied to the
+        extracted files and directories.
+
+        With `workers` > 1, items are split by solid block and packed size and
+        extracted by that many processes, each with its own handle on the
+        archive file. `progress(completed_bytes, total_bytes)` is called as
+        partitions finish.
+        """
         if self.closed:
             raise ArchiveClosedError()
 
@@ -373,52 +783,553 @@ class Archive:
 
         items_ptr: ffi.CData = ffi.NULL  # type: ignore
         num_items = 0xFFFFFFFF
+        indices: Optional[List[int]] = None
         if items:
             indices = self.__to_item_indices(items)
             items_ptr = ffi.new("uint32_t []", indices)
             num_items = len(indices)
 
-        archive = self.archive
-        extract_callback = ArchiveExtractToDirectoryCallback(archive=self, directory=dest_dir, password=self.password, **kwargs)
-        extract_callback_instance = extract_callback.get_instance(IID_IArchiveExtractCallback)
-        result = archive.vtable.Extract(archive, items_ptr, num_items, 0, extract_callback_instance)  # type: ignore
+        snapshot = self.snapshot(PLAN_PROPS)
+        plan = ExtractPlan(snapshot, dest_dir, indices, strip_components=strip_components)
+        plan.create_directories()
+
+        if workers > 1 and self._reopenable():
+            # Workers only restore their files: a directory's mode or times can't be set while others still write into it.
+            if extract_parallel(
+                self,
+                dest_dir,
+                indices,
+                workers,
+                progress,
+                strip_components=strip_components,
+                restore_metadata=restore_metadata,
+                restore_directories=False,
+                **kwargs,
+            ):
+                if restore_metadata:
+                    plan.restore_metadata()
+                return
+
+        extract_callback = ArchiveExtractToDirectoryCallback(self, plan, self.password, restore_metadata=restore_metadata, **kwargs)
+        self.__begin_extract()
+        try:
+            result = self.__call_extract("extract", items_ptr, num_items, False, extract_callback)
+        finally:
+            self.__end_extract()
         extract_callback.cleanup()
         if result & 0x80000000:
             raise ExtractError(f"HRESULT(0x{result:#08x})")
         if extract_callback.last_op_result != OperationResult.OK:
             raise ExtractError()
+        if progress is not None:
+            sizes = snapshot.column("size")
+            total_size = sum(sizes[index] or 0 for index in (range(len(sizes)) if indices is None else indices))
+            progress(total_size, total_size)
 
-    def read_item_bytes(self, item: "ArchiveItem", *, password: Union[None, str, bytes] = None) -> bytes:
-        """Read `item` as bytes."""
+    def test(
+        self,
+        items: Optional[Sequence["ArchiveItem"]] = None,
+        *,
+        workers: int = 1,
+        progress: Optional[Progress] = None,
+    ) -> Dict[int, OperationResult]:
+        """
+        Check the integrity of items by decoding them without writing anything.
+
+        Returns the OperationResult of each tested item, by index. With
+        `workers` > 1, items are split between processes as in `extract`.
+        """
         if self.closed:
             raise ArchiveClosedError()
-        if item.archive() != self:
-            raise ValueError()
 
-        item_ptr = ffi.new("uint32_t*", item.index)
+        if not items and items is not None:
+            return {}
+
+        items_ptr: ffi.CData = ffi.NULL  # type: ignore
+        num_items = 0xFFFFFFFF
+        indices: Optional[List[int]] = None
+        if items:
+            indices = self.__to_item_indices(items)
+            items_ptr = ffi.new("uint32_t []", indices)
+            num_items = len(indices)
+
+        if workers > 1 and self._reopenable():
+            results = verify_parallel(self, indices, workers, progress)
+            if results is not None:
+                return {index: OperationResult(result) for index, result in sorted(results.items())}
+
+        test_callback = ArchiveTestCallback(self.password)
+        self.__begin_extract()
+        try:
+            result = self.__call_extract("test", items_ptr, num_items, True, test_callback)
+        finally:
+            self.__end_extract()
+        if result & 0x80000000:
+            raise ExtractError(f"HRESULT(0x{result:#08x})")
+        if progress is not None:
+            sizes = self.snapshot(("size",)).column("size")
+            total_size = sum(sizes[index] or 0 for index in (range(len(sizes)) if indices is None else indices))
+            progress(total_size, total_size)
+        return {index: OperationResult(result) for index, result in sorted(test_callback.results.items())}
+
+    def update(
+        self,
+        add: Optional[Mapping[str, Any]] = None,
+        delete: Iterable[Union[PathLike, str, "ArchiveItem"]] = (),
+        replace: Optional[Mapping[str, Any]] = None,
+        **settings: Any,
+    ) -> None:
+        """
+        Add, delete and replace items, rewriting the archive file.
+
+        `add` and `replace` map item paths to sources, as taken by
+        `ArchiveWriter.add`; deleting a directory deletes everything in it.
+        Untouched items are copied without being decoded or recompressed,
+        except where the handler must repack a solid block that lost items.
+        `settings` (e.g. `level` or `threads`) are ArchiveWriter settings for
+        the new items.
+
+        The new archive is written next to the old one and moved over it, and
+        then reopened: ArchiveItems obtained before the update are stale.
+        """
+        from .writer import ArchiveWriter  # pylint: disable=import-outside-toplevel
+
+        if self.closed:
+            raise ArchiveClosedError()
+        # The handler may not be open yet (listed from a cache); opening it finds the volumes.
+        if self.archive is not None and len(self.volumes) > 1:
+            raise UpdateError("Multi-volume archives can't be updated.")
+        add = dict(add or {})
+        replace = dict(replace or {})
+        path_index = self.path_index
+        for path in add:
+            if path in path_index or path_index.is_dir(path):
+                raise FileExistsError(path)
+
+        paths = self.snapshot(("path",)).column("path")
+        removed = {self[path].index for path in replace}
+        for target in delete:
+            if isinstance(target, ArchiveItem):
+                removed.update(self.__to_item_indices([target]))
+                continue
+            if target not in path_index and not path_index.is_dir(target):
+                raise FileNotFoundError(target)
+            # A directory takes everything below it along.
+            prefix = path_index.key(target) + "/"
+            removed.update(index for index in range(len(paths)) if paths[index] is not None and (path_index.key(paths[index]) + "/").startswith(prefix))
+
+        filename = os.fspath(self.filename)
+        fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), prefix=f".{os.path.basename(filename)}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            self.__begin_extract()
+            try:
+                writer = ArchiveWriter(temp_name, password=self.password, base=self, **settings)
+                for item in self:
+                    if item.index not in removed:
+                        writer.copy(item)
+                for path, source in chain(replace.items(), add.items()):
+                    writer.add(path, source)
+                writer.close()
+            finally:
+                self.__end_extract()
+            os.chmod(temp_name, stat.S_IMODE(os.stat(filename).st_mode))
+            self.__reload(temp_name)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+    def __reload(self, replacement: str) -> None:
+        """
+        Close the handler, move `replacement` over the archive file and list it again.
+        """
+        for reader in list(self._readers):
+            reader.close()
+        self.__release_handler()
+        self.closed = True
+        os.replace(replacement, self.filename)
+        self._path_index = None
+        self._listing = None
+        self.__load()
+
+    def __call_extract(self, kind: str, items_ptr: ffi.CData, num_items: int, test_mode: bool, callback: ArchiveExtractCallback) -> int:
+        """
+        Run IInArchive.Extract with `callback`, reporting it to the instrument as a `kind` operation.
 
-        item_stream = BytesIO()
+        The caller must have claimed the archive.
+        """
         archive = self.archive
+        instrument = self.instrument
+        if instrument is None:
+            return archive.vtable.Extract(archive, items_ptr, num_items, int(test_mode), callback.get_instance(IID_IArchiveExtractCallback))  # type: ignore
+
+        instrument_extract_callback(callback, instrument)
+        instrument.operation_started(kind)
+        start = perf_counter()
+        try:
+            return archive.vtable.Extract(archive, items_ptr, num_items, int(test_mode), callback.get_instance(IID_IArchiveExtractCallback))  # type: ignore
+        finally:
+            instrument.operation_finished(kind, perf_counter() - start)
+
+    def __extract_item_to_stream(self, item: "ArchiveItem", item_stream: Any, password: Union[None, str, bytes]) -> None:
+        """Extract `item` into the writable `item_stream`. The caller must have claimed the archive."""
+        if password is None:
+            password = self.password
+
+        item_ptr = ffi.new("uint32_t*", item.index)
+
         extract_callback = ArchiveExtractToStreamCallback(item_stream, item.index, password)
-        extract_callback_instance = extract_callback.get_instance(IID_IArchiveExtractCallback)
-        result = archive.vtable.Extract(archive, item_ptr, 1, 0, extract_callback_instance)  # type: ignore
+        result = self.__call_extract("read", item_ptr, 1, False, extract_callback)
         extract_callback.cleanup()
+        if isinstance(item_stream, SinkOutStream) and item_stream.error is not None:
+            raise item_stream.error
         if result & 0x80000000:
             raise ExtractError(f"HRESULT(0x{result:#08x})")
         if extract_callback.last_op_result != OperationResult.OK:
             raise ExtractError()
 
-        return item_stream.getvalue()
+    def read_item_bytes(self, item: "ArchiveItem", *, password: Union[None, str, bytes] = None) -> bytearray:
+        """
+        Read `item` into a bytearray, from the content cache if the archive has one.
+
+        Contents are decoded straight into the bytearray that is returned,
+        presized from the item's `size`, rather than copied into bytes
+        afterwards. Every read gets a bytearray of its own; the cache keeps
+        an immutable copy.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if item.archive() != self:
+            raise ValueError()
+
+        cache = self.content_cache
+        if cache is None:
+            return self.__read_item_bytes(item, password)
+        if self._identity is None:
+            self._identity = archive_identity(self.filename)
+            if self._identity is None:
+                return self.__read_item_bytes(item, password)
+        key = (self._identity, item.index, item.crc)
+        cached = cache.get(key)
+        if cached is not None:
+            return bytearray(cached)
+        data = self.__read_item_bytes(item, password)
+        cache.put(key, bytes(data))
+        return data
+
+    def __read_item_bytes(self, item: "ArchiveItem", password: Union[None, str, bytes]) -> bytearray:
+        size = item.size
+        if self.native_streams and size is not None:
+            # Decoded output goes straight into the bytearray, without calling back into Python.
+            out_stream = NativeBufferOutStream(bytearray(size))
+            self.__begin_extract()
+            try:
+                self.__extract_item_to_stream(item, out_stream, password)
+                return out_stream.getvalue()
+            finally:
+                self.__end_extract()
+                out_stream.close()
+
+        accumulator = ByteAccumulator(size)
+        self.__begin_extract()
+        try:
+            self.__extract_item_to_stream(item, SinkOutStream(accumulator.write), password)
+        finally:
+            self.__end_extract()
+
+        return accumulator.getvalue()
+
+    def feed_item(self, item: "ArchiveItem", sink: Sink, *, password: Union[None, str, bytes] = None) -> None:
+        """
+        Extract `item`, passing each block of output to `sink` as it is decoded.
+
+        `sink` receives memoryviews of 7-zip's output buffer, valid only for the
+        duration of the call, e.g. `hashlib.sha256().update` or `socket.sendall`.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if item.archive() != self:
+            raise ValueError()
+
+        self.__begin_extract()
+        try:
+            self.__extract_item_to_stream(item, SinkOutStream(sink), password)
+        finally:
+            self.__end_extract()
+
+    def open_item(
+        self,
+        item: "ArchiveItem",
+        *,
+        password: Union[None, str, bytes] = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> BufferedReader:
+        """
+        Open `item` for streaming reads.
+
+        The item is decoded on a worker thread, at most `buffer_size` bytes ahead
+        of the reader. The archive can't run other extractions until the returned
+        stream is exhausted or closed.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if item.archive() != self:
+            raise ValueError()
+
+        reader: Union[ArchiveItemReader, ArchiveItemStreamReader]
+        self.__begin_extract()
+        try:
+            stream = self.__get_item_in_stream(item.index)
+        except BaseException:
+            self.__end_extract()
+            raise
+        if stream is not None:
+            reader = ArchiveItemStreamReader(item, stream, self.__end_extract)
+        else:
+            self.__end_extract()
+
+            def extract(ring) -> None:
+                try:
+                    self.__extract_item_to_stream(item, ring, password)
+                finally:
+                    self.__end_extract()
+
+            reader = ArchiveItemReader(item, self.__begin_extract, extract, buffer_size)
+        self._readers.add(reader)
+        return BufferedReader(reader)
+
+    def __get_item_in_stream(self, index: int) -> Optional[ffi.CData]:
+        """
+        Get a seekable stream of item `index`'s bytes in place, if the handler offers one.
+
+        Handlers only offer these for items stored without compression or
+        encryption. The caller must have claimed the archive.
+        """
+        getter = QueryInterface(self.archive, IID_IInArchiveGetStream)
+        if getter is None:
+            return None
+        try:
+            stream_ptr = ffi.new(f"{iid_opaque_impl_struct_name(IID_ISequentialInStream)} **")
+            result = getter.vtable.GetStream(getter, index, stream_ptr)  # type: ignore
+            if result & 0x80000000 or stream_ptr[0] == ffi.NULL:
+                return None
+            stream = ffi.gc(stream_ptr[0], ReleaseObject)
+            try:
+                return QueryInterface(stream, IID_IInStream)
+            finally:
+                ffi.release(stream)
+        finally:
+            ffi.release(getter)
+
+    def __main_subfile(self) -> Optional[int]:
+        """
+        Get the index of the item holding the archive's contents (e.g. the tar of a .tar.gz), if it has one.
+        """
+        arc = self.archive
+        prop_var = PropVariant()
+        result = arc.vtable.GetArchiveProperty(arc, ArchiveProps.MAIN_SUBFILE, prop_var.cdata)  # type: ignore
+        if result & 0x80000000:
+            raise ArchiveError(f"HRESULT(0x{result:#08x})")
+        if prop_var.has_value:
+            return prop_var.as_int()
+        # Like 7-zip, take the only item of single-item archives (e.g. gzip, xz).
+        return 0 if len(self) == 1 else None
+
+    def open_nested(
+        self,
+        item: Union[None, int, PathLike, str, "ArchiveItem"] = None,
+        *,
+        password: Union[None, str, bytes] = None,
+        max_memory: int = 64 << 20,
+    ) -> "NestedArchive":
+        """
+        Open the archive inside `item` without extracting it to disk.
+
+        `item` defaults to the archive's main subfile, e.g. the tar of a
+        .tar.gz. The inner handler reads the item in place where this handler
+        allows (stored items), and otherwise as it is decoded, once: decoded
+        bytes are kept for seeks back, in memory up to `max_memory` bytes, then
+        in a temporary file. `password` is used for the item and the inner
+        archive, and defaults to this archive's. This archive can't run other
+        extractions until the nested one is closed.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if item is None:
+            index = self.__main_subfile()
+            if index is None:
+                raise ValueError(f"{self.filename}: The archive has no main subfile.")
+            item = self[index]
+        elif not isinstance(item, ArchiveItem):
+            item = self[item]
+        if item.archive() != self:
+            raise NotThisArchiveError()
+        if password is None:
+            password = self.password
+        nested_item = item
+
+        def open_stream() -> Union[NativeItemInStream, SpoolInStream]:
+            self.__begin_extract()
+            try:
+                stream = self.__get_item_in_stream(nested_item.index)
+            except BaseException:
+                self.__end_extract()
+                raise
+            if stream is not None:
+                return NativeItemInStream(stream, self.__end_extract)
+            self.__end_extract()
+            return SpoolInStream(self.open_item(nested_item, password=password), max_memory)
+
+        return NestedArchive(self, item, open_stream, password=password)
+
+    def read_item_range(self, item: "ArchiveItem", offset: int, length: int, *, password: Union[None, str, bytes] = None) -> bytes:
+        """
+        Read up to `length` bytes of `item`, starting at `offset`.
+
+        Items the handler can read in place are read directly from the archive;
+        others are decoded up to the end of the range, discarding what comes before it.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if item.archive() != self:
+            raise ValueError()
+        if offset < 0 or length < 0:
+            raise ValueError("Negative offset or length")
+        if not length:
+            return b""
+
+        self.__begin_extract()
+        try:
+            stream = self.__get_item_in_stream(item.index)
+            if stream is not None:
+                reader = ArchiveItemStreamReader(item, stream, lambda: None)
+                try:
+                    reader.seek(offset)
+                    data = bytearray()
+                    while len(data) < length:
+                        chunk = reader.read(length - len(data))
+                        if not chunk:
+                            break
+                        data += chunk
+                    return bytes(data)
+                finally:
+                    reader.close()
+
+            accumulator = RangeAccumulator(offset, length)
+            try:
+                self.__extract_item_to_stream(item, SinkOutStream(accumulator.write), password)
+            except RangeComplete:
+                pass
+            return accumulator.getvalue()
+        finally:
+            self.__end_extract()
+
+    def iter_contents(
+        self,
+        items: Iterable["ArchiveItem"],
+        *,
+        password: Union[None, str, bytes] = None,
+        max_batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Generator[Tuple["ArchiveItem", bytearray], None, None]:
+        """
+        Read the contents of many items, yielding `(item, contents)` in decode order.
+
+        Items are grouped by solid block so that each block is decoded once,
+        however many of its items are requested. Groups are extracted in
+        batches of about `max_batch_size` bytes, and the archive is free for
+        other use between batches. Contents are bytearrays, as from
+        `read_item_bytes`.
+        """
+        if self.closed:
+            raise ArchiveClosedError()
+        if password is None:
+            password = self.password
+
+        items_by_index: Dict[int, ArchiveItem] = {}
+        for item in items:
+            if item.archive() != self:
+                raise NotThisArchiveError()
+            items_by_index[item.index] = item
+
+        sizes = {index: item.size for index, item in items_by_index.items()}
+        blocks = {index: item.block for index, item in items_by_index.items()}
+        groups = group_by_block(list(items_by_index), blocks)
+
+        for batch in batch_groups(groups, sizes, max_batch_size):
+            # Groups are ordered by their first index, so a batch may not be; Extract wants ascending indices.
+            batch_ptr = ffi.new("uint32_t []", sorted(batch))
+            extract_callback = ArchiveExtractToBuffersCallback({index: sizes[index] for index in batch}, password)
+            self.__begin_extract()
+            try:
+                result = self.__call_extract("read", batch_ptr, len(batch), False, extract_callback)
+            finally:
+                self.__end_extract()
+            if result & 0x80000000:
+                raise ExtractError(f"HRESULT(0x{result:#08x})")
+            for index, op_result, accumulator in extract_callback.completed:
+                if op_result != OperationResult.OK:
+                    raise ExtractError(f"{items_by_index[index].path}: {OperationResult(op_result).name}")
+                yield items_by_index[index], accumulator.getvalue()
+
+    def read_many(
+        self,
+        items: Iterable["ArchiveItem"],
+        *,
+        password: Union[None, str, bytes] = None,
+        max_batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> List[Tuple["ArchiveItem", bytearray]]:
+        """Read the contents of many items at once, in decode order. See `iter_contents`."""
+        return list(self.iter_contents(items, password=password, max_batch_size=max_batch_size))
 
     def read_item_text(self, item: "ArchiveItem", encoding: str = "utf-8", *, password: Union[None, str, bytes] = None) -> str:
         """Read `item` as text."""
         return str(self.read_item_bytes(item, password=password), encoding=encoding)
 
 
+class NestedArchive(Archive):
+    """
+    An archive inside an item of another archive, opened by `Archive.open_nested`.
+
+    Its `filename` is the item's path, which only serves to pick formats.
+    """
+
+    def __init__(self, outer: Archive, item: "ArchiveItem", open_stream: Callable[[], Any], *, password: Union[None, str, bytes] = None) -> None:
+        self.outer = outer
+        self.item = item
+        self._open_stream = open_stream
+        # Items of single-stream formats (e.g. gzip) may have no name; 7-zip then drops the archive's extension.
+        self._subarchive_name = item.path or Path(outer.filename).stem
+        super().__init__(
+            self._subarchive_name,
+            password=password,
+            cache_item_properties=outer.cache_item_properties,
+            case_sensitive_paths=outer.case_sensitive_paths,
+            instrument=outer.instrument,
+        )
+
+    def _open_in_stream(self) -> Any:
+        return self._open_stream()
+
+    def _reopenable(self) -> bool:
+        return False
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        raise UpdateError("Nested archives can't be updated.")
+
+
 class ArchiveItem:
-    """An item inside an Archive."""
+    """
+    An item inside an Archive.
+
+    Item properties are read from the archive on first access and remembered,
+    unless the archive was opened with `cache_item_properties=False`.
+    """
+
+    __slots__ = ("_properties", "_cache", "archive", "index")
 
     _properties: Dict[str, int]
+    _cache: Optional[Dict[str, Any]]
     archive: ReferenceType
     index: int
 
@@ -426,16 +1337,43 @@ class ArchiveItem:
         if not (0 <= index < len(archive)):
             raise IndexError
         self._properties = archive._archive_item_properties
+        self._cache = {} if archive.cache_item_properties else None
         self.archive = ref(archive)
         self.index = index
 
-    def read_bytes(self, *, password: Union[None, str, bytes] = None) -> bytes:
-        """Read the contents of the item as a bytes."""
+    def invalidate(self) -> None:
+        """Forget any remembered property values."""
+        if self._cache:
+            self._cache.clear()
+
+    def read_bytes(self, *, password: Union[None, str, bytes] = None) -> bytearray:
+        """Read the contents of the item as a bytearray (see `Archive.read_item_bytes`)."""
         archive = self.archive()
         if not archive or archive.closed:
             raise ArchiveClosedError()
         return archive.read_item_bytes(self, password=password)
 
+    def feed(self, sink: Sink, *, password: Union[None, str, bytes] = None) -> None:
+        """Pass the contents of the item to `sink`, one block at a time."""
+        archive = self.archive()
+        if not archive or archive.closed:
+            raise ArchiveClosedError()
+        archive.feed_item(self, sink, password=password)
+
+    def open(self, *, password: Union[None, str, bytes] = None, buffer_size: int = DEFAULT_BUFFER_SIZE) -> BufferedReader:
+        """Open the item for reading as a seekable binary stream, without holding it all in memory."""
+        archive = self.archive()
+        if not archive or archive.closed:
+            raise ArchiveClosedError()
+        return archive.open_item(self, password=password, buffer_size=buffer_size)
+
+    def read_range(self, offset: int, length: int, *, password: Union[None, str, bytes] = None) -> bytes:
+        """Read up to `length` bytes of the item, starting at `offset`."""
+        archive = self.archive()
+        if not archive or archive.closed:
+            raise ArchiveClosedError()
+        return archive.read_item_range(self, offset, length, password=password)
+
     def read_text(self, encoding: str = "utf-8", *, password: Union[None, str, bytes] = None) -> str:
         """Read the contents of the item as a string."""
         archive = self.archive()
@@ -443,10 +1381,13 @@ class ArchiveItem:
             raise ArchiveClosedError()
         return archive.read_item_text(self, encoding, password=password)
 
-    def __get_prop_impl(self, prop_id: int) -> Any:
+    def __get_prop_impl(self, name: str, prop_id: int) -> Any:
         archive = self.archive()
         if not archive or archive.closed:
             raise ArchiveClosedError()
+        listing = archive._listing
+        if listing is not None and name in listing.props:
+            return listing.column(name)[self.index]
         arc = archive.archive
         prop_var = PropVariant()
         result = arc.vtable.GetProperty(arc, self.index, prop_id, prop_var.cdata)
@@ -455,10 +1396,18 @@ class ArchiveItem:
         return prop_var.as_any()
 
     def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        cache = self._cache
+        if cache is not None and name in cache:
+            return cache[name]
         try:
             if not name.islower():
                 raise ValueError()
             prop_id = ArchiveProps[name.upper()]
-            return self.__get_prop_impl(prop_id)
-        except ValueError as exc:
-            raise AttributeError from exc
+        except (KeyError, ValueError) as exc:
+            raise AttributeError(name) from exc
+        value = self.__get_prop_impl(name, prop_id)
+        if cache is not None:
+            cache[name] = value
+        return value
@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: direct access to codecs
+"""
+
+from enum import IntEnum
+from threading import Lock
+from types import TracebackType
+from typing import Any, BinaryIO, Dict, Iterable, List, Mapping, Optional, Type, Union
+
+from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
+from .iids import (
+    CreateObject,
+    IID_ICompressCoder,
+    IID_ICompressFilter,
+    IID_ICompressSetCoderMt,
+    IID_ICompressSetCoderProperties,
+    IID_ICompressSetDecoderProperties2,
+    IID_ICompressWriteCoderProperties,
+    IID_ISequentialInStream,
+    IID_ISequentialOutStream,
+    QueryInterface,
+)
+from .method_registry import MethodInfo, methods
+from .propvariant import VARTYPE, encode_propvariant
+from .stream import (
+    NativeMemInStream,
+    NativeMemOutStream,
+    PyOutStream,
+    PySequentialInStream,
+)
+
+__all__ = (
+    "CodecError",
+    "CoderProp",
+    "Compressor",
+    "Decompressor",
+    "compress",
+    "compress_many",
+    "decompress",
+)
+
+# Filters process data in place, in chunks of at most this size.
+_FILTER_CHUNK_SIZE = 1 << 30
+
+
+class CodecError(RuntimeError):
+    pass
+
+
+class CoderProp(IntEnum):
+    """
+    Coder property ids, for ICompressSetCoderProperties.
+    """
+
+    DEFAULT_PROP = 0
+    DICTIONARY_SIZE = 1
+    USED_MEMORY_SIZE = 2
+    ORDER = 3
+    BLOCK_SIZE = 4
+    POS_STATE_BITS = 5
+    LIT_CONTEXT_BITS = 6
+    LIT_POS_BITS = 7
+    NUM_FAST_BYTES = 8
+    MATCH_FINDER = 9
+    MATCH_FINDER_CYCLES = 10
+    NUM_PASSES = 11
+    ALGORITHM = 12
+    NUM_THREADS = 13
+    END_MARKER = 14
+    LEVEL = 15
+    REDUCE_SIZE = 16
+    EXPECTED_DATA_SIZE = 17
+    BLOCK_SIZE2 = 18
+    CHECK_SIZE = 19
+    FILTER = 20
+    MEM_USE = 21
+
+
+_UI8_PROPS = (CoderProp.REDUCE_SIZE, CoderProp.EXPECTED_DATA_SIZE, CoderProp.MEM_USE)
+
+# Telling these encoders the input size shrinks the dictionary they allocate
+# to fit it; the properties written beforehand still decode the result.
+_SIZED_METHODS = ("LZMA", "LZMA2")
+
+
+def _find_method(method: Union[str, MethodInfo]) -> MethodInfo:
+    if isinstance(method, MethodInfo):
+        info = method
+    else:
+        for info in methods:
+            if info.name.lower() == method.lower():
+                break
+        else:
+            raise CodecError(f"Unknown method: {method!r}")
+    if info.num_streams != 1:
+        raise CodecError(f"{info.name} codes {info.num_streams} streams; only single-stream methods can be used directly.")
+    return info
+
+
+def _check(result: int, what: str) -> None:
+    if result & 0x80000000:
+        raise CodecError(f"{what}: HRESULT(0x{result:#08x})")
+
+
+def _coder_prop_id(name: str) -> CoderProp:
+    try:
+        return CoderProp[name.upper()]
+    except KeyError as exc:
+        raise TypeError(f"Unknown coder property: {name!r}") from exc
+
+
+def _set_coder_properties(coder: ffi.CData, props: Mapping[CoderProp, Any]) -> None:
+    if not props:
+        return
+    setter = QueryInterface(coder, IID_ICompressSetCoderProperties)
+    if setter is None:
+        raise CodecError("This coder takes no properties.")
+    try:
+        prop_ids = ffi.new("PROPID[]", list(props))
+        values = ffi.new("PROPVARIANT[]", len(props))
+        try:
+            for value, (prop_id, prop) in zip(values, props.items()):
+                encode_propvariant(value, prop, VARTYPE.VT_UI8 if prop_id in _UI8_PROPS else None)
+            result = setter.vtable.SetCoderProperties(setter, prop_ids, values, len(props))  # type: ignore
+        finally:
+            for value in values:
+                if value.vt == VARTYPE.VT_BSTR:
+                    lib.SysFreeString(value.bstrVal)
+        _check(result, "Invalid coder properties")
+    finally:
+        ffi.release(setter)
+
+
+def _set_threads(coder: ffi.CData, threads: Optional[int]) -> None:
+    if threads is None:
+        return
+    setter = QueryInterface(coder, IID_ICompressSetCoderMt)
+    if setter is None:
+        return
+    try:
+        _check(setter.vtable.SetNumberOfThreads(setter, threads), "SetNumberOfThreads")  # type: ignore
+    finally:
+        ffi.release(setter)
+
+
+def _write_coder_properties(coder: ffi.CData) -> bytes:
+    writer = QueryInterface(coder, IID_ICompressWriteCoderProperties)
+    if writer is None:
+        return b""
+    stream = NativeMemOutStream(16)
+    try:
+        _check(writer.vtable.WriteCoderProperties(writer, stream.get_instance(IID_ISequentialOutStream)), "WriteCoderProperties")  # type: ignore
+        return stream.getvalue()
+    finally:
+        stream.close()
+        ffi.release(writer)
+
+
+def _filter(coder: ffi.CData, data) -> bytes:
+    """
+    Run filter `coder` over a copy of `data`.
+
+    Filters leave a few trailing bytes they can't decide on (e.g. a partial
+    x86 instruction) as they are, like 7-zip does at the end of a stream.
+    """
+    buffer = bytearray(data)
+    _check(coder.vtable.Init(coder), "Filter Init")  # type: ignore
+    base = ffi.from_buffer(buffer)
+    try:
+        position = 0
+        while position < len(buffer):
+            size = min(len(buffer) - position, _FILTER_CHUNK_SIZE)
+            count = coder.vtable.Filter(coder, base + position, size)  # type: ignore
+            if count == 0 or count > size:
+                break
+            position += count
+    finally:
+        ffi.release(base)
+    return bytes(buffer)
+
+
+def _code(coder: ffi.CData, in_stream: Any, out_stream: Any, in_size: Optional[int], out_size: Optional[int]) -> None:
+    result = coder.vtable.Code(  # type: ignore
+        coder,
+        in_stream.get_instance(IID_ISequentialInStream),
+        out_stream.get_instance(IID_ISequentialOutStream),
+        ffi.NULL if in_size is None else ffi.new("uint64_t *", in_size),
+        ffi.NULL if out_size is None else ffi.new("uint64_t *", out_size),
+        ffi.NULL,
+    )
+    for stream in (in_stream, out_stream):
+        error = getattr(stream, "error", None)
+        if error is not None:
+            raise CodecError(str(error)) from error
+    # Decoders report corrupt data with S_FALSE.
+    if result & 0x80000000 or result == 1:
+        raise CodecError(f"HRESULT(0x{result:#08x})")
+
+
+class _Coder:
+    """
+    One 7-zip coder object: an ICompressCoder, or an ICompressFilter for filter methods.
+
+    A coder runs one operation at a time; concurrent calls wait for each other.
+    """
+
+    def __init__(self, clsid, method: MethodInfo) -> None:
+        self.method = method
+        self._lock = Lock()
+        try:
+            self._coder: Optional[ffi.CData] = CreateObject(clsid, IID_ICompressFilter if method.is_filter else IID_ICompressCoder)
+        except RuntimeError as exc:
+            raise CodecError(f"Can't create a {method.name} coder.") from exc
+
+    @property
+    def coder(self) -> ffi.CData:
+        if self._coder is None:
+            raise ValueError("Coder is closed.")
+        return self._coder
+
+    def _run(self, data, out_size: Optional[int], capacity: int) -> bytes:
+        if self.method.is_filter:
+            return _filter(self.coder, data)
+        in_stream = NativeMemInStream(data)
+        out_stream = NativeMemOutStream(capacity)
+        try:
+            _code(self.coder, in_stream, out_stream, len(in_stream.base), out_size)
+            return out_stream.getvalue()
+        finally:
+            in_stream.close()
+            out_stream.close()
+
+    def _run_stream(self, source: BinaryIO, dest: BinaryIO, out_size: Optional[int]) -> None:
+        if self.method.is_filter:
+            dest.write(_filter(self.coder, source.read()))
+            return
+        _code(self.coder, PySequentialInStream(source), PyOutStream(dest), None, out_size)
+
+    def close(self) -> None:
+        """Release the coder."""
+        with self._lock:
+            if self._coder is not None:
+                ffi.release(self._coder)
+                self._coder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+class Compressor(_Coder):
+    """
+    Encoder of a 7-zip method, reusable for any number of buffers and streams.
+
+    `props` are coder properties by lower case CoderProp name, e.g.
+    `level=9`, `dictionary_size=1 << 24` or `end_marker=True`; `threads` is
+    the number of encoder threads, for methods that can use several. Each
+    call produces one complete raw stream, without any container; decoding
+    it may take the coder properties in `properties`.
+    """
+
+    def __init__(self, method: Union[str, MethodInfo] = "LZMA2", *, threads: Optional[int] = None, **props: Any) -> None:
+        info = _find_method(method)
+        if info.encoder is None:
+            raise CodecError(f"{info.name} has no encoder.")
+        super().__init__(info.encoder, info)
+        self._props: Dict[CoderProp, Any] = {_coder_prop_id(name): value for name, value in props.items()}
+        if threads is not None and not info.is_filter:
+            self._props.setdefault(CoderProp.NUM_THREADS, threads)
+        self._sized = info.name in _SIZED_METHODS and CoderProp.REDUCE_SIZE not in self._props
+        try:
+            _set_coder_properties(self.coder, self._props)
+            _set_threads(self.coder, threads)
+            self.properties = _write_coder_properties(self.coder)
+        except BaseException:
+            self.close()
+            raise
+
+    def compress(self, data) -> bytes:
+        """Compress a bytes-like object."""
+        with self._lock:
+            if self._sized:
+                _set_coder_properties(self.coder, {**self._props, CoderProp.REDUCE_SIZE: memoryview(data).nbytes})
+            return self._run(data, None, memoryview(data).nbytes // 4 + 256)
+
+    def compress_many(self, buffers: Iterable) -> List[bytes]:
+        """Compress each of `buffers` into its own stream, with this one coder."""
+        return [self.compress(data) for data in buffers]
+
+    def compress_stream(self, source: BinaryIO, dest: BinaryIO) -> None:
+        """Compress everything read from `source`, writing it to `dest`."""
+        with self._lock:
+            if self._sized:
+                _set_coder_properties(self.coder, self._props)
+            self._run_stream(source, dest, None)
+
+
+class Decompressor(_Coder):
+    """
+    Decoder of a 7-zip method, reusable for any number of buffers and streams.
+
+    `properties` are the coder properties of the Compressor that produced
+    the data. If they are not given, they are those a Compressor writes
+    with the same `props`.
+    """
+
+    def __init__(
+        self,
+        method: Union[str, MethodInfo] = "LZMA2",
+        *,
+        properties: Optional[bytes] = None,
+        threads: Optional[int] = None,
+        **props: Any,
+    ) -> None:
+        info = _find_method(method)
+        if info.decoder is None:
+            raise CodecError(f"{info.name} has no decoder.")
+        if properties is None:
+            properties = b""
+            if info.encoder is not None:
+                with Compressor(info, **props) as compressor:
+                    properties = compressor.properties
+        super().__init__(info.decoder, info)
+        self.properties = properties
+        try:
+            if properties:
+                setter = QueryInterface(self.coder, IID_ICompressSetDecoderProperties2)
+                if setter is None:
+                    raise CodecError(f"{info.name} decoders take no properties.")
+                try:
+                    _check(setter.vtable.SetDecoderProperties2(setter, properties, len(properties)), "Invalid decoder properties")  # type: ignore
+                finally:
+                    ffi.release(setter)
+            _set_threads(self.coder, threads)
+        except BaseException:
+            self.close()
+            raise
+
+    def decompress(self, data, size: Optional[int] = None) -> bytes:
+        """
+        Decompress a bytes-like object.
+
+        Give the decompressed `size` where the stream has no end marker (e.g. LZMA's, by default).
+        """
+        with self._lock:
+            return self._run(data, size, memoryview(data).nbytes * 4 if size is None else size)
+
+    def decompress_stream(self, source: BinaryIO, dest: BinaryIO, size: Optional[int] = None) -> None:
+        """Decompress everything read from `source`, writing it to `dest`."""
+        with self._lock:
+            self._run_stream(source, dest, size)
+
+
+def compress(data, method: Union[str, MethodInfo] = "LZMA2", *, threads: Optional[int] = None, **props: Any) -> bytes:
+    """
+    Compress a bytes-like object into a raw `method` stream.
+
+    `decompress` with the same `method` and `props` decodes it.
+    """
+    with Compressor(method, threads=threads, **props) as compressor:
+        return compressor.compress(data)
+
+
+def compress_many(buffers: Iterable, method: Union[str, MethodInfo] = "LZMA2", *, threads: Optional[int] = None, **props: Any) -> List[bytes]:
+    """
+    Compress many bytes-like objects into separate raw streams, with a single coder.
+    """
+    with Compressor(method, threads=threads, **props) as compressor:
+        return compressor.compress_many(buffers)
+
+
+def decompress(
+    data,
+    method: Union[str, MethodInfo] = "LZMA2",
+    *,
+    size: Optional[int] = None,
+    properties: Optional[bytes] = None,
+    threads: Optional[int] = None,
+    **props: Any,
+) -> bytes:
+    """
+    Decompress a raw `method` stream.
+    """
+    with Decompressor(method, properties=properties, threads=threads, **props) as decompressor:
+        return decompressor.decompress(data, size)
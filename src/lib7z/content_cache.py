@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: decompressed item contents cache
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, NamedTuple, Optional
+
+__all__ = (
+    "CacheStats",
+    "ContentCache",
+)
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+class CacheStats(NamedTuple):
+    """Counters of a ContentCache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    count: int
+
+
+class ContentCache:
+    """
+    Least-recently-used cache of item contents, bounded by their total size.
+
+    Keys are `(archive identity, item index, item CRC)`, so one cache can be
+    shared by many archives, e.g. through `ArchivePool(content_cache=...)`.
+    Items larger than `max_item_size` (by default an eighth of `max_bytes`)
+    are never cached, so that one big read can't flush everything else.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, *, max_item_size: Optional[int] = None) -> None:
+        self.max_bytes = max_bytes
+        self.max_item_size = max_bytes // 8 if max_item_size is None else max_item_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """The total size of the cached contents."""
+        return self._size
+
+    @property
+    def stats(self) -> CacheStats:
+        """Get the current counters."""
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, self._size, len(self._entries))
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Get the contents cached under `key`, counting a hit or miss."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        """Cache `data` under `key`, evicting the least recently used contents to make room."""
+        size = len(data)
+        if size > self.max_item_size or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            while self._entries and self._size + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+            self._entries[key] = data
+            self._size += size
+
+    def clear(self) -> None:
+        """Drop all cached contents. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
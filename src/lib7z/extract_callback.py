@@ -5,11 +5,13 @@
 Python bindings for the 7-Zip Library: archive extract callbacks
 """
 
+import os
+import stat
 from enum import IntEnum
 from logging import getLogger
-from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple, Union
 
+from .extract_plan import ExtractPlan
 from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
 from .hresult import HRESULT
 from .iids import (
@@ -20,11 +22,30 @@ from .iids import (
     IID_ICryptoGetTextPassword2,
     IID_ISequentialOutStream,
 )
-from .stream import FileOutStream, PyOutStream
+from .stream import (
+    ByteAccumulator,
+    FileOutStream,
+    NativeFdOutStream,
+    NativeStream,
+    PyOutStream,
+    SinkOutStream,
+)
 from .unknown import PyUnknown
 
 log = getLogger("lib7z")
 
+# O_NOFOLLOW, where there is one, also closes the race with _is_link.
+_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0) | getattr(os, "O_NOFOLLOW", 0)
+
+
+def _is_link(path: str) -> bool:
+    """Whether `path` is a symlink, or on Windows any other reparse point (e.g. a junction)."""
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return False
+    return stat.S_ISLNK(st.st_mode) or bool(getattr(st, "st_file_attributes", 0) & stat.FILE_ATTRIBUTE_REPARSE_POINT)
+
 
 class AskMode(IntEnum):
     """
@@ -36,6 +57,17 @@ class AskMode(IntEnum):
     SKIP = 2
 
 
+class EventIndexType(IntEnum):
+    """
+    Values for the index_type argument in ReportExtractResult.
+    """
+
+    NO_INDEX = 0
+    IN_ARC_INDEX = 1
+    BLOCK_INDEX = 2
+    OUT_BLOCK_INDEX = 3
+
+
 class OperationResult(IntEnum):
     """
     Values for the op_result argument in SetOperationResult.
@@ -45,6 +77,12 @@ class OperationResult(IntEnum):
     UNSUPPORTED_METHOD = 1
     DATA_ERROR = 2
     CRC_ERROR = 3
+    UNAVAILABLE = 4
+    UNEXPECTED_END = 5
+    DATA_AFTER_END = 6
+    IS_NOT_ARC = 7
+    HEADERS_ERROR = 8
+    WRONG_PASSWORD = 9
 
 
 class ArchiveExtractCallback(PyUnknown):
@@ -109,59 +147,142 @@ class ArchiveExtractCallback(PyUnknown):
 
 
 class ArchiveExtractToDirectoryCallback(ArchiveExtractCallback):
-    """Archive extract callback that unpacks into a directory."""
+    """
+    Archive extract callback that unpacks into a directory.
+
+    Destinations come from an ExtractPlan, whose directories must have been
+    created before extraction starts. With `restore_metadata`, each file's
+    mtime and mode are set as it is finished (through its descriptor where
+    the platform allows), and the rest in `cleanup()`. Without
+    `restore_directories`, only files get their metadata back, e.g. when
+    other processes are still writing into the same directories.
+    """
 
     # pylint: disable=invalid-name
 
-    def __init__(self, archive, directory, password, *, strip_components=0):
+    def __init__(self, archive, plan: ExtractPlan, password, *, preallocate=True, restore_metadata=True, restore_directories=True):
         self.archive = archive
-        self.directory = Path(directory)
-        self._out_stream: Optional[FileOutStream] = None
-        self.strip_components = strip_components
+        self.plan = plan
+        self._out_stream: Union[None, FileOutStream, NativeFdOutStream] = None
+        self._out_fd: Optional[int] = None
+        self._out_index: Optional[int] = None
+        self._preallocated: Optional[int] = None
+        self._pending_metadata: List[int] = []
+        self.preallocate = preallocate
+        self.restore_metadata = restore_metadata
+        self.restore_directories = restore_directories
         super().__init__(password)
 
+    def __open_native_stream(self, path: str, size: Optional[int]) -> NativeFdOutStream:
+        """
+        Open `path` for writing as a native stream.
+
+        The stream keeps its own handle on the file. Our descriptor is only
+        kept open if metadata will be restored through it.
+        """
+        fd = os.open(path, _OPEN_FLAGS, 0o666)
+        try:
+            stream = NativeFdOutStream(fd)
+        except Exception:
+            os.close(fd)
+            raise
+        if self.preallocate and size:
+            # The file is extended to the expected size up front, and truncated to what was written once the item is done.
+            try:
+                stream.truncate(size)
+                self._preallocated = size
+            except RuntimeError as exc:
+                log.debug("Failed preallocating %r: %s", path, exc)
+        if self.restore_metadata and os.utime in os.supports_fd:
+            self._out_fd = fd
+        else:
+            os.close(fd)
+        return stream
+
+    def __close_out_stream(self) -> None:
+        out_stream = self._out_stream
+        self._out_stream = None
+        if isinstance(out_stream, NativeFdOutStream):
+            if self._preallocated is not None:
+                written = out_stream.tell()
+                if written != self._preallocated:
+                    out_stream.truncate(written)
+            # The file is closed once 7-zip has released its reference too.
+            out_stream.close()
+        elif out_stream is not None and out_stream.refs != 0:
+            log.warning("ExtractCallback._out_stream: refs != 0")
+        self._preallocated = None
+
+        index = self._out_index
+        self._out_index = None
+        if self._out_fd is not None:
+            try:
+                if index is not None:
+                    self.plan.apply_metadata(self._out_fd, index)
+            finally:
+                os.close(self._out_fd)
+                self._out_fd = None
+        elif index is not None and self.restore_metadata:
+            # Python file streams are only closed when 7-zip releases them, so restore these by path later.
+            self._pending_metadata.append(index)
+
     def GetStream(self, index, out_stream, ask_extract_mode):
-        if self._out_stream is not None:
-            if self._out_stream.refs != 0:
-                log.warning("ExtractCallback._out_stream: refs != 0")
-            self._out_stream = None
+        self.__close_out_stream()
 
         if ask_extract_mode != AskMode.EXTRACT:
             return HRESULT.S_OK.value
 
-        item = self.archive[index]
-        path = Path(item.path)
+        if index in self.plan.unsafe:
+            out_stream[0] = ffi.NULL
+            return HRESULT.S_FALSE
 
-        if len(path.parts) < self.strip_components:
+        path = self.plan.files.get(index)
+        if path is None:
+            # Directories were created up front; anything else is skipped.
             out_stream[0] = ffi.NULL
             return HRESULT.S_OK
 
-        path = self.directory / Path(*path.parts[self.strip_components :])
-        if self.directory not in (path, *path.parents):
+        if _is_link(path):
+            log.warning("Refusing to extract %r through a link", path)
             out_stream[0] = ffi.NULL
             return HRESULT.S_FALSE
 
-        if item.is_dir:
-            path.mkdir(exist_ok=True, parents=True)
-            out_stream[0] = ffi.NULL
+        if self.archive.native_streams:
+            native_stream = self.__open_native_stream(path, self.plan.size(index))
+            self._out_stream = native_stream
+            out_stream[0] = native_stream.new_reference(IID_ISequentialOutStream)
         else:
-            path.parent.mkdir(exist_ok=True, parents=True)
-            self._out_stream = FileOutStream(path)
-            out_stream[0] = self._out_stream.get_instance(IID_ISequentialOutStream)
+            file_stream = FileOutStream(path)
+            self._out_stream = file_stream
+            out_stream[0] = file_stream.get_instance(IID_ISequentialOutStream)
+        self._out_index = index
 
         return HRESULT.S_OK
 
+    def SetOperationResult(self, op_result):
+        if isinstance(self._out_stream, NativeFdOutStream):
+            self.__close_out_stream()
+        return super().SetOperationResult(op_result)
+
     def cleanup(self):
-        pass
+        self.__close_out_stream()
+        if self.restore_metadata:
+            self.plan.restore_metadata(self._pending_metadata, directories=self.restore_directories)
+        self._pending_metadata = []
 
 
 class ArchiveExtractToStreamCallback(ArchiveExtractCallback):
-    """Archive extract callback that unpacks everything into one stream."""
+    """
+    Archive extract callback that unpacks everything into one stream.
+
+    `stream` is either a Python binary stream or a ready-made output stream
+    object such as a SinkOutStream or a NativeMemOutStream.
+    """
 
     # pylint: disable=invalid-name
 
     def __init__(self, stream, index, password):
-        self.stream = PyOutStream(stream)
+        self.stream = stream if isinstance(stream, (PyUnknown, NativeStream)) else PyOutStream(stream)
         self.index = index
         super().__init__(password)
 
@@ -170,11 +291,90 @@ class ArchiveExtractToStreamCallback(ArchiveExtractCallback):
             return HRESULT.S_OK.value
 
         if index == self.index:
-            out_stream[0] = self.stream.get_instance(IID_ISequentialOutStream)
+            if isinstance(self.stream, NativeStream):
+                # 7-zip releases the stream after the item; keep our own reference.
+                out_stream[0] = self.stream.new_reference(IID_ISequentialOutStream)
+            else:
+                out_stream[0] = self.stream.get_instance(IID_ISequentialOutStream)
             return HRESULT.S_OK.value
         else:
             out_stream[0] = ffi.NULL
             return HRESULT.S_OK.value
 
     def cleanup(self):
-        self.stream.stream.flush()
+        if isinstance(self.stream, PyOutStream):
+            self.stream.stream.flush()
+
+
+class ArchiveExtractToBuffersCallback(ArchiveExtractCallback):
+    """
+    Archive extract callback that unpacks each requested item into its own buffer.
+
+    Finished items are appended to `completed` in the order 7-zip decodes them.
+    """
+
+    # pylint: disable=invalid-name
+
+    def __init__(self, sizes: Dict[int, Optional[int]], password):
+        self.sizes = sizes
+        self.completed: List[Tuple[int, int, ByteAccumulator]] = []
+        self._current: Optional[Tuple[int, ByteAccumulator, SinkOutStream]] = None
+        super().__init__(password)
+
+    def GetStream(self, index, out_stream, ask_extract_mode):
+        self._current = None
+        if ask_extract_mode != AskMode.EXTRACT or index not in self.sizes:
+            out_stream[0] = ffi.NULL
+            return HRESULT.S_OK.value
+
+        accumulator = ByteAccumulator(self.sizes[index])
+        stream = SinkOutStream(accumulator.write)
+        # Keep the stream object alive for as long as 7-zip is writing to it.
+        self._current = (index, accumulator, stream)
+        out_stream[0] = stream.get_instance(IID_ISequentialOutStream)
+        return HRESULT.S_OK.value
+
+    def SetOperationResult(self, op_result):
+        if self._current is not None:
+            index, accumulator, _ = self._current
+            self.completed.append((index, op_result, accumulator))
+            self._current = None
+        return super().SetOperationResult(op_result)
+
+    def cleanup(self):
+        pass
+
+
+class ArchiveTestCallback(ArchiveExtractCallback):
+    """
+    Archive extract callback for test mode: items are decoded and checked, but not written.
+
+    Each item's OperationResult is kept in `results`, by item index.
+    """
+
+    # pylint: disable=invalid-name
+
+    def __init__(self, password):
+        self.results: Dict[int, int] = {}
+        self._current: Optional[int] = None
+        super().__init__(password)
+
+    def GetStream(self, index, out_stream, ask_extract_mode):
+        out_stream[0] = ffi.NULL
+        self._current = index if ask_extract_mode == AskMode.TEST else None
+        return HRESULT.S_OK.value
+
+    def SetOperationResult(self, op_result):
+        if self._current is not None:
+            self.results[self._current] = op_result
+            self._current = None
+        return super().SetOperationResult(op_result)
+
+    def ReportExtractResult(self, index_type, index, op_res):
+        # Only reports about archive items are results; others refer to no index, or to blocks.
+        if index_type == EventIndexType.IN_ARC_INDEX:
+            self.results[index] = op_res
+        return HRESULT.S_OK
+
+    def cleanup(self):
+        pass
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: directory extraction plans
+"""
+
+import os
+import stat
+from logging import getLogger
+from os import PathLike
+from pathlib import PurePath
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple, Union
+
+from .propvariant import filetime_to_ns
+from .snapshot import ArchiveSnapshot, _TimeColumn
+
+__all__ = (
+    "PLAN_PROPS",
+    "ExtractPlan",
+)
+
+log = getLogger("lib7z")
+
+# Item properties an ExtractPlan is built from.
+PLAN_PROPS = ("path", "is_dir", "size", "mtime", "attrib", "posix_attrib")
+
+_FILE_ATTRIBUTE_READONLY = 0x1
+# 7-zip sets this attribute when the high 16 bits hold a POSIX mode.
+_FILE_ATTRIBUTE_UNIX_EXTENSION = 0x8000
+
+
+class ExtractPlan:
+    """
+    Where each item goes when extracting into `directory`, worked out once
+    from a snapshot of the archive.
+
+    `files` maps item indices to destination paths; `directories` maps every
+    directory that must exist to the index of its item, or None if it is only
+    implied by the paths below it. Items that would land outside `directory`
+    are listed in `unsafe`.
+    """
+
+    def __init__(
+        self,
+        snapshot: ArchiveSnapshot,
+        directory: Union[PathLike, str],
+        indices: Optional[Sequence[int]] = None,
+        *,
+        strip_components: int = 0,
+    ) -> None:
+        self.directory = os.path.abspath(directory)
+        self.files: Dict[int, str] = {}
+        self.directories: Dict[str, Optional[int]] = {}
+        self.unsafe: Set[int] = set()
+        self._snapshot = snapshot
+
+        paths = snapshot.column("path")
+        is_dirs = snapshot.column("is_dir")
+        for index in range(len(snapshot)) if indices is None else indices:
+            path = paths[index]
+            if path is None:
+                continue
+            parts = PurePath(path).parts
+            if len(parts) < strip_components:
+                continue
+            parts = parts[strip_components:]
+            if not parts:
+                continue
+            if any(part == ".." for part in parts) or PurePath(parts[0]).anchor:
+                self.unsafe.add(index)
+                continue
+            target = os.path.join(self.directory, *parts)
+            if is_dirs[index]:
+                self.directories[target] = index
+            else:
+                self.files[index] = target
+                self.directories.setdefault(os.path.dirname(target), None)
+
+    def create_directories(self) -> None:
+        """
+        Create every directory in the plan, parents first.
+
+        A directory whose parent was made in this pass is created with one
+        `mkdir`; only the first directory of each branch walks up its parents.
+        """
+        created = {self.directory}
+        os.makedirs(self.directory, exist_ok=True)
+        for path in sorted(self.directories):
+            if path in created:
+                continue
+            if os.path.dirname(path) in created:
+                try:
+                    os.mkdir(path)
+                except FileExistsError:
+                    pass
+            else:
+                os.makedirs(path, exist_ok=True)
+            created.add(path)
+
+    def size(self, index: int) -> Optional[int]:
+        """Get the unpacked size of item `index`, if known."""
+        return self._snapshot.column("size")[index]
+
+    def metadata(self, index: int) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Get the modification time (ns since the epoch) and permission bits to restore for item `index`.
+        """
+        mtime_column = self._snapshot.column("mtime")
+        filetime = mtime_column.filetime(index) if isinstance(mtime_column, _TimeColumn) else None
+        mtime_ns = filetime_to_ns(filetime) if filetime is not None else None
+
+        mode = self._snapshot.column("posix_attrib")[index]
+        if mode is None:
+            attrib = self._snapshot.column("attrib")[index]
+            if attrib is not None:
+                if attrib & _FILE_ATTRIBUTE_UNIX_EXTENSION:
+                    mode = attrib >> 16
+                elif attrib & _FILE_ATTRIBUTE_READONLY:
+                    mode = stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH | (stat.S_IEXEC if self._snapshot.column("is_dir")[index] else 0)
+        return mtime_ns, stat.S_IMODE(mode) if mode is not None else None
+
+    def apply_metadata(self, target: Union[int, str], index: int) -> None:
+        """
+        Restore the metadata of item `index` onto `target`, an open file descriptor or a path.
+
+        Failures are logged rather than raised: the contents are already in place.
+        """
+        mtime_ns, mode = self.metadata(index)
+        try:
+            # Times first: a read-only file can't have its times changed on every platform.
+            if mtime_ns is not None:
+                os.utime(target, ns=(mtime_ns, mtime_ns))
+            if mode is not None:
+                os.chmod(target if isinstance(target, str) or os.chmod in os.supports_fd else self.files[index], mode)
+        except OSError:
+            log.warning("Could not restore metadata of item %d.", index, exc_info=True)
+
+    def restore_metadata(self, file_indices: Iterable[int] = (), *, directories: bool = True) -> None:
+        """
+        Restore metadata of the files `file_indices` by path, then, with `directories`, of all planned directories.
+
+        Directories go deepest first, so that setting a directory's times isn't
+        undone by changes to the entries inside it.
+        """
+        for index in file_indices:
+            self.apply_metadata(self.files[index], index)
+        if not directories:
+            return
+        planned = [(path, index) for path, index in self.directories.items() if index is not None]
+        planned.sort(key=lambda path_index: path_index[0].count(os.sep), reverse=True)
+        for path, index in planned:
+            self.apply_metadata(path, index)
@@ -18,6 +18,12 @@ class Lib:
     def GetHandlerProperty2(self, index: FFI.CData, prop_id: FFI.CData, prop_var: FFI.CData) -> FFI.CData: ...
     def GetNumberOfMethods(self, num_methods: FFI.CData) -> FFI.CData: ...
     def GetMethodProperty(self, index: FFI.CData, prop_id: FFI.CData, prop_var: FFI.CData) -> FFI.CData: ...
+    # Native streams
+    def CreateNativeFdInStream(self, fd: int, out_stream: FFI.CData) -> int: ...
+    def CreateNativeFdOutStream(self, fd: int, out_stream: FFI.CData) -> int: ...
+    def CreateNativeMemInStream(self, data: FFI.CData, size: int, out_stream: FFI.CData) -> int: ...
+    def CreateNativeMemOutStream(self, capacity: int, out_stream: FFI.CData) -> int: ...
+    def GetNativeMemOutStreamBuffer(self, stream: FFI.CData, data: FFI.CData, size: FFI.CData) -> int: ...
 
 ffi: FFI
 lib: Lib
@@ -6,8 +6,11 @@ Python bindings for 7-Zip library: format registry.
 """
 
 from collections.abc import Sequence
+from dataclasses import dataclass, field
 from enum import IntEnum, IntFlag
-from typing import Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
 from uuid import UUID
 
 from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
@@ -18,9 +21,13 @@ __all__ = (
     "FormatProp",
     "FormatInfo",
     "FormatRegistry",
+    "SignatureIndex",
     "formats",
 )
 
+# How far into a file signatures of formats that may start anywhere (e.g. after an SFX stub) are looked for.
+SEARCH_SIZE = 1 << 16
+
 
 class FormatFlag(IntFlag):
     """
@@ -69,6 +76,7 @@ class FormatProp(IntEnum):
     TIME_FLAGS = 12
 
 
+@lru_cache(maxsize=None)
 def _get_num_formats() -> int:
     """
     Get the number of archive formats.
@@ -91,86 +99,218 @@ def _get_format_property(index: int, prop_id: int) -> PropVariant:
     return prop_var
 
 
+@dataclass(frozen=True)
 class FormatInfo:
     """
     Archive format info.
+
+    Attributes:
+        index: Index of the format in 7-zip's registry.
+        name: The name of the archive format.
+        clsid: The class id of the archive handler.
+        flags: Archive format flags.
+        extensions: Common file extensions for the archive type.
+        signatures: Magic numbers for format detection.
+        signature_offset: Expected position of magic numbers in archive files.
+        updatable: Whether 7-zip can create and update archives of this type.
     """
 
-    def __init__(self, index: int) -> None:
-        if not (0 <= index < _get_num_formats()):
+    index: int
+    name: str = field(init=False)
+    clsid: UUID = field(init=False)
+    flags: FormatFlag = field(init=False)
+    extensions: Tuple[str, ...] = field(init=False)
+    signatures: Tuple[bytes, ...] = field(init=False)
+    signature_offset: int = field(init=False)
+    updatable: bool = field(init=False)
+
+    def __post_init__(self) -> None:
+        if not (0 <= self.index < _get_num_formats()):
             raise IndexError()
-        self.index = index
+
+        flags = FormatFlag(_get_format_property(self.index, FormatProp.FLAGS.value).as_int())
+
+        extensions: Tuple[str, ...] = ()
+        prop_var = _get_format_property(self.index, FormatProp.EXTENSION.value)
+        if prop_var.has_value:
+            extensions = tuple(prop_var.as_string().split())
+
+        signatures: Tuple[bytes, ...] = ()
+        if FormatFlag.MULTI_SIGNATURE in flags:
+            prop_var = _get_format_property(self.index, FormatProp.MULTI_SIGNATURE.value)
+            if prop_var.has_value:
+                signatures = prop_var.as_multi_bytes()
+        else:
+            prop_var = _get_format_property(self.index, FormatProp.SIGNATURE.value)
+            if prop_var.has_value:
+                signatures = (prop_var.as_bytes(),)
+
+        signature_offset = 0
+        prop_var = _get_format_property(self.index, FormatProp.SIGNATURE_OFFSET.value)
+        if prop_var.has_value:
+            signature_offset = prop_var.as_int()
+
+        prop_var = _get_format_property(self.index, FormatProp.UPDATE.value)
+        updatable = prop_var.has_value and prop_var.as_bool()
+
+        # Frozen dataclass: derived fields are filled in once, here.
+        object.__setattr__(self, "name", _get_format_property(self.index, FormatProp.NAME.value).as_string())
+        object.__setattr__(self, "clsid", _get_format_property(self.index, FormatProp.CLASS_ID.value).as_uuid())
+        object.__setattr__(self, "flags", flags)
+        object.__setattr__(self, "extensions", extensions)
+        object.__setattr__(self, "signatures", signatures)
+        object.__setattr__(self, "signature_offset", signature_offset)
+        object.__setattr__(self, "updatable", updatable)
+
+
+class FormatRegistry(Sequence):
+    """
+    Read-only access to 7-zip's archive format registry.
+
+    The registry is read from 7-zip once, on first use, and indexed by name,
+    file extension and handler class id.
+    """
+
+    def __init__(self) -> None:
+        self._formats: Optional[Tuple[FormatInfo, ...]] = None
+        self._by_name: Mapping[str, FormatInfo] = MappingProxyType({})
+        self._by_extension: Mapping[str, Tuple[FormatInfo, ...]] = MappingProxyType({})
+        self._by_clsid: Mapping[UUID, FormatInfo] = MappingProxyType({})
+        self._signature_index: Optional[SignatureIndex] = None
+
+    def _load(self) -> Tuple[FormatInfo, ...]:
+        if self._formats is None:
+            format_infos = tuple(FormatInfo(index) for index in range(_get_num_formats()))
+            by_extension: Dict[str, List[FormatInfo]] = {}
+            for fmt in format_infos:
+                for extension in fmt.extensions:
+                    by_extension.setdefault(extension.lower(), []).append(fmt)
+            self._by_name = MappingProxyType({fmt.name: fmt for fmt in format_infos})
+            self._by_extension = MappingProxyType({ext: tuple(fmts) for ext, fmts in by_extension.items()})
+            self._by_clsid = MappingProxyType({fmt.clsid: fmt for fmt in format_infos})
+            self._formats = format_infos
+        return self._formats
 
     @property
-    def name(self) -> str:
+    def by_name(self) -> Mapping[str, FormatInfo]:
         """
-        The name of the archive format.
+        Formats by name.
         """
-        prop_var = _get_format_property(self.index, FormatProp.NAME.value)
-        return prop_var.as_string()
+        self._load()
+        return self._by_name
 
     @property
-    def clsid(self) -> UUID:
+    def by_extension(self) -> Mapping[str, Tuple[FormatInfo, ...]]:
         """
-        The class id of the archive handler.
+        Formats by (lower case) file extension, in registry order.
         """
-        prop_var = _get_format_property(self.index, FormatProp.CLASS_ID.value)
-        return prop_var.as_uuid()
+        self._load()
+        return self._by_extension
 
     @property
-    def flags(self) -> FormatFlag:
+    def by_clsid(self) -> Mapping[UUID, FormatInfo]:
         """
-        Archive format flags.
+        Formats by handler class id.
         """
-        prop_var = _get_format_property(self.index, FormatProp.FLAGS.value)
-        return FormatFlag(prop_var.as_int())
+        self._load()
+        return self._by_clsid
 
     @property
-    def extensions(self) -> Tuple[str, ...]:
+    def signature_index(self) -> "SignatureIndex":
         """
-        Common file extensions for the archive type.
+        Signature index over all formats.
         """
-        prop_var = _get_format_property(self.index, FormatProp.EXTENSION.value)
-        if prop_var.has_value:
-            return tuple(prop_var.as_string().split())
-        return ()
+        if self._signature_index is None:
+            self._signature_index = SignatureIndex(self._load())
+        return self._signature_index
 
-    @property
-    def signatures(self) -> Tuple[bytes, ...]:
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __getitem__(self, index: int) -> FormatInfo:  # type: ignore
+        if isinstance(index, int):
+            return self._load()[index]
+        raise TypeError()
+
+
+class _TrieNode:
+    """
+    Node in a signature prefix trie.
+    """
+
+    __slots__ = ("children", "formats")
+
+    def __init__(self) -> None:
+        self.children: Dict[int, "_TrieNode"] = {}
+        self.formats: List[FormatInfo] = []
+
+
+class SignatureIndex:
+    """
+    Prefix tries of archive format signatures, one per signature offset.
+
+    Matching a file header against the index ranks candidate formats
+    without trying to open the file with each handler in turn. `match`
+    needs the first `header_size` bytes of a file, and `search` the first
+    `search_size`.
+    """
+
+    def __init__(self, format_infos: Iterable[FormatInfo], search_size: int = SEARCH_SIZE) -> None:
+        self._tries: Dict[int, _TrieNode] = {}
+        self._searchable: List[Tuple[bytes, FormatInfo]] = []
+        self.header_size = 0
+
+        for fmt in format_infos:
+            offset = fmt.signature_offset
+            for signature in fmt.signatures:
+                if not signature:
+                    continue
+                node = self._tries.setdefault(offset, _TrieNode())
+                for byte in signature:
+                    node = node.children.setdefault(byte, _TrieNode())
+                node.formats.append(fmt)
+                if FormatFlag.FIND_SIGNATURE in fmt.flags:
+                    self._searchable.append((signature, fmt))
+                self.header_size = max(self.header_size, offset + len(signature))
+        self.search_size = max(search_size, self.header_size)
+
+    def match(self, header: bytes) -> List[FormatInfo]:
         """
-        Magic numbers for format detection.
+        Get the formats whose signature is found at its expected offset in `header`.
+
+        Longer (more specific) signatures are ranked first.
         """
-        if FormatFlag.MULTI_SIGNATURE in self.flags:
-            prop_var = _get_format_property(self.index, FormatProp.MULTI_SIGNATURE.value)
-            if prop_var.has_value:
-                return prop_var.as_multi_bytes()
-            return ()
-        else:
-            prop_var = _get_format_property(self.index, FormatProp.SIGNATURE.value)
-            if prop_var.has_value:
-                return (prop_var.as_bytes(),)
-            return ()
+        found: List[Tuple[int, FormatInfo]] = []
+        for offset, root in self._tries.items():
+            node = root
+            for depth, byte in enumerate(header[offset : self.header_size], 1):
+                next_node = node.children.get(byte)
+                if next_node is None:
+                    break
+                node = next_node
+                found.extend((depth, fmt) for fmt in node.formats)
+        found.sort(key=lambda depth_fmt: -depth_fmt[0])
+        return _unique(fmt for _, fmt in found)
 
-    @property
-    def signature_offset(self) -> int:
+    def search(self, data: bytes) -> List[FormatInfo]:
         """
-        Expected position of magic numbers in archive files.
+        Get the formats that may start anywhere in a file, whose signature occurs in its first `search_size` bytes, `data`.
         """
-        return 0
+        window = data[: self.search_size]
+        return _unique(fmt for signature, fmt in self._searchable if signature in window)
 
 
-class FormatRegistry(Sequence):
+def _unique(format_infos: Iterable[FormatInfo]) -> List[FormatInfo]:
     """
-    Read-only access to 7-zip's archive format registry.
+    Remove repeated formats, keeping the first occurrence of each.
     """
-
-    def __len__(self) -> int:
-        return _get_num_formats()
-
-    def __getitem__(self, index: int) -> FormatInfo:  # type: ignore
-        if isinstance(index, int):
-            return FormatInfo(index)
-        raise TypeError()
+    seen = set()
+    unique = []
+    for fmt in format_infos:
+        if fmt.index not in seen:
+            seen.add(fmt.index)
+            unique.append(fmt)
+    return unique
 
 
 formats = FormatRegistry()
@@ -6,6 +6,7 @@ IIDs and IID lookup function.
 """
 
 import sys
+from typing import Optional
 from uuid import UUID
 
 from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
@@ -138,3 +139,12 @@ def CreateObject(clsid: UUID, iid: UUID) -> ffi.CData:  # pylint: disable=invali
         raise RuntimeError(f"Failed to create object (clsid:{clsid},iid{iid}): {result}")
     created_object = ffi.cast(f"{iid_opaque_impl_struct_name(iid)} *", created_object_ptr[0])
     return ffi.gc(created_object, ReleaseObject)
+
+
+def QueryInterface(obj: ffi.CData, iid: UUID) -> Optional[ffi.CData]:  # pylint: disable=invalid-name
+    "Get interface `iid` of a COM object, or None if the object doesn't implement it."
+    out_ptr = ffi.new("void **")
+    result = obj.vtable.QueryInterface(obj, marshall_guid(iid), out_ptr)  # type: ignore
+    if result & 0x80000000 or out_ptr[0] == ffi.NULL:
+        return None
+    return ffi.gc(ffi.cast(f"{iid_opaque_impl_struct_name(iid)} *", out_ptr[0]), ReleaseObject)
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: progress and performance instrumentation
+"""
+
+from collections import defaultdict
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, DefaultDict, Dict, List, Optional, Tuple
+
+from .ffi7z import ffi  # pylint: disable=no-name-in-module
+
+__all__ = (
+    "Instrument",
+    "MetricsCollector",
+    "instrument_extract_callback",
+    "instrument_open_callback",
+)
+
+# Methods 7-zip calls on extract callbacks, besides the IUnknown ones.
+_EXTRACT_CALLBACK_METHODS = (
+    "GetStream",
+    "PrepareOperation",
+    "SetOperationResult",
+    "SetTotal",
+    "SetCompleted",
+    "SetRatioInfo",
+    "ReportExtractResult",
+    "CryptoGetTextPassword",
+    "CryptoGetTextPassword2",
+)
+
+_OPEN_CALLBACK_METHODS = (
+    "SetTotal",
+    "SetCompleted",
+    "CryptoGetTextPassword",
+    "GetProperty",
+    "GetStream",
+    "SetSubArchiveName",
+)
+
+
+class Instrument:
+    """
+    Receives progress and timing events from an Archive.
+
+    Pass one as `Archive(..., instrument=...)`. Every hook does nothing by
+    default; override the ones of interest. Hooks run on whatever thread
+    7-zip calls back on, so implementations must be thread-safe.
+    """
+
+    def open_attempted(self, filename: str, format_name: str, seconds: float, success: bool) -> None:
+        """Trying to open `filename` as `format_name` took `seconds`."""
+
+    def open_progress(self, files: Optional[int], num_bytes: Optional[int]) -> None:
+        """The handler reported opening progress (either value may be unknown)."""
+
+    def operation_started(self, kind: str) -> None:
+        """An `"extract"`, `"test"` or `"read"` operation started."""
+
+    def operation_finished(self, kind: str, seconds: float) -> None:
+        """The operation took `seconds` of wall time, including callback time."""
+
+    def total(self, num_bytes: int) -> None:
+        """The operation will process `num_bytes` in total."""
+
+    def progress(self, num_bytes: int) -> None:
+        """The operation has processed `num_bytes` so far."""
+
+    def ratio(self, in_size: Optional[int], out_size: Optional[int]) -> None:
+        """The operation has read `in_size` packed bytes and written `out_size` unpacked bytes so far."""
+
+    def item_finished(self, index: Optional[int], op_result: int, seconds: float) -> None:
+        """Item `index` finished with `op_result` after `seconds` of decoding."""
+
+    def callback_time(self, seconds: float) -> None:
+        """7-zip spent `seconds` in a Python callback."""
+
+
+def _value(ptr: Any) -> Optional[int]:
+    return None if ptr == ffi.NULL else int(ptr[0])
+
+
+def _timed(method: Callable[..., Any], instrument: Instrument, before: Optional[Callable[..., None]] = None) -> Callable[..., Any]:
+    def wrapper(*args: Any) -> Any:
+        start = perf_counter()
+        try:
+            if before is not None:
+                before(*args)
+            return method(*args)
+        finally:
+            instrument.callback_time(perf_counter() - start)
+
+    return wrapper
+
+
+def _wrap(obj: Any, names: Tuple[str, ...], instrument: Instrument, hooks: Dict[str, Callable[..., None]]) -> None:
+    # The COM thunks look methods up on the instance, so instance attributes take precedence.
+    for name in names:
+        method = getattr(obj, name, None)
+        if method is not None:
+            setattr(obj, name, _timed(method, instrument, hooks.get(name)))
+
+
+def instrument_extract_callback(callback: Any, instrument: Instrument) -> None:
+    """
+    Report the progress of extract callback `callback` to `instrument`, and
+    time 7-zip's calls into it and into its output stream.
+    """
+    state: Dict[str, Any] = {"index": None, "started": None}
+
+    def get_stream(index: int, *_) -> None:
+        state["index"] = index
+
+    def prepare_operation(*_) -> None:
+        state["started"] = perf_counter()
+
+    def set_operation_result(op_result: int) -> None:
+        started = state["started"]
+        if started is not None:
+            instrument.item_finished(state["index"], op_result, perf_counter() - started)
+        state["started"] = None
+
+    def set_completed(completed: Any) -> None:
+        if completed != ffi.NULL:
+            instrument.progress(completed[0])
+
+    hooks: Dict[str, Callable[..., None]] = {
+        "GetStream": get_stream,
+        "PrepareOperation": prepare_operation,
+        "SetOperationResult": set_operation_result,
+        "SetTotal": instrument.total,
+        "SetCompleted": set_completed,
+        "SetRatioInfo": lambda in_size, out_size: instrument.ratio(_value(in_size), _value(out_size)),
+    }
+    _wrap(callback, _EXTRACT_CALLBACK_METHODS, instrument, hooks)
+    stream = getattr(callback, "stream", None)
+    if stream is not None and hasattr(stream, "Write"):
+        _wrap(stream, ("Write",), instrument, {})
+
+
+def instrument_open_callback(callback: Any, instrument: Instrument) -> None:
+    """
+    Report the progress of open callback `callback` to `instrument`, and time 7-zip's calls into it.
+    """
+    hooks: Dict[str, Callable[..., None]] = {
+        "SetCompleted": lambda files, num_bytes: instrument.open_progress(_value(files), _value(num_bytes)),
+    }
+    _wrap(callback, _OPEN_CALLBACK_METHODS, instrument, hooks)
+
+
+class _Timing:
+    """Count and total seconds of something."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "seconds": self.seconds}
+
+
+class MetricsCollector(Instrument):
+    """
+    Instrument that aggregates events into counters.
+
+    One collector can be shared by many archives. Time not spent in Python
+    callbacks during operations is counted as native time. Byte counts are
+    taken from each operation's own progress reports, so they are only exact
+    when the operations reported to a collector don't overlap.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.callback_seconds = 0.0
+        self.opens: DefaultDict[str, _Timing] = defaultdict(_Timing)
+        self.failed_opens: DefaultDict[str, _Timing] = defaultdict(_Timing)
+        self.operations: DefaultDict[str, _Timing] = defaultdict(_Timing)
+        self.items = _Timing()
+        self.item_errors = 0
+        self._in_size = 0
+        self._out_size = 0
+
+    def open_attempted(self, filename: str, format_name: str, seconds: float, success: bool) -> None:
+        with self._lock:
+            (self.opens if success else self.failed_opens)[format_name].add(seconds)
+
+    def operation_started(self, kind: str) -> None:
+        with self._lock:
+            self._in_size = 0
+            self._out_size = 0
+
+    def operation_finished(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            self.operations[kind].add(seconds)
+            self.bytes_in += self._in_size
+            self.bytes_out += self._out_size
+
+    def progress(self, num_bytes: int) -> None:
+        with self._lock:
+            self._out_size = max(self._out_size, num_bytes)
+
+    def ratio(self, in_size: Optional[int], out_size: Optional[int]) -> None:
+        with self._lock:
+            if in_size is not None:
+                self._in_size = max(self._in_size, in_size)
+            if out_size is not None:
+                self._out_size = max(self._out_size, out_size)
+
+    def item_finished(self, index: Optional[int], op_result: int, seconds: float) -> None:
+        with self._lock:
+            self.items.add(seconds)
+            if op_result:
+                self.item_errors += 1
+
+    def callback_time(self, seconds: float) -> None:
+        with self._lock:
+            self.callback_seconds += seconds
+
+    @property
+    def native_seconds(self) -> float:
+        """Wall time of operations not spent in Python callbacks."""
+        return max(sum(timing.seconds for timing in self.operations.values()) - self.callback_seconds, 0.0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the counters as a dict."""
+        with self._lock:
+            return {
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "callback_seconds": self.callback_seconds,
+                "native_seconds": self.native_seconds,
+                "items": self.items.as_dict(),
+                "item_errors": self.item_errors,
+                "operations": {kind: timing.as_dict() for kind, timing in self.operations.items()},
+                "opens": {name: timing.as_dict() for name, timing in self.opens.items()},
+                "failed_opens": {name: timing.as_dict() for name, timing in self.failed_opens.items()},
+            }
+
+    def to_prometheus(self, prefix: str = "lib7z") -> str:
+        """Get the counters in the Prometheus text exposition format."""
+        metrics = self.as_dict()
+        lines: List[str] = []
+
+        def counter(name: str, value: float, labels: str = "") -> None:
+            lines.append(f"{prefix}_{name}{labels} {value}")
+
+        counter("bytes_in_total", metrics["bytes_in"])
+        counter("bytes_out_total", metrics["bytes_out"])
+        counter("callback_seconds_total", metrics["callback_seconds"])
+        counter("native_seconds_total", metrics["native_seconds"])
+        counter("items_total", metrics["items"]["count"])
+        counter("item_seconds_total", metrics["items"]["seconds"])
+        counter("item_errors_total", metrics["item_errors"])
+        for kind, timing in metrics["operations"].items():
+            counter("operations_total", timing["count"], f'{{kind="{kind}"}}')
+            counter("operation_seconds_total", timing["seconds"], f'{{kind="{kind}"}}')
+        for success, opens in (("true", metrics["opens"]), ("false", metrics["failed_opens"])):
+            for name, timing in opens.items():
+                labels = f'{{format="{name}",success="{success}"}}'
+                counter("opens_total", timing["count"], labels)
+                counter("open_seconds_total", timing["seconds"], labels)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: persistent archive listing cache
+"""
+
+import hashlib
+import marshal
+import os
+import sqlite3
+import zlib
+from os import PathLike
+from stat import S_ISREG
+from threading import Lock
+from types import TracebackType
+from typing import Dict, NamedTuple, Optional, Type, Union
+from uuid import UUID
+
+from .propvariant import VARTYPE
+from .snapshot import ArchiveSnapshot, dump_column, load_column
+
+__all__ = (
+    "ArchiveIdentity",
+    "Listing",
+    "ListingCache",
+    "archive_identity",
+)
+
+_VERSION = 1
+_SAMPLE_SIZE = 64 << 10
+
+
+class ArchiveIdentity(NamedTuple):
+    """
+    What identifies an archive file's contents, without reading all of it.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    digest: bytes
+
+
+class Listing(NamedTuple):
+    """
+    Everything an Archive needs to answer metadata queries without a handler.
+    """
+
+    clsid: UUID
+    num_items: int
+    archive_properties: Dict[str, int]
+    archive_property_types: Dict[int, VARTYPE]
+    item_properties: Dict[str, int]
+    item_property_types: Dict[int, VARTYPE]
+    snapshot: ArchiveSnapshot
+
+
+def archive_identity(filename: Union[PathLike, str]) -> Optional[ArchiveIdentity]:
+    """
+    Get the identity of the archive at `filename`.
+
+    The identity combines the file's stat with a hash of its first and last
+    64 KiB. Returns None if `filename` is not a regular file.
+    """
+    try:
+        stat = os.stat(filename)
+    except (OSError, ValueError):
+        return None
+    if not S_ISREG(stat.st_mode):
+        return None
+
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        digest.update(f.read(_SAMPLE_SIZE))
+        if stat.st_size > _SAMPLE_SIZE:
+            f.seek(max(_SAMPLE_SIZE, stat.st_size - _SAMPLE_SIZE))
+            digest.update(f.read(_SAMPLE_SIZE))
+    return ArchiveIdentity(os.path.realpath(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino, digest.digest())
+
+
+def _dump_listing(listing: Listing) -> bytes:
+    snapshot = listing.snapshot
+    data = (
+        _VERSION,
+        listing.clsid.bytes,
+        listing.num_items,
+        tuple((name, prop_id, int(listing.archive_property_types[prop_id])) for name, prop_id in listing.archive_properties.items()),
+        tuple((name, prop_id, int(listing.item_property_types[prop_id])) for name, prop_id in listing.item_properties.items()),
+        snapshot.props,
+        tuple(dump_column(snapshot.column(name)) for name in snapshot.props),
+    )
+    return zlib.compress(marshal.dumps(data))
+
+
+def _load_listing(blob: bytes) -> Optional[Listing]:
+    try:
+        data = marshal.loads(zlib.decompress(blob))
+    except (ValueError, EOFError, TypeError, zlib.error):
+        return None
+    if not isinstance(data, tuple) or not data or data[0] != _VERSION:
+        return None
+    _, clsid, num_items, archive_props, item_props, props, columns = data
+    return Listing(
+        UUID(bytes=clsid),
+        num_items,
+        {name: prop_id for name, prop_id, _ in archive_props},
+        {prop_id: VARTYPE(vartype) for _, prop_id, vartype in archive_props},
+        {name: prop_id for name, prop_id, _ in item_props},
+        {prop_id: VARTYPE(vartype) for _, prop_id, vartype in item_props},
+        ArchiveSnapshot(props, [load_column(column) for column in columns], num_items),
+    )
+
+
+class ListingCache:
+    """
+    SQLite-backed store of archive listings, keyed by ArchiveIdentity.
+
+    Pass one to `Archive(..., listing_cache=...)`; archives whose identity is
+    in the cache are listed without opening a 7-zip handler. Listings are
+    stored in the clear, including those of archives with encrypted headers.
+    """
+
+    def __init__(self, path: Union[PathLike, str]) -> None:
+        self.path = path
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS listings (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, digest BLOB, listing BLOB)"
+            )
+
+    def get(self, identity: ArchiveIdentity) -> Optional[Listing]:
+        """
+        Get the listing stored for `identity`, if there is one.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT listing FROM listings WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ? AND digest = ?",
+                identity,
+            ).fetchone()
+        if row is None:
+            return None
+        return _load_listing(row[0])
+
+    def put(self, identity: ArchiveIdentity, listing: Listing) -> None:
+        """
+        Store `listing` for `identity`, replacing any listing of an older version of the file.
+        """
+        blob = _dump_listing(listing)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?)", (*identity, blob))
+
+    def discard(self, path: Union[PathLike, str]) -> None:
+        """
+        Forget the listing of the archive at `path`.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM listings WHERE path = ?", (os.path.realpath(path),))
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "ListingCache":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
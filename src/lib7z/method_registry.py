@@ -6,8 +6,11 @@ Python bindings for 7-Zip library: method registry.
 """
 
 from collections.abc import Sequence
+from dataclasses import dataclass, field
 from enum import IntEnum
-from typing import Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
 from uuid import UUID
 
 from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
@@ -32,6 +35,7 @@ class MethodProps(IntEnum):
     IS_FILTER = 10
 
 
+@lru_cache(maxsize=None)
 def _get_num_methods() -> int:
     """
     Get the number of methods.
@@ -54,75 +58,111 @@ def _get_method_property(index: int, prop_id: int) -> PropVariant:
     return prop_var
 
 
+@dataclass(frozen=True)
 class MethodInfo:
     """
     Method info.
+
+    Attributes:
+        index: Index of the method in 7-zip's registry.
+        id: Method id.
+        name: Method name.
+        description: Method description, if any.
+        decoder: CLSID of decoder, if assigned.
+        encoder: CLSID of encoder, if assigned.
+        num_streams: Number of streams.
+        is_filter: Method is a filter.
     """
 
-    def __init__(self, index: int) -> None:
-        if not (0 <= index < _get_num_methods()):
+    index: int
+    id: int = field(init=False)
+    name: str = field(init=False)
+    description: Optional[str] = field(init=False)
+    decoder: Optional[UUID] = field(init=False)
+    encoder: Optional[UUID] = field(init=False)
+    num_streams: int = field(init=False)
+    is_filter: bool = field(init=False)
+
+    def __post_init__(self) -> None:
+        if not (0 <= self.index < _get_num_methods()):
             raise IndexError()
-        self.index = index
-
-    @property
-    def id(self) -> int:
-        """Method id"""
-        return _get_method_property(self.index, MethodProps.ID).as_int()
-
-    @property
-    def name(self) -> str:
-        """Method name"""
-        return _get_method_property(self.index, MethodProps.NAME).as_string()
 
-    @property
-    def description(self) -> Optional[str]:
-        """Method description"""
-        maybe_description = _get_method_property(self.index, MethodProps.NAME)
+        description = None
+        maybe_description = _get_method_property(self.index, MethodProps.DESCRIPTION)
         if maybe_description.has_value:
-            return maybe_description.as_string()
-        return None
+            description = maybe_description.as_string()
 
-    @property
-    def decoder(self) -> Optional[UUID]:
-        """CLSID of decoder, if assigned."""
-        decoder_is_assigned = _get_method_property(self.index, MethodProps.DECODER_IS_ASSIGNED).as_bool()
-        if decoder_is_assigned:
-            return _get_method_property(self.index, MethodProps.DECODER).as_uuid()
-        return None
+        decoder = None
+        if _get_method_property(self.index, MethodProps.DECODER_IS_ASSIGNED).as_bool():
+            decoder = _get_method_property(self.index, MethodProps.DECODER).as_uuid()
 
-    @property
-    def encoder(self) -> Optional[UUID]:
-        """CLSID of encder, if assigned."""
-        encoder_is_assigned = _get_method_property(self.index, MethodProps.ENCODER_IS_ASSIGNED).as_bool()
-        if encoder_is_assigned:
-            return _get_method_property(self.index, MethodProps.ENCODER).as_uuid()
-        return None
+        encoder = None
+        if _get_method_property(self.index, MethodProps.ENCODER_IS_ASSIGNED).as_bool():
+            encoder = _get_method_property(self.index, MethodProps.ENCODER).as_uuid()
 
-    @property
-    def num_streams(self) -> int:
-        """Number of streams"""
+        num_streams = 1
         maybe_pack_streams = _get_method_property(self.index, MethodProps.PACK_STREAMS)
         if maybe_pack_streams.has_value:
-            return maybe_pack_streams.as_int()
-        return 1
+            num_streams = maybe_pack_streams.as_int()
 
-    @property
-    def is_filter(self) -> bool:
-        """Method is a filter"""
-        return _get_method_property(self.index, MethodProps.IS_FILTER).as_bool()
+        is_filter = False
+        maybe_is_filter = _get_method_property(self.index, MethodProps.IS_FILTER)
+        if maybe_is_filter.has_value:
+            is_filter = maybe_is_filter.as_bool()
+
+        # Frozen dataclass: derived fields are filled in once, here.
+        object.__setattr__(self, "id", _get_method_property(self.index, MethodProps.ID).as_int())
+        object.__setattr__(self, "name", _get_method_property(self.index, MethodProps.NAME).as_string())
+        object.__setattr__(self, "description", description)
+        object.__setattr__(self, "decoder", decoder)
+        object.__setattr__(self, "encoder", encoder)
+        object.__setattr__(self, "num_streams", num_streams)
+        object.__setattr__(self, "is_filter", is_filter)
 
 
 class MethodRegistry(Sequence):
     """
-    Read-only access to 7-zip's archive format registry.
+    Read-only access to 7-zip's method registry.
+
+    The registry is read from 7-zip once, on first use, and indexed by name
+    and method id.
     """
 
+    def __init__(self) -> None:
+        self._methods: Optional[Tuple[MethodInfo, ...]] = None
+        self._by_name: Mapping[str, MethodInfo] = MappingProxyType({})
+        self._by_id: Mapping[int, MethodInfo] = MappingProxyType({})
+
+    def _load(self) -> Tuple[MethodInfo, ...]:
+        if self._methods is None:
+            method_infos = tuple(MethodInfo(index) for index in range(_get_num_methods()))
+            self._by_name = MappingProxyType({method.name: method for method in method_infos})
+            self._by_id = MappingProxyType({method.id: method for method in method_infos})
+            self._methods = method_infos
+        return self._methods
+
+    @property
+    def by_name(self) -> Mapping[str, MethodInfo]:
+        """
+        Methods by name.
+        """
+        self._load()
+        return self._by_name
+
+    @property
+    def by_id(self) -> Mapping[int, MethodInfo]:
+        """
+        Methods by method id.
+        """
+        self._load()
+        return self._by_id
+
     def __len__(self) -> int:
-        return _get_num_methods()
+        return len(self._load())
 
     def __getitem__(self, index: int) -> MethodInfo:  # type: ignore
         if isinstance(index, int):
-            return MethodInfo(index)
+            return self._load()[index]
         raise TypeError()
 
 
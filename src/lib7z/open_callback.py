@@ -5,6 +5,11 @@
 Python bindings for the 7-Zip Library: archive open callbacks
 """
 
+import os
+from logging import getLogger
+from os import PathLike
+from typing import List, Optional, Union
+
 from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
 from .hresult import HRESULT
 from .iids import (
@@ -12,14 +17,30 @@ from .iids import (
     IID_IArchiveOpenSetSubArchiveName,
     IID_IArchiveOpenVolumeCallback,
     IID_ICryptoGetTextPassword,
+    IID_IInStream,
 )
-from .propvariant import VARTYPE
+from .propvariant import VARTYPE, encode_propvariant, ns_to_filetime
+from .stream import NativeStream, open_in_stream
 from .unknown import PyUnknown
+from .volumes import VolumeInStream, VolumePrefetcher, VolumeResolver
+
+log = getLogger("lib7z")
+
+# 7-zip's S_FALSE, which GetStream returns for volumes that don't exist.
+_S_FALSE = 1
 
 
 class ArchiveOpenCallback(PyUnknown):
     """
     Archive Open Callbacks
+
+    Handlers of multi-volume archives ask for the volumes after the first
+    (`filename`) by name; `resolver` finds them. With `prefetch_volumes`,
+    that many volumes after the one being read are warmed in the background,
+    by `prefetcher`, once `start_prefetch` is called.
+    Once SetSubArchiveName has been called, the archive being opened is an
+    item of another archive: the handler is told that name, and there are no
+    volumes.
     """
 
     # pylint: disable=invalid-name
@@ -31,10 +52,28 @@ class ArchiveOpenCallback(PyUnknown):
         IID_IArchiveOpenSetSubArchiveName,
     )
 
-    def __init__(self, password=None, stream=None):
+    def __init__(
+        self,
+        password=None,
+        stream=None,
+        *,
+        filename: Union[None, PathLike, str] = None,
+        resolver: Optional[VolumeResolver] = None,
+        prefetch_volumes: int = 0,
+        use_mmap: bool = True,
+        native_streams: bool = True,
+    ):
         self.password = password
         self.stream = stream
         self.subarchive_name = None
+        self.filename = filename
+        self.resolver = resolver
+        self.prefetch_volumes = prefetch_volumes
+        self.use_mmap = use_mmap
+        self.native_streams = native_streams
+        self.volume_paths: List[str] = []
+        self._volumes: list = []
+        self.prefetcher: Optional[VolumePrefetcher] = None
         super().__init__()
 
     def SetTotal(self, files, bytes):
@@ -51,11 +90,75 @@ class ArchiveOpenCallback(PyUnknown):
         return HRESULT.S_OK
 
     def GetProperty(self, prop_id, value):
+        from .archive import ArchiveProps  # pylint: disable=import-outside-toplevel
+
         value.vt = VARTYPE.VT_EMPTY
+        if self.subarchive_name is not None:
+            if prop_id == ArchiveProps.NAME:
+                encode_propvariant(value, self.subarchive_name)
+            return HRESULT.S_OK
+        if self.filename is None:
+            return HRESULT.S_OK
+        try:
+            if prop_id == ArchiveProps.NAME:
+                encode_propvariant(value, os.path.basename(os.fspath(self.filename)))
+            elif prop_id == ArchiveProps.IS_DIR:
+                encode_propvariant(value, False)
+            elif prop_id == ArchiveProps.SIZE:
+                encode_propvariant(value, os.stat(self.filename).st_size, VARTYPE.VT_UI8)
+            elif prop_id == ArchiveProps.MTIME:
+                encode_propvariant(value, ns_to_filetime(os.stat(self.filename).st_mtime_ns), VARTYPE.VT_FILETIME)
+        except OSError:
+            value.vt = VARTYPE.VT_EMPTY
         return HRESULT.S_OK
 
     def GetStream(self, name, in_stream):
-        return HRESULT.E_NOTIMPL
+        in_stream[0] = ffi.NULL
+        if self.resolver is None or self.subarchive_name is not None:
+            return _S_FALSE
+        volume_name = ffi.string(name)
+        try:
+            path = self.resolver(volume_name)
+            if path is None:
+                return _S_FALSE
+            if self.prefetch_volumes > 0:
+                if self.prefetcher is None:
+                    assert self.filename is not None
+                    self.prefetcher = VolumePrefetcher(self.filename, self.prefetch_volumes)
+                stream = VolumeInStream(path, self.prefetcher)
+            else:
+                stream = open_in_stream(path, use_mmap=self.use_mmap, native=self.native_streams)
+        except OSError as exc:
+            log.debug("Failed opening volume %r: %s", volume_name, exc)
+            return _S_FALSE
+        self._volumes.append(stream)
+        self.volume_paths.append(os.fspath(path))
+        if isinstance(stream, NativeStream):
+            # The handler releases the volume when it is closed; keep our own reference.
+            in_stream[0] = stream.new_reference(IID_IInStream)
+        else:
+            in_stream[0] = stream.get_instance(IID_IInStream)
+        return HRESULT.S_OK
 
     def SetSubArchiveName(self, name):
-        return HRESULT.E_NOTIMPL
+        self.subarchive_name = ffi.string(name)
+        return HRESULT.S_OK
+
+    def start_prefetch(self) -> None:
+        """
+        Start following reads of the volumes, once the archive is open.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.start()
+
+    def close_volumes(self) -> None:
+        """
+        Close the volumes opened so far, once the handler that opened them is released.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+        for stream in self._volumes:
+            stream.close()
+        self._volumes = []
+        self.volume_paths = []
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: multi-process extraction and testing
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from os import PathLike
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from .planner import partition_indices
+
+if TYPE_CHECKING:
+    from .archive import Archive
+
+Progress = Callable[[int, int], None]
+
+T = TypeVar("T")
+
+# Each worker gets several partitions, so work is rebalanced and progress is reported more often.
+PARTITIONS_PER_WORKER = 4
+
+
+def _extract_partition(
+    filename: Union[PathLike, str],
+    password: Union[None, str, bytes],
+    indices: List[int],
+    dest_dir: Union[PathLike, str],
+    kwargs: Dict[str, Any],
+) -> None:
+    """
+    Extract items `indices` of `filename` into `dest_dir`, in a worker process.
+    """
+    from .archive import Archive  # pylint: disable=import-outside-toplevel
+
+    with Archive(filename, password=password) as archive:
+        archive.extract(dest_dir, [archive[index] for index in indices], **kwargs)
+
+
+def _test_partition(
+    filename: Union[PathLike, str],
+    password: Union[None, str, bytes],
+    indices: List[int],
+) -> Dict[int, int]:
+    """
+    Test items `indices` of `filename`, in a worker process.
+    """
+    from .archive import Archive  # pylint: disable=import-outside-toplevel
+
+    with Archive(filename, password=password) as archive:
+        return {index: int(result) for index, result in archive.test([archive[index] for index in indices]).items()}
+
+
+def extract_parallel(
+    archive: "Archive",
+    dest_dir: Union[PathLike, str],
+    indices: Optional[Sequence[int]],
+    workers: int,
+    progress: Optional[Progress] = None,
+    **kwargs,
+) -> bool:
+    """
+    Extract items of `archive` into `dest_dir` using up to `workers` processes.
+
+    Each process opens its own handle on the archive file. Returns False,
+    without extracting anything, if the items can't be split (e.g. a solid
+    archive with a single block), so the caller can extract serially.
+    """
+    return map_partitions(archive, indices, workers, progress, _extract_partition, dest_dir, kwargs) is not None
+
+
+def verify_parallel(
+    archive: "Archive",
+    indices: Optional[Sequence[int]],
+    workers: int,
+    progress: Optional[Progress] = None,
+) -> Optional[Dict[int, int]]:
+    """
+    Test items of `archive` using up to `workers` processes, like `extract_parallel`.
+
+    Returns the OperationResult of each item, or None if the items can't be split.
+    """
+    results = map_partitions(archive, indices, workers, progress, _test_partition)
+    if results is None:
+        return None
+    return {index: result for partition in results for index, result in partition.items()}
+
+
+def map_partitions(
+    archive: "Archive",
+    indices: Optional[Sequence[int]],
+    workers: int,
+    progress: Optional[Progress],
+    func: Callable[..., T],
+    *args: Any,
+) -> Optional[List[T]]:
+    """
+    Split items of `archive` by solid block and packed size, and call
+    `func(filename, password, partition, *args)` for each part in up to
+    `workers` processes. `progress(done, total)` is called, in packed bytes,
+    as partitions finish.
+
+    Returns the results in completion order, or None, without calling `func`,
+    if the items can't be split.
+    """
+    snapshot = archive.snapshot(("size", "pack_size", "block"))
+    blocks = snapshot.column("block")
+    if indices is None:
+        indices = range(len(snapshot))
+    # Work is weighted by the bytes each partition reads. Handlers that report pack_size only for the
+    # first item of a solid block leave the others empty, which count for nothing.
+    sizes = snapshot.column("pack_size")
+    if all(sizes[index] is None for index in indices):
+        sizes = snapshot.column("size")
+
+    partitions = partition_indices(indices, sizes, blocks, workers * PARTITIONS_PER_WORKER)
+    if len(partitions) <= 1:
+        return None
+
+    partition_sizes = [sum(sizes[index] or 0 for index in partition) for partition in partitions]
+    total_size = sum(partition_sizes)
+    completed_size = 0
+    results: List[T] = []
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(partitions))) as executor:
+        futures = {executor.submit(func, archive.filename, archive.password, partition, *args): size for partition, size in zip(partitions, partition_sizes)}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    for other in pending:
+                        other.cancel()
+                    raise future.exception()  # type: ignore
+                results.append(future.result())
+                completed_size += futures[future]
+                if progress is not None:
+                    progress(completed_size, total_size)
+
+    return results
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: archive item path index
+"""
+
+import os
+from fnmatch import fnmatchcase
+from os import PathLike
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Union
+
+__all__ = ("PathIndex",)
+
+_MAGIC = frozenset("*?[")
+
+
+def _split(path: Union[PathLike, str]) -> List[str]:
+    """
+    Split `path` into its components, accepting either separator and
+    dropping empty and "." components.
+    """
+    path = os.fspath(path)
+    if not isinstance(path, str):
+        raise TypeError(f"Expected str or PathLike, got {type(path).__name__}")
+    return [part for part in path.replace("\\", "/").split("/") if part and part != "."]
+
+
+class PathIndex:
+    """
+    Archive item lookup by path.
+
+    Keys are normalized strings (either separator, no empty or "." parts,
+    case folded unless `case_sensitive`), so lookups never build PurePaths.
+    Directories that only appear as prefixes of other paths are indexed too,
+    for `listdir` and `glob`, but are not items themselves.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[Optional[str]],
+        is_dirs: Sequence[Optional[bool]],
+        *,
+        case_sensitive: bool = os.name != "nt",
+    ) -> None:
+        self.case_sensitive = case_sensitive
+        self._indices: Dict[str, int] = {}
+        self._dirs: Set[str] = {""}
+        # Directory key -> {folded child name: child name as stored}
+        self._children: Dict[str, Dict[str, str]] = {"": {}}
+
+        for index in range(len(paths)):
+            path = paths[index]
+            if path is None:
+                continue
+            parts = _split(path)
+            if not parts:
+                continue
+            parent = ""
+            for position, part in enumerate(parts):
+                name = self._fold(part)
+                key = f"{parent}/{name}" if parent else name
+                self._children[parent].setdefault(name, part)
+                if position + 1 < len(parts) or is_dirs[index]:
+                    if key not in self._dirs:
+                        self._dirs.add(key)
+                        self._children[key] = {}
+                parent = key
+            self._indices[parent] = index
+
+    def _fold(self, name: str) -> str:
+        return name if self.case_sensitive else name.casefold()
+
+    def key(self, path: Union[PathLike, str]) -> str:
+        """Get the normalized key of `path`."""
+        return "/".join(self._fold(part) for part in _split(path))
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __contains__(self, path: object) -> bool:
+        try:
+            return self.key(path) in self._indices  # type: ignore
+        except TypeError:
+            return False
+
+    def lookup(self, path: Union[PathLike, str]) -> int:
+        """
+        Get the index of the item at `path`.
+
+        Raises KeyError if there is none.
+        """
+        return self._indices[self.key(path)]
+
+    def is_dir(self, path: Union[PathLike, str]) -> bool:
+        """Whether `path` is a directory, stored or implied by other paths."""
+        return self.key(path) in self._dirs
+
+    def listdir(self, path: Union[PathLike, str] = "") -> List[str]:
+        """
+        List the names of the entries directly below directory `path`.
+        """
+        key = self.key(path)
+        if key not in self._dirs:
+            if key in self._indices:
+                raise NotADirectoryError(os.fspath(path))
+            raise FileNotFoundError(os.fspath(path))
+        return list(self._children[key].values())
+
+    def glob(self, pattern: Union[PathLike, str]) -> Iterator[int]:
+        """
+        Yield the indices of items matching `pattern`.
+
+        Components are matched with `fnmatch` rules; a `**` component matches
+        any number of directories, including none.
+        """
+        seen: Set[str] = set()
+        for key in self._glob("", [self._fold(part) for part in _split(pattern)]):
+            if key not in seen:
+                seen.add(key)
+                index = self._indices.get(key)
+                if index is not None:
+                    yield index
+
+    def _glob(self, directory: str, parts: List[str]) -> Iterator[str]:
+        if not parts:
+            yield directory
+            return
+        part, rest = parts[0], parts[1:]
+        children = self._children.get(directory)
+        if children is None:
+            return
+        prefix = f"{directory}/" if directory else ""
+        if part == "**":
+            yield from self._glob(directory, rest)
+            for name in children:
+                key = prefix + name
+                if key in self._dirs:
+                    yield from self._glob(key, parts)
+        elif _MAGIC.isdisjoint(part):
+            if part in children:
+                yield from self._glob(prefix + part, rest)
+        else:
+            for name in children:
+                if fnmatchcase(name, part):
+                    yield from self._glob(prefix + name, rest)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: extraction planning
+"""
+
+from heapq import heapify, heapreplace
+from typing import (
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+__all__ = (
+    "batch_groups",
+    "group_by_block",
+    "partition_indices",
+)
+
+PropertyColumn = Union[Sequence[Optional[int]], Mapping[int, Optional[int]]]
+
+
+def group_by_block(indices: Sequence[int], blocks: PropertyColumn) -> List[List[int]]:
+    """
+    Group item `indices` so that items sharing a solid block stay together.
+
+    `blocks[index]` is the item's BLOCK property, or None for items that can
+    be decoded on their own. Groups are ordered by their first item.
+    """
+    groups: Dict[Hashable, List[int]] = {}
+    for index in sorted(indices):
+        block = blocks[index]
+        key: Hashable = ("item", index) if block is None else ("block", block)
+        groups.setdefault(key, []).append(index)
+    return list(groups.values())
+
+
+def partition_indices(
+    indices: Sequence[int],
+    sizes: PropertyColumn,
+    blocks: PropertyColumn,
+    num_partitions: int,
+) -> List[List[int]]:
+    """
+    Split item `indices` into at most `num_partitions` partitions of similar total size.
+
+    Items of one solid block always land in the same partition, since each
+    partition is decoded independently. Each partition is sorted by index.
+    """
+    groups = group_by_block(indices, blocks)
+    weighted: List[Tuple[int, List[int]]] = [(sum(sizes[index] or 0 for index in group), group) for group in groups]
+    weighted.sort(key=lambda size_group: size_group[0], reverse=True)
+
+    num_partitions = max(1, min(num_partitions, len(weighted)))
+    partitions: List[List[int]] = [[] for _ in range(num_partitions)]
+    # Longest-processing-time first: give each group to the currently lightest partition.
+    loads = [(0, partition_no) for partition_no in range(num_partitions)]
+    heapify(loads)
+    for size, group in weighted:
+        load, partition_no = loads[0]
+        partitions[partition_no].extend(group)
+        heapreplace(loads, (load + size, partition_no))
+
+    return [sorted(partition) for partition in partitions if partition]
+
+
+def batch_groups(groups: Sequence[List[int]], sizes: PropertyColumn, max_batch_size: int) -> Iterator[List[int]]:
+    """
+    Merge consecutive groups into batches of roughly `max_batch_size` unpacked bytes.
+
+    A group is never split, so a batch holding one large solid block may
+    exceed the limit.
+    """
+    batch: List[int] = []
+    batch_size = 0
+    for group in groups:
+        group_size = sum(sizes[index] or 0 for index in group)
+        if batch and batch_size + group_size > max_batch_size:
+            yield batch
+            batch = []
+            batch_size = 0
+        batch.extend(group)
+        batch_size += group_size
+    if batch:
+        yield batch
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: pooled archive handles
+"""
+
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from os import PathLike
+from threading import Condition
+from types import TracebackType
+from typing import Any, Iterator, List, Optional, Tuple, Type, Union
+
+from .archive import Archive, ArchiveClosedError
+
+__all__ = ("ArchivePool",)
+
+
+def _stamp(path: str) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class _Entry:
+    """The handles the pool holds for one archive file."""
+
+    __slots__ = ("stamp", "idle", "num_open")
+
+    def __init__(self, stamp: Tuple[int, int, int]) -> None:
+        self.stamp = stamp
+        self.idle: List[Archive] = []
+        self.num_open = 0
+
+
+class ArchivePool:
+    """
+    Keeps opened Archives for reuse, so hot archives skip format detection and opening.
+
+    Each handle is lent to one borrower at a time, since 7-zip's handlers
+    aren't thread-safe. At most `max_handles` are opened per file and
+    `max_open` overall; when the pool is full, the least recently used idle
+    handle is closed to make room, and borrowers wait if there is none.
+    Handles are dropped when their file's size, mtime or inode changes.
+    Other keyword arguments are passed to each `Archive`.
+    """
+
+    def __init__(self, *, max_handles: int = 4, max_open: int = 64, **archive_kwargs: Any) -> None:
+        if max_handles < 1 or max_open < 1:
+            raise ValueError("Pool limits must be at least 1.")
+        self.max_handles = max_handles
+        self.max_open = max_open
+        self.archive_kwargs = archive_kwargs
+        self.closed = False
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._num_open = 0
+        self._condition = Condition()
+
+    def __len__(self) -> int:
+        """The number of open handles, idle or lent."""
+        return self._num_open
+
+    @contextmanager
+    def acquire(self, filename: Union[PathLike, str]) -> Iterator[Archive]:
+        """
+        Borrow an open Archive of `filename` for the duration of the `with` block.
+        """
+        path = os.path.realpath(filename)
+        entry, archive = self.__checkout(path, _stamp(path))
+        try:
+            yield archive
+        finally:
+            self.__checkin(path, entry, archive)
+
+    def read_bytes(self, filename: Union[PathLike, str], item: Union[int, PathLike, str], **kwargs: Any) -> bytearray:
+        """Read the contents of `item` in `filename` with a pooled handle."""
+        with self.acquire(filename) as archive:
+            return archive[item].read_bytes(**kwargs)
+
+    def __checkout(self, path: str, stamp: Tuple[int, int, int]) -> Tuple[_Entry, Archive]:
+        with self._condition:
+            while True:
+                if self.closed:
+                    raise ArchiveClosedError()
+                entry = self._entries.get(path)
+                if entry is not None and entry.stamp != stamp:
+                    self.__drop(path)
+                    entry = None
+                if entry is None:
+                    entry = self._entries[path] = _Entry(stamp)
+                self._entries.move_to_end(path)
+                if entry.idle:
+                    return entry, entry.idle.pop()
+                if entry.num_open < self.max_handles and (self._num_open < self.max_open or self.__evict()):
+                    entry.num_open += 1
+                    self._num_open += 1
+                    break
+                self._condition.wait()
+
+        try:
+            return entry, Archive(path, **self.archive_kwargs)
+        except BaseException:
+            with self._condition:
+                entry.num_open -= 1
+                self._num_open -= 1
+                self._condition.notify_all()
+            raise
+
+    def __checkin(self, path: str, entry: _Entry, archive: Archive) -> None:
+        with self._condition:
+            if self._entries.get(path) is entry and not archive.closed:
+                entry.idle.append(archive)
+            else:
+                # The handle was closed by its borrower, or its file was invalidated while it was lent.
+                entry.num_open -= 1
+                self._num_open -= 1
+                archive.close()
+            self._condition.notify_all()
+
+    def __evict(self) -> bool:
+        """Close the least recently used idle handle. The caller holds the lock."""
+        for path, entry in self._entries.items():
+            if entry.idle:
+                entry.idle.pop(0).close()
+                entry.num_open -= 1
+                self._num_open -= 1
+                if not entry.num_open:
+                    del self._entries[path]
+                return True
+        return False
+
+    def __drop(self, path: str) -> None:
+        """Close `path`'s idle handles and forget it; lent ones close when returned. The caller holds the lock."""
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            for archive in entry.idle:
+                archive.close()
+            self._num_open -= len(entry.idle)
+            entry.idle.clear()
+
+    def invalidate(self, filename: Union[PathLike, str]) -> None:
+        """Close the pooled handles of `filename`, e.g. after replacing it in place."""
+        with self._condition:
+            self.__drop(os.path.realpath(filename))
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """Close all idle handles; lent handles are closed as they are returned."""
+        with self._condition:
+            self.closed = True
+            for path in list(self._entries):
+                self.__drop(path)
+            self._condition.notify_all()
+
+    def __enter__(self) -> "ArchivePool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
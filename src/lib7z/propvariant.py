@@ -7,7 +7,7 @@ Python bindings for 7-zip: PROPVARIANT
 
 from datetime import datetime, timedelta, timezone
 from enum import IntEnum
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 from uuid import UUID
 
 from cffi.api import FFI
@@ -51,6 +51,41 @@ class VARTYPE(IntEnum):
     VT_FILETIME = 64
 
 
+def filetime_to_datetime(filetime: int) -> datetime:
+    """
+    Convert a FILETIME tick count into an aware datetime.
+    """
+    return datetime(1601, 1, 1, tzinfo=UTC) + timedelta(microseconds=int(filetime * 100))
+
+
+# FILETIME ticks (100ns) between 1601-01-01 and the Unix epoch.
+FILETIME_UNIX_EPOCH = 116444736000000000
+
+
+def filetime_to_ns(filetime: int) -> int:
+    """
+    Convert a FILETIME tick count into nanoseconds since the Unix epoch, as used by `os.utime`.
+    """
+    return (filetime - FILETIME_UNIX_EPOCH) * 100
+
+
+def ns_to_filetime(time_ns: int) -> int:
+    """
+    Convert nanoseconds since the Unix epoch, as in `os.stat_result.st_mtime_ns`, into a FILETIME tick count.
+    """
+    return time_ns // 100 + FILETIME_UNIX_EPOCH
+
+
+def datetime_to_filetime(value: datetime) -> int:
+    """
+    Convert a datetime into a FILETIME tick count. Naive datetimes are taken as UTC.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    delta = value - datetime(1601, 1, 1, tzinfo=UTC)
+    return (delta.days * 86400 + delta.seconds) * 10000000 + delta.microseconds * 10
+
+
 class PropVariant:
     """
     Wrapped PROPVARIANT structure.
@@ -168,41 +203,84 @@ class PropVariant:
         if vt == VARTYPE.VT_DATE:
             return datetime(1899, 12, 31) + timedelta(days=float(self.cdata.dblVal))
         if vt == VARTYPE.VT_FILETIME:
-            return datetime(1601, 1, 1, tzinfo=UTC) + timedelta(microseconds=int(self.cdata.uhVal.QuadPart * 100))
+            return filetime_to_datetime(self.cdata.uhVal.QuadPart)  # type: ignore
         raise TypeError(f"Not a packed datetime: {vt}.")
 
     def as_any(self) -> Union[None, bool, int, datetime, str]:
-        vt = self.cdata.vt
-        if vt in (VARTYPE.VT_EMPTY, VARTYPE.VT_NULL):
-            return None
-        if vt == VARTYPE.VT_BOOL:
-            return bool(self.cdata.boolVal)  # type: ignore
-        if vt == VARTYPE.VT_I1:
-            return int(self.cdata.cVal)  # type: ignore
-        if vt == VARTYPE.VT_I2:
-            return int(self.cdata.iVal)  # type: ignore
-        if vt == VARTYPE.VT_I4:
-            return int(self.cdata.lVal)  # type: ignore
-        if vt == VARTYPE.VT_I8:
-            return int(self.cdata.hVal.QuadPart)  # type: ignore
-        if vt == VARTYPE.VT_INT:
-            return int(self.cdata.intVal)  # type: ignore
-        if vt == VARTYPE.VT_UI1:
-            return int(self.cdata.bVal)  # type: ignore
-        if vt == VARTYPE.VT_UI2:
-            return int(self.cdata.uiVal)  # type: ignore
-        if vt == VARTYPE.VT_UI4:
-            return int(self.cdata.ulVal)  # type: ignore
-        if vt == VARTYPE.VT_UI8:
-            return int(self.cdata.uhVal.QuadPart)  # type: ignore
-        if vt == VARTYPE.VT_UINT:
-            return int(self.cdata.uintVal)  # type: ignore
-        if vt == VARTYPE.VT_BSTR:
-            strval = ffi.string(self.cdata.bstrVal)  # type:ignore
-            assert isinstance(strval, str)
-            return strval
-        if vt == VARTYPE.VT_DATE:
-            return datetime(1899, 12, 31) + timedelta(days=float(self.cdata.dblVal))
-        if vt == VARTYPE.VT_FILETIME:
-            return datetime(1601, 1, 1, tzinfo=UTC) + timedelta(microseconds=int(self.cdata.uhVal.QuadPart * 100))
-        raise TypeError(f"Unknown or unhandled VARTYPE: {vt}")
+        """
+        Get the packed value, whatever its type.
+        """
+        return decode_propvariant(self.cdata)
+
+
+def decode_propvariant(cdata: ffi.CData) -> Union[None, bool, int, datetime, str]:
+    """
+    Decode the contents of a raw PROPVARIANT.
+    """
+    vt = cdata.vt
+    if vt in (VARTYPE.VT_EMPTY, VARTYPE.VT_NULL):
+        return None
+    if vt == VARTYPE.VT_BOOL:
+        return bool(cdata.boolVal)  # type: ignore
+    if vt == VARTYPE.VT_I1:
+        return int(cdata.cVal)  # type: ignore
+    if vt == VARTYPE.VT_I2:
+        return int(cdata.iVal)  # type: ignore
+    if vt == VARTYPE.VT_I4:
+        return int(cdata.lVal)  # type: ignore
+    if vt == VARTYPE.VT_I8:
+        return int(cdata.hVal.QuadPart)  # type: ignore
+    if vt == VARTYPE.VT_INT:
+        return int(cdata.intVal)  # type: ignore
+    if vt == VARTYPE.VT_UI1:
+        return int(cdata.bVal)  # type: ignore
+    if vt == VARTYPE.VT_UI2:
+        return int(cdata.uiVal)  # type: ignore
+    if vt == VARTYPE.VT_UI4:
+        return int(cdata.ulVal)  # type: ignore
+    if vt == VARTYPE.VT_UI8:
+        return int(cdata.uhVal.QuadPart)  # type: ignore
+    if vt == VARTYPE.VT_UINT:
+        return int(cdata.uintVal)  # type: ignore
+    if vt == VARTYPE.VT_BSTR:
+        strval = ffi.string(cdata.bstrVal)  # type:ignore
+        assert isinstance(strval, str)
+        return strval
+    if vt == VARTYPE.VT_DATE:
+        return datetime(1899, 12, 31) + timedelta(days=float(cdata.dblVal))
+    if vt == VARTYPE.VT_FILETIME:
+        return filetime_to_datetime(cdata.uhVal.QuadPart)
+    raise TypeError(f"Unknown or unhandled VARTYPE: {vt}")
+
+
+def encode_propvariant(cdata: ffi.CData, value: Union[None, bool, int, datetime, str], vartype: Optional[VARTYPE] = None) -> None:
+    """
+    Pack `value` into the empty raw PROPVARIANT `cdata`.
+
+    Integers are packed as VT_UI4 when they fit, or VT_UI8; pass `vartype`
+    to force VT_UI8, or VT_FILETIME for a FILETIME tick count. Strings are
+    copied into a new BSTR, which whoever clears the PROPVARIANT must free.
+    """
+    if value is None:
+        cdata.vt = VARTYPE.VT_EMPTY
+    elif isinstance(value, bool):
+        cdata.vt = VARTYPE.VT_BOOL
+        cdata.boolVal = -1 if value else 0
+    elif isinstance(value, datetime):
+        cdata.vt = VARTYPE.VT_FILETIME
+        cdata.uhVal.QuadPart = datetime_to_filetime(value)
+    elif isinstance(value, int):
+        if vartype is None:
+            vartype = VARTYPE.VT_UI4 if 0 <= value <= 0xFFFFFFFF else VARTYPE.VT_UI8
+        if vartype == VARTYPE.VT_UI4:
+            cdata.ulVal = value
+        elif vartype in (VARTYPE.VT_UI8, VARTYPE.VT_FILETIME):
+            cdata.uhVal.QuadPart = value
+        else:
+            raise TypeError(f"Can't pack an int as {vartype!r}.")
+        cdata.vt = vartype
+    elif isinstance(value, str):
+        cdata.vt = VARTYPE.VT_BSTR
+        cdata.bstrVal = lib.SysAllocStringLen(value, len(value))
+    else:
+        raise TypeError(f"Can't pack {type(value).__name__} into a PROPVARIANT.")
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: streaming item readers
+"""
+
+from io import RawIOBase, UnsupportedOperation
+from logging import getLogger
+from os import SEEK_CUR, SEEK_END, SEEK_SET
+from threading import Condition, Thread
+from typing import TYPE_CHECKING, Callable, Optional
+
+from .ffi7z import ffi  # pylint: disable=no-name-in-module
+
+if TYPE_CHECKING:
+    from .archive import ArchiveItem
+
+log = getLogger("lib7z")
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+_SKIP_CHUNK_SIZE = 1 << 16
+
+
+def _seek_target(position: int, offset: int, whence: int, size: Optional[int]) -> int:
+    if whence == SEEK_SET:
+        target = offset
+    elif whence == SEEK_CUR:
+        target = position + offset
+    elif whence == SEEK_END:
+        if size is None:
+            raise UnsupportedOperation("Item size is unknown.")
+        target = size + offset
+    else:
+        raise ValueError(f"Invalid whence: {whence!r}")
+    if target < 0:
+        raise ValueError(f"Negative seek position {target}")
+    return target
+
+
+class RingBuffer:
+    """
+    Bounded byte ring buffer connecting one writer thread to one reader.
+
+    Writes block while the buffer is full, so a fast producer (7-zip's
+    decoder) can never run more than `capacity` bytes ahead of the consumer.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_BUFFER_SIZE) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._buffer = memoryview(bytearray(capacity))
+        self._start = 0
+        self._size = 0
+        self._cond = Condition()
+        self._writer_closed = False
+        self._reader_closed = False
+        self._error: Optional[BaseException] = None
+
+    def write(self, data) -> int:
+        """
+        Write all of `data`, blocking while the buffer is full.
+
+        Raises BrokenPipeError if the reader has gone away.
+        """
+        view = memoryview(data).cast("B")
+        total = len(view)
+        offset = 0
+        capacity = self.capacity
+        with self._cond:
+            while offset < total:
+                while self._size == capacity and not self._reader_closed:
+                    self._cond.wait()
+                if self._reader_closed:
+                    raise BrokenPipeError()
+                end = (self._start + self._size) % capacity
+                chunk = min(total - offset, capacity - self._size, capacity - end)
+                self._buffer[end : end + chunk] = view[offset : offset + chunk]
+                self._size += chunk
+                offset += chunk
+                self._cond.notify_all()
+        return total
+
+    def flush(self) -> None:
+        """Nothing to flush: written data is immediately readable."""
+
+    def readinto(self, data) -> int:
+        """
+        Read into `data`, blocking until something is available.
+
+        Returns 0 at the end of the stream. If the writer failed, its error is
+        raised once the buffered data has been read.
+        """
+        view = memoryview(data).cast("B")
+        if not view:
+            return 0
+        with self._cond:
+            while self._size == 0 and not self._writer_closed:
+                self._cond.wait()
+            if self._size == 0:
+                if self._error is not None:
+                    raise self._error
+                return 0
+            chunk = min(len(view), self._size, self.capacity - self._start)
+            view[:chunk] = self._buffer[self._start : self._start + chunk]
+            self._start = (self._start + chunk) % self.capacity
+            self._size -= chunk
+            self._cond.notify_all()
+            return chunk
+
+    def close_writer(self, error: Optional[BaseException] = None) -> None:
+        """Mark the end of the stream, optionally with the error that ended it."""
+        with self._cond:
+            self._writer_closed = True
+            self._error = error
+            self._cond.notify_all()
+
+    def close_reader(self) -> None:
+        """Discard buffered data and make further writes fail."""
+        with self._cond:
+            self._reader_closed = True
+            self._size = 0
+            self._cond.notify_all()
+
+
+class ArchiveItemReader(RawIOBase):
+    """
+    Raw, read-only stream of an archive item's contents.
+
+    The item is extracted on a worker thread into a bounded ring buffer, so
+    memory use stays constant however large the item is. `claim` is called
+    before each extraction starts, and `extract` must release the claim
+    when it finishes.
+
+    Seeking forward decodes and discards the skipped bytes; seeking backward
+    restarts the extraction from the beginning of the item.
+    """
+
+    def __init__(
+        self,
+        item: "ArchiveItem",
+        claim: Callable[[], None],
+        extract: Callable[[RingBuffer], None],
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> None:
+        super().__init__()
+        self.item = item
+        self._claim = claim
+        self._extract = extract
+        self._buffer_size = buffer_size
+        self._position = 0
+        self._thread: Optional[Thread] = None
+        self._start()
+
+    def _start(self) -> None:
+        self._claim()
+        self._ring = RingBuffer(self._buffer_size)
+        self._thread = Thread(target=self._run, args=(self._ring,), name=f"lib7z-reader-{self.item.index}", daemon=True)
+        self._thread.start()
+
+    def _stop(self) -> None:
+        if self._thread is not None:
+            # Closing the ring makes the decoder's next write fail, which aborts the extraction.
+            self._ring.close_reader()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, ring: RingBuffer) -> None:
+        try:
+            self._extract(ring)
+        except BaseException as exc:  # pylint: disable=broad-exception-caught
+            ring.close_writer(exc)
+        else:
+            ring.close_writer()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        count = self._ring.readinto(buffer)
+        self._position += count
+        return count
+
+    def tell(self) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        return self._position
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        target = _seek_target(self._position, offset, whence, self.item.size)
+        if target < self._position:
+            self._stop()
+            self._position = 0
+            self._start()
+        scratch = memoryview(bytearray(min(target - self._position, _SKIP_CHUNK_SIZE)))
+        while self._position < target:
+            count = self._ring.readinto(scratch[: target - self._position])
+            if not count:
+                break
+            self._position += count
+        self._position = target
+        return target
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop()
+        super().close()
+
+
+class ArchiveItemStreamReader(RawIOBase):
+    """
+    Raw, read-only, seekable stream of an item the handler can read in place.
+
+    Some handlers (e.g. for stored zip or tar members) give direct access to
+    an item's bytes in the archive file, so seeks need no decoding at all.
+    `release` is called once the stream is closed.
+    """
+
+    def __init__(self, item: "ArchiveItem", stream: ffi.CData, release: Callable[[], None]) -> None:
+        super().__init__()
+        self.item = item
+        self._stream = stream
+        self._release = release
+        self._processed = ffi.new("uint32_t *")
+        self._new_position = ffi.new("uint64_t *")
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        view = memoryview(buffer).cast("B")
+        stream = self._stream
+        result = stream.vtable.Read(stream, ffi.from_buffer(view), min(len(view), 0xFFFFFFFF), self._processed)  # type: ignore
+        if result & 0x80000000:
+            raise OSError(f"HRESULT(0x{result:#08x})")
+        return self._processed[0]
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        stream = self._stream
+        result = stream.vtable.Seek(stream, offset, whence, self._new_position)  # type: ignore
+        if result & 0x80000000:
+            raise OSError(f"HRESULT(0x{result:#08x})")
+        return self._new_position[0]
+
+    def tell(self) -> int:
+        return self.seek(0, SEEK_CUR)
+
+    def close(self) -> None:
+        if not self.closed:
+            ffi.release(self._stream)
+            self._release()
+        super().close()
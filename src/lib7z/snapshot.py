@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: columnar archive item property snapshots
+"""
+
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .ffi7z import ffi  # pylint: disable=no-name-in-module
+from .propvariant import VARTYPE, decode_propvariant, filetime_to_datetime
+
+__all__ = (
+    "ArchiveSnapshot",
+    "SnapshotRow",
+)
+
+_MISSING_STRING = 0xFFFFFFFF
+
+_UNSIGNED_FIELDS = {
+    VARTYPE.VT_UI1: "bVal",
+    VARTYPE.VT_UI2: "uiVal",
+    VARTYPE.VT_UI4: "ulVal",
+    VARTYPE.VT_UINT: "uintVal",
+}
+
+_SIGNED_FIELDS = {
+    VARTYPE.VT_I1: "cVal",
+    VARTYPE.VT_I2: "iVal",
+    VARTYPE.VT_I4: "lVal",
+    VARTYPE.VT_INT: "intVal",
+}
+
+
+class _Column:
+    """
+    Base class for snapshot columns.
+
+    `append` decodes a raw PROPVARIANT into the column, returning False if
+    the value's type does not fit the column's storage.
+    """
+
+    __slots__ = ()
+
+    def append(self, cdata: ffi.CData) -> bool:
+        """Append the value held by `cdata`."""
+        raise NotImplementedError()
+
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+    def __getitem__(self, row: int) -> Any:
+        raise NotImplementedError()
+
+
+class _ObjectColumn(_Column):
+    """Fallback column holding decoded Python objects."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Optional[List[Any]] = None) -> None:
+        self.values: List[Any] = values if values is not None else []
+
+    def append(self, cdata: ffi.CData) -> bool:
+        self.values.append(decode_propvariant(cdata))
+        return True
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, row: int) -> Any:
+        return self.values[row]
+
+
+class _IntColumn(_Column):
+    """Integer column stored in an `array`, with a presence mask for missing values."""
+
+    __slots__ = ("values", "present", "wide_vt", "fields")
+
+    def __init__(self, signed: bool) -> None:
+        self.values = array("q" if signed else "Q")
+        self.present = bytearray()
+        self.wide_vt = VARTYPE.VT_I8 if signed else VARTYPE.VT_UI8
+        self.fields = _SIGNED_FIELDS if signed else _UNSIGNED_FIELDS
+
+    def append(self, cdata: ffi.CData) -> bool:
+        vt = cdata.vt
+        if vt == self.wide_vt:
+            self.values.append(cdata.uhVal.QuadPart if vt == VARTYPE.VT_UI8 else cdata.hVal.QuadPart)
+        elif vt in self.fields:
+            self.values.append(getattr(cdata, self.fields[vt]))
+        elif vt == VARTYPE.VT_EMPTY:
+            self.values.append(0)
+            self.present.append(0)
+            return True
+        else:
+            return False
+        self.present.append(1)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, row: int) -> Optional[int]:
+        if self.present[row]:
+            return self.values[row]
+        return None
+
+
+class _TimeColumn(_Column):
+    """FILETIME column, stored as raw 100ns ticks and decoded on access."""
+
+    __slots__ = ("values", "present")
+
+    def __init__(self) -> None:
+        self.values = array("Q")
+        self.present = bytearray()
+
+    def append(self, cdata: ffi.CData) -> bool:
+        vt = cdata.vt
+        if vt == VARTYPE.VT_FILETIME:
+            self.values.append(cdata.uhVal.QuadPart)
+            self.present.append(1)
+        elif vt == VARTYPE.VT_EMPTY:
+            self.values.append(0)
+            self.present.append(0)
+        else:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, row: int) -> Optional[datetime]:
+        if self.present[row]:
+            return filetime_to_datetime(self.values[row])
+        return None
+
+    def filetime(self, row: int) -> Optional[int]:
+        """Get the raw FILETIME tick count of `row`."""
+        if self.present[row]:
+            return self.values[row]
+        return None
+
+
+class _BoolColumn(_Column):
+    """Boolean column, one byte per row (0: False, 1: True, 2: missing)."""
+
+    __slots__ = ("values",)
+
+    def __init__(self) -> None:
+        self.values = bytearray()
+
+    def append(self, cdata: ffi.CData) -> bool:
+        vt = cdata.vt
+        if vt == VARTYPE.VT_BOOL:
+            self.values.append(1 if cdata.boolVal else 0)
+        elif vt == VARTYPE.VT_EMPTY:
+            self.values.append(2)
+        else:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, row: int) -> Optional[bool]:
+        value = self.values[row]
+        if value == 2:
+            return None
+        return bool(value)
+
+
+class _StringColumn(_Column):
+    """String column, stored as indices into a table of distinct strings."""
+
+    __slots__ = ("values", "strings", "string_ids")
+
+    def __init__(self) -> None:
+        self.values = array("L")
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+
+    def append(self, cdata: ffi.CData) -> bool:
+        vt = cdata.vt
+        if vt == VARTYPE.VT_BSTR:
+            string = ffi.string(cdata.bstrVal)
+            string_id = self.string_ids.get(string)  # type: ignore
+            if string_id is None:
+                string_id = len(self.strings)
+                self.strings.append(string)  # type: ignore
+                self.string_ids[string] = string_id  # type: ignore
+            self.values.append(string_id)
+        elif vt == VARTYPE.VT_EMPTY:
+            self.values.append(_MISSING_STRING)
+        else:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        string_id = self.values[row]
+        if string_id == _MISSING_STRING:
+            return None
+        return self.strings[string_id]
+
+
+def make_column(vartype: Optional[int]) -> _Column:
+    """
+    Create an empty column suitable for values of type `vartype`.
+    """
+    if vartype in (VARTYPE.VT_UI8, *_UNSIGNED_FIELDS):
+        return _IntColumn(signed=False)
+    if vartype in (VARTYPE.VT_I8, *_SIGNED_FIELDS):
+        return _IntColumn(signed=True)
+    if vartype == VARTYPE.VT_FILETIME:
+        return _TimeColumn()
+    if vartype == VARTYPE.VT_BOOL:
+        return _BoolColumn()
+    if vartype == VARTYPE.VT_BSTR:
+        return _StringColumn()
+    return _ObjectColumn()
+
+
+def has_packed_column(vartype: Optional[int]) -> bool:
+    """
+    Whether values of type `vartype` are stored packed, rather than as Python objects.
+    """
+    return not isinstance(make_column(vartype), _ObjectColumn)
+
+
+def append_value(columns: List[_Column], position: int, cdata: ffi.CData) -> None:
+    """
+    Append the value in `cdata` to `columns[position]`.
+
+    If the value does not fit the column's storage (the handler returned a
+    different type than it advertised), the column is demoted to a plain
+    object column first.
+    """
+    column = columns[position]
+    if not column.append(cdata):
+        column = _ObjectColumn([column[row] for row in range(len(column))])
+        column.append(cdata)
+        columns[position] = column
+
+
+def dump_column(column: _Column) -> Tuple[Any, ...]:
+    """
+    Get the contents of `column` as a tuple of plain values, for `marshal`.
+
+    Typed columns keep their packed storage; `load_column` reverses this.
+    """
+    if isinstance(column, _IntColumn):
+        return ("int", column.values.typecode, column.values.tobytes(), bytes(column.present))
+    if isinstance(column, _TimeColumn):
+        return ("time", column.values.tobytes(), bytes(column.present))
+    if isinstance(column, _BoolColumn):
+        return ("bool", bytes(column.values))
+    if isinstance(column, _StringColumn):
+        return ("str", column.values.tobytes(), tuple(column.strings))
+    values = tuple(("datetime", value.isoformat()) if isinstance(value, datetime) else value for value in column.values)  # type: ignore
+    return ("object", values)
+
+
+def load_column(data: Tuple[Any, ...]) -> _Column:
+    """
+    Rebuild a column from the output of `dump_column`.
+    """
+    kind = data[0]
+    column: _Column
+    if kind == "int":
+        column = _IntColumn(signed=data[1] == "q")
+        column.values.frombytes(data[2])
+        column.present = bytearray(data[3])
+    elif kind == "time":
+        column = _TimeColumn()
+        column.values.frombytes(data[1])
+        column.present = bytearray(data[2])
+    elif kind == "bool":
+        column = _BoolColumn()
+        column.values = bytearray(data[1])
+    elif kind == "str":
+        column = _StringColumn()
+        column.values.frombytes(data[1])
+        column.strings = list(data[2])
+        column.string_ids = {string: string_id for string_id, string in enumerate(column.strings)}
+    elif kind == "object":
+        column = _ObjectColumn([datetime.fromisoformat(value[1]) if isinstance(value, tuple) else value for value in data[1]])
+    else:
+        raise ValueError(f"Unknown column kind: {kind!r}")
+    return column
+
+
+class SnapshotRow:
+    """
+    A lightweight view of one item in an ArchiveSnapshot.
+    """
+
+    __slots__ = ("_snapshot", "index")
+
+    def __init__(self, snapshot: "ArchiveSnapshot", index: int) -> None:
+        self._snapshot = snapshot
+        self.index = index
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            column = self._snapshot.column(name)
+        except KeyError as exc:
+            raise AttributeError(name) from exc
+        return column[self.index]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the snapshotted properties of this item as a dict."""
+        return {name: self._snapshot.column(name)[self.index] for name in self._snapshot.props}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.index}: {self.as_dict()!r}>"
+
+
+class ArchiveSnapshot(Sequence):
+    """
+    Item properties for a whole archive, read in one pass and stored by column.
+    """
+
+    props: Tuple[str, ...]
+
+    def __init__(self, props: Tuple[str, ...], columns: List[_Column], num_items: int) -> None:
+        self.props = props
+        self._columns = dict(zip(props, columns))
+        self._num_items = num_items
+
+    def column(self, name: str) -> _Column:
+        """
+        Get the column for property `name`.
+
+        Columns support `len()` and indexing by item index.
+        """
+        return self._columns[name]
+
+    def select(self, props: Tuple[str, ...]) -> "ArchiveSnapshot":
+        """
+        Get a snapshot of just `props`, sharing this snapshot's columns.
+
+        Properties this snapshot doesn't hold read as missing.
+        """
+        columns: List[_Column] = []
+        for name in props:
+            column = self._columns.get(name)
+            columns.append(column if column is not None else _ObjectColumn([None] * self._num_items))
+        return ArchiveSnapshot(props, columns, self._num_items)
+
+    def __len__(self) -> int:
+        return self._num_items
+
+    def __getitem__(self, index: Union[int, slice]) -> SnapshotRow:  # type: ignore
+        if isinstance(index, int):
+            if index < 0:
+                index += self._num_items
+            if not (0 <= index < self._num_items):
+                raise IndexError()
+            return SnapshotRow(self, index)
+        raise TypeError(f"Snapshot rows are indexed by int, not {type(index).__name__}; slicing is not supported.")
+
+    def __iter__(self) -> Iterator[SnapshotRow]:
+        for index in range(self._num_items):
+            yield SnapshotRow(self, index)
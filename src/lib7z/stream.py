@@ -5,10 +5,15 @@
 Python bindings for the 7-Zip Library: IO Streams
 """
 
+import mmap
+import os
 from os import SEEK_CUR, SEEK_END, SEEK_SET, PathLike
-from typing import BinaryIO, Union
+from stat import S_ISREG
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Callable, Optional, Tuple, Union
+from uuid import UUID
 
-from .ffi7z import ffi  # pylint: disable=no-name-in-module
+from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
 from .hresult import HRESULT
 from .iids import (
     IID_IInStream,
@@ -16,6 +21,9 @@ from .iids import (
     IID_ISequentialInStream,
     IID_ISequentialOutStream,
     IID_IStreamGetSize,
+    ReleaseObject,
+    iid_opaque_impl_struct_name,
+    marshall_guid,
 )
 from .unknown import PyUnknown
 
@@ -36,13 +44,30 @@ class PyInStream(PyUnknown):
     def __init__(self, stream: BinaryIO, stream_size=None) -> None:
         self.stream = stream
         self.stream_size = stream_size
+        self._readinto = stream.readinto
         super().__init__()
 
+    def read_head(self, size: int) -> bytes:
+        """Read up to `size` bytes from the start of the stream, then rewind it."""
+        self.stream.seek(0, SEEK_SET)
+        head = self.stream.read(size)
+        self.stream.seek(0, SEEK_SET)
+        return head
+
+    def rewind(self) -> None:
+        """Seek back to the start of the stream."""
+        self.stream.seek(0, SEEK_SET)
+
+    def close(self) -> None:
+        """Close the backing stream."""
+        self.stream.close()
+
     def Read(self, array_ptr, bytes_to_read, bytes_read):
         """Read from the stream."""
         try:
-            array_buf = ffi.buffer(array_ptr, bytes_to_read)
-            bytes_read[0] = self.stream.readinto(array_buf)
+            count = self._readinto(ffi.buffer(array_ptr, bytes_to_read))
+            if bytes_read != ffi.NULL:
+                bytes_read[0] = count
             return HRESULT.S_OK
         except IOError:
             return HRESULT.E_FAIL
@@ -59,24 +84,477 @@ class PyInStream(PyUnknown):
 
     def GetSize(self, size_ptr):
         """Get the size of the backing object."""
+        if self.stream_size is not None:
+            size_ptr[0] = self.stream_size
+            return HRESULT.S_OK
         last_position = self.stream.seek(0, SEEK_CUR)
         size_ptr[0] = self.stream.seek(0, SEEK_END)
         self.stream.seek(last_position, SEEK_SET)
         return HRESULT.S_OK
 
 
+class PySequentialInStream(PyUnknown):
+    """
+    ISequentialInStream implementation backed by a Python binary IO stream that can't seek.
+
+    An exception raised by the stream aborts the operation and is kept in `error`.
+    """
+
+    # pylint: disable=invalid-name
+
+    IIDS = (IID_ISequentialInStream,)
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self.stream = stream
+        self.error: Optional[BaseException] = None
+        self._readinto = stream.readinto
+        super().__init__()
+
+    def Read(self, array_ptr, bytes_to_read, bytes_read):
+        """Read from the stream."""
+        try:
+            count = self._readinto(ffi.buffer(array_ptr, bytes_to_read)) or 0
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.error = exc
+            return HRESULT.E_FAIL
+        if bytes_read != ffi.NULL:
+            bytes_read[0] = count
+        return HRESULT.S_OK
+
+
+class SpoolInStream(PyUnknown):
+    """
+    Seekable IInStream over a Python binary IO stream that can't seek, e.g. an item being decoded.
+
+    The source is only read as far as 7-zip reads or seeks, and everything
+    read is kept so 7-zip can seek back: in memory up to `max_memory` bytes,
+    then in a temporary file. An exception raised by the source is kept in
+    `error`.
+    """
+
+    # pylint: disable=invalid-name
+
+    IIDS = (
+        IID_IInStream,
+        IID_ISequentialInStream,
+        IID_IStreamGetSize,
+    )
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, source: BinaryIO, max_memory: int = 64 << 20) -> None:
+        self.source = source
+        self.spool = SpooledTemporaryFile(max_size=max_memory)  # pylint: disable=consider-using-with
+        self.error: Optional[BaseException] = None
+        self.position = 0
+        self.filled = 0
+        self.eof = False
+        self._chunk = bytearray(self.CHUNK_SIZE)
+        super().__init__()
+
+    def __fill(self, end: Optional[int]) -> None:
+        """Copy the source into the spool up to offset `end`, or to its end."""
+        view = memoryview(self._chunk)
+        self.spool.seek(self.filled, SEEK_SET)
+        while not self.eof and (end is None or self.filled < end):
+            count = self.source.readinto(view) or 0
+            if not count:
+                self.eof = True
+                break
+            self.spool.write(view[:count])
+            self.filled += count
+
+    def read_head(self, size: int) -> bytes:
+        """Read up to `size` bytes from the start of the stream."""
+        self.__fill(size)
+        self.spool.seek(0, SEEK_SET)
+        return self.spool.read(min(size, self.filled))
+
+    def rewind(self) -> None:
+        """Seek back to the start of the stream."""
+        self.position = 0
+
+    def close(self) -> None:
+        """Close the source and drop the spool."""
+        self.source.close()
+        self.spool.close()
+
+    def Read(self, array_ptr, bytes_to_read, bytes_read):
+        """Read from the spool, filling it from the source first."""
+        try:
+            self.__fill(self.position + bytes_to_read)
+            count = 0
+            if self.position < self.filled:
+                self.spool.seek(self.position, SEEK_SET)
+                # SpooledTemporaryFile only has readinto from Python 3.11.
+                data = self.spool.read(min(bytes_to_read, self.filled - self.position))
+                ffi.memmove(array_ptr, data, len(data))
+                count = len(data)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.error = exc
+            return HRESULT.E_FAIL
+        self.position += count
+        if bytes_read != ffi.NULL:
+            bytes_read[0] = count
+        return HRESULT.S_OK
+
+    def Seek(self, offset, origin, new_position):
+        """Move the read position; seeking from the end reads the whole source."""
+        try:
+            if origin == SEEK_END:
+                self.__fill(None)
+                position = self.filled + offset
+            else:
+                position = (self.position if origin == SEEK_CUR else 0) + offset
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.error = exc
+            return HRESULT.E_FAIL
+        if position < 0:
+            return HRESULT.E_INVALIDARG
+        self.position = position
+        if new_position != ffi.NULL:
+            new_position[0] = position
+        return HRESULT.S_OK
+
+    def GetSize(self, size_ptr):
+        """Get the size of the source, reading all of it."""
+        try:
+            self.__fill(None)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.error = exc
+            return HRESULT.E_FAIL
+        size_ptr[0] = self.filled
+        return HRESULT.S_OK
+
+
 class FileInStream(PyInStream):
     """
     IInStream implemetation backed by a Python file stream.
     """
 
     def __init__(self, filename: Union[PathLike, str]) -> None:
-        super().__init__(open(filename, "rb"))
+        stream = open(filename, "rb")  # pylint: disable=consider-using-with
+        try:
+            stream_size = os.fstat(stream.fileno()).st_size
+        except Exception:
+            stream.close()
+            raise
+        super().__init__(stream, stream_size)
+
+
+class MmapInStream(PyUnknown):
+    """
+    IInStream implementation backed by a read-only memory map of a file.
+
+    Reads are a single memmove from the mapping into 7-zip's buffer, and the
+    file size is known up front.
+    """
+
+    # pylint: disable=invalid-name
+
+    IIDS = (
+        IID_IInStream,
+        IID_ISequentialInStream,
+        IID_IStreamGetSize,
+    )
+
+    def __init__(self, filename: Union[PathLike, str]) -> None:
+        self.file = open(filename, "rb")  # pylint: disable=consider-using-with
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+        self.base = ffi.from_buffer(self.map)
+        self.size = len(self.map)
+        self.position = 0
+        super().__init__()
+
+    def Read(self, array_ptr, bytes_to_read, bytes_read):
+        """Copy from the mapping."""
+        count = max(0, min(bytes_to_read, self.size - self.position))
+        if count:
+            ffi.memmove(array_ptr, self.base + self.position, count)
+            self.position += count
+        if bytes_read != ffi.NULL:
+            bytes_read[0] = count
+        return HRESULT.S_OK
+
+    def Seek(self, offset, origin, new_position):
+        """Seek to a new position in the mapping."""
+        if origin == SEEK_SET:
+            position = offset
+        elif origin == SEEK_CUR:
+            position = self.position + offset
+        elif origin == SEEK_END:
+            position = self.size + offset
+        else:
+            return HRESULT.E_INVALIDARG
+        if position < 0:
+            return HRESULT.E_INVALIDARG
+        self.position = position
+        if new_position != ffi.NULL:
+            new_position[0] = position
+        return HRESULT.S_OK
+
+    def GetSize(self, size_ptr):
+        """Get the size of the mapped file."""
+        size_ptr[0] = self.size
+        return HRESULT.S_OK
+
+    def read_head(self, size: int) -> bytes:
+        """Read up to `size` bytes from the start of the file."""
+        self.position = 0
+        return self.map[:size]
+
+    def rewind(self) -> None:
+        """Seek back to the start of the file."""
+        self.position = 0
+
+    def close(self) -> None:
+        """Unmap and close the file."""
+        if not self.map.closed:
+            ffi.release(self.base)
+            self.map.close()
+        self.file.close()
+
+
+def _check_native(result: int) -> None:
+    if result & 0x80000000:
+        raise RuntimeError(f"HRESULT(0x{result:#08x})")
+
+
+def _native_mem_buffer(instance: Optional[ffi.CData]) -> Tuple[ffi.CData, int]:
+    """Get the data pointer and size of a native memory output stream."""
+    if instance is None:
+        raise ValueError("I/O operation on closed stream.")
+    data_ptr = ffi.new("void **")
+    size_ptr = ffi.new("uint64_t *")
+    _check_native(lib.GetNativeMemOutStreamBuffer(instance, data_ptr, size_ptr))  # type: ignore
+    return data_ptr[0], size_ptr[0]
+
+
+class NativeStream:
+    """
+    Base class for streams implemented in C (see `ffi7z/ffi7z_native.c`).
+
+    7-zip calls these directly, so reads and writes never enter Python or
+    take the GIL. The wrapper owns one COM reference, dropped by `close()`.
+    """
+
+    def __init__(self, instance: ffi.CData) -> None:
+        self.instance: Optional[ffi.CData] = ffi.gc(instance, ReleaseObject)
+
+    def __query_interface(self, iid: UUID) -> ffi.CData:
+        if self.instance is None:
+            raise ValueError("I/O operation on closed stream.")
+        out_ptr = ffi.new("void **")
+        result = self.instance.vtable.QueryInterface(self.instance, marshall_guid(iid), out_ptr)  # type: ignore
+        if result & 0x80000000:
+            raise KeyError(iid)
+        return ffi.cast(f"{iid_opaque_impl_struct_name(iid)} *", out_ptr[0])
+
+    def get_instance(self, iid: UUID) -> ffi.CData:
+        """
+        Get the interface struct corresponding to `iid`.
+
+        The pointer is borrowed: it stays valid while this stream is open.
+        """
+        instance = self.__query_interface(iid)
+        instance.vtable.Release(instance)  # type: ignore
+        return instance
+
+    def new_reference(self, iid: UUID) -> ffi.CData:
+        """
+        Get the interface struct corresponding to `iid`, with a reference of its own.
+
+        Use this for out-parameters such as GetStream's, which 7-zip releases when done.
+        """
+        return self.__query_interface(iid)
+
+    def close(self) -> None:
+        """Drop our reference; the C object is freed once 7-zip has dropped its own."""
+        if self.instance is not None:
+            ffi.release(self.instance)
+            self.instance = None
+
+
+class NativeInStream(NativeStream):
+    """
+    Base class for native input streams.
+    """
+
+    IIDS: Tuple[UUID, ...] = (
+        IID_IInStream,
+        IID_ISequentialInStream,
+        IID_IStreamGetSize,
+    )
+
+    def rewind(self) -> None:
+        """Seek back to the start of the stream."""
+        if self.instance is None:
+            raise ValueError("I/O operation on closed stream.")
+        _check_native(self.instance.vtable.Seek(self.instance, 0, SEEK_SET, ffi.NULL))  # type: ignore
+
+
+class NativeFileInStream(NativeInStream):
+    """
+    Native IInStream reading a file through its OS handle.
+    """
+
+    def __init__(self, filename: Union[PathLike, str]) -> None:
+        self.file = open(filename, "rb")  # pylint: disable=consider-using-with
+        try:
+            stream_ptr = ffi.new("FFI7Z_IInStream **")
+            _check_native(lib.CreateNativeFdInStream(self.file.fileno(), stream_ptr))  # type: ignore
+        except Exception:
+            self.file.close()
+            raise
+        super().__init__(stream_ptr[0])
+
+    def read_head(self, size: int) -> bytes:
+        """Read up to `size` bytes from the start of the file."""
+        self.file.seek(0, SEEK_SET)
+        return self.file.read(size)
+
+    def close(self) -> None:
+        """Release the native stream and close the file."""
+        super().close()
+        self.file.close()
+
+
+class NativeMmapInStream(NativeInStream):
+    """
+    Native IInStream reading from a read-only memory map of a file.
+
+    The native stream borrows the mapping, which is kept until `close()`.
+    """
+
+    def __init__(self, filename: Union[PathLike, str]) -> None:
+        self.file = open(filename, "rb")  # pylint: disable=consider-using-with
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+        self.base = ffi.from_buffer(self.map)
+        stream_ptr = ffi.new("FFI7Z_IInStream **")
+        try:
+            _check_native(lib.CreateNativeMemInStream(self.base, len(self.map), stream_ptr))  # type: ignore
+        except Exception:
+            ffi.release(self.base)
+            self.map.close()
+            self.file.close()
+            raise
+        super().__init__(stream_ptr[0])
+
+    def read_head(self, size: int) -> bytes:
+        """Read up to `size` bytes from the start of the file."""
+        return self.map[:size]
+
+    def close(self) -> None:
+        """Release the native stream, then unmap and close the file."""
+        super().close()
+        if not self.map.closed:
+            ffi.release(self.base)
+            self.map.close()
+        self.file.close()
+
+
+class NativeMemInStream(NativeInStream):
+    """
+    Native IInStream reading from a bytes-like object.
+
+    The native stream borrows the object's buffer, which is kept until `close()`.
+    """
+
+    def __init__(self, data) -> None:
+        self.base = ffi.from_buffer(data)
+        stream_ptr = ffi.new("FFI7Z_IInStream **")
+        try:
+            _check_native(lib.CreateNativeMemInStream(self.base, len(self.base), stream_ptr))  # type: ignore
+        except Exception:
+            ffi.release(self.base)
+            raise
+        super().__init__(stream_ptr[0])
+
+    def read_head(self, size: int) -> bytes:
+        """Read up to `size` bytes from the start of the buffer."""
+        return ffi.buffer(self.base, min(size, len(self.base)))[:]
+
+    def close(self) -> None:
+        """Release the native stream and the buffer."""
+        if self.instance is not None:
+            super().close()
+            ffi.release(self.base)
+
+
+class NativeItemInStream(NativeInStream):
+    """
+    A handler's IInStream of one of its items' bytes in place (see IInArchiveGetStream).
+
+    `release` is called once the stream is closed.
+    """
+
+    def __init__(self, instance: ffi.CData, release: Callable[[], None]) -> None:
+        # `instance` already drops its reference when collected.
+        self.instance = instance
+        self._release = release
+
+    def read_head(self, size: int) -> bytes:
+        """Read up to `size` bytes from the start of the item, then rewind it."""
+        self.rewind()
+        head = bytearray(size)
+        processed = ffi.new("uint32_t *")
+        count = 0
+        while count < size:
+            _check_native(self.instance.vtable.Read(self.instance, ffi.from_buffer(head) + count, size - count, processed))  # type: ignore
+            if not processed[0]:
+                break
+            count += processed[0]
+        self.rewind()
+        return bytes(head[:count])
+
+    def close(self) -> None:
+        """Drop our reference, and call `release`."""
+        if self.instance is not None:
+            super().close()
+            self._release()
+
+
+def open_in_stream(
+    filename: Union[PathLike, str],
+    *,
+    use_mmap: bool = True,
+    native: bool = True,
+) -> Union[NativeInStream, MmapInStream, FileInStream]:
+    """
+    Open `filename` as an input stream for 7-zip.
+
+    Non-empty regular files are memory mapped when possible; anything else
+    (pipes, devices, empty files, mappings that fail) is read as a file.
+    With `native`, regular files are read by C streams instead of Python ones.
+    """
+    try:
+        stat = os.stat(filename)
+        is_regular = S_ISREG(stat.st_mode)
+    except (OSError, ValueError):
+        is_regular = False
+    if use_mmap and is_regular and stat.st_size > 0:
+        try:
+            return NativeMmapInStream(filename) if native else MmapInStream(filename)
+        except (OSError, ValueError, OverflowError):
+            pass
+    if native and is_regular:
+        return NativeFileInStream(filename)
+    return FileInStream(filename)
 
 
 class PyOutStream(PyUnknown):
     """
     IOutStream implemetation backed by a Python binary IO stream.
+
+    An exception raised by the stream's `write` aborts the operation and is kept in `error`.
     """
 
     # pylint: disable=invalid-name
@@ -88,16 +566,19 @@ class PyOutStream(PyUnknown):
 
     def __init__(self, stream: BinaryIO) -> None:
         self.stream = stream
+        self.error: Optional[BaseException] = None
         super().__init__()
 
     def Write(self, array_ptr, bytes_to_write, bytes_written):
         """Write bytes to the stream."""
         try:
-            array_buf = ffi.buffer(array_ptr, bytes_to_write)
-            bytes_written[0] = self.stream.write(array_buf)
-            return HRESULT.S_OK
-        except IOError:
+            count = self.stream.write(ffi.buffer(array_ptr, bytes_to_write))
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.error = exc
             return HRESULT.E_FAIL
+        if bytes_written != ffi.NULL:
+            bytes_written[0] = count
+        return HRESULT.S_OK
 
     def Seek(self, offset, origin, new_position):
         """Seek to a new position in the stream."""
@@ -109,6 +590,14 @@ class PyOutStream(PyUnknown):
         except IOError:
             return HRESULT.E_FAIL
 
+    def SetSize(self, new_size):
+        """Truncate or extend the stream."""
+        try:
+            self.stream.truncate(new_size)
+            return HRESULT.S_OK
+        except IOError:
+            return HRESULT.E_FAIL
+
 
 class FileOutStream(PyOutStream):
     """
@@ -127,3 +616,200 @@ class FileOutStream(PyOutStream):
         if refs == 0:
             self.Close()
         return refs
+
+
+Sink = Callable[[memoryview], None]
+
+
+class SinkOutStream(PyUnknown):
+    """
+    ISequentialOutStream implementation that hands each block of output to a sink callable.
+
+    The sink receives a memoryview of 7-zip's own buffer, which is only valid
+    for the duration of the call: copy out anything that must be kept. An
+    exception raised by the sink aborts the extraction and is kept in `error`.
+    """
+
+    # pylint: disable=invalid-name
+
+    IIDS = (IID_ISequentialOutStream,)
+
+    def __init__(self, sink: Sink) -> None:
+        self.sink = sink
+        self.error: Optional[BaseException] = None
+        super().__init__()
+
+    def Write(self, array_ptr, bytes_to_write, bytes_written):
+        """Pass bytes to the sink."""
+        view = memoryview(ffi.buffer(array_ptr, bytes_to_write))
+        try:
+            self.sink(view)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.error = exc
+            return HRESULT.E_FAIL
+        finally:
+            view.release()
+        if bytes_written != ffi.NULL:
+            bytes_written[0] = bytes_to_write
+        return HRESULT.S_OK
+
+
+class ByteAccumulator:
+    """
+    Collects written bytes into a single preallocated bytearray.
+
+    When the final size is known up front (from an item's `size` property),
+    output is copied exactly once into place, with no regrowth along the way,
+    and `getvalue()` hands over that same bytearray.
+    """
+
+    def __init__(self, size_hint: Optional[int] = None) -> None:
+        self._buffer = bytearray(size_hint or 0)
+        self._position = 0
+
+    def write(self, data) -> int:
+        """Append `data`, growing the buffer if the size hint was too small."""
+        view = memoryview(data).cast("B")
+        end = self._position + len(view)
+        if end <= len(self._buffer):
+            self._buffer[self._position : end] = view
+        else:
+            self._buffer[self._position :] = view
+        self._position = end
+        return len(view)
+
+    def flush(self) -> None:
+        """Nothing to flush."""
+
+    def getvalue(self) -> bytearray:
+        """Get the accumulated bytes, without copying; nothing may be written afterwards."""
+        if self._position != len(self._buffer):
+            del self._buffer[self._position :]
+        return self._buffer
+
+
+class RangeComplete(Exception):
+    """Raised by RangeAccumulator once its range is full, to stop the extraction."""
+
+
+class RangeAccumulator:
+    """
+    Collects the bytes in `[offset, offset + length)` of what is written, discarding the rest.
+    """
+
+    def __init__(self, offset: int, length: int) -> None:
+        self.offset = offset
+        self.length = length
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data) -> int:
+        """Keep the part of `data` inside the range, raising RangeComplete once it is full."""
+        view = memoryview(data).cast("B")
+        start = self._position
+        self._position += len(view)
+        skip = max(self.offset - start, 0)
+        wanted = self.length - len(self._buffer)
+        if skip < len(view):
+            self._buffer += view[skip : skip + wanted]
+        if len(self._buffer) >= self.length:
+            raise RangeComplete()
+        return len(view)
+
+    def getvalue(self) -> bytes:
+        """Get the collected bytes."""
+        return bytes(self._buffer)
+
+
+class NativeOutStream(NativeStream):
+    """
+    Base class for native output streams.
+    """
+
+    IIDS: Tuple[UUID, ...] = (
+        IID_IOutStream,
+        IID_ISequentialOutStream,
+    )
+
+    def tell(self) -> int:
+        """Get the current write position."""
+        if self.instance is None:
+            raise ValueError("I/O operation on closed stream.")
+        position_ptr = ffi.new("uint64_t *")
+        _check_native(self.instance.vtable.Seek(self.instance, 0, SEEK_CUR, position_ptr))  # type: ignore
+        return position_ptr[0]
+
+    def truncate(self, size: int) -> None:
+        """Truncate or extend the stream to `size` bytes."""
+        if self.instance is None:
+            raise ValueError("I/O operation on closed stream.")
+        _check_native(self.instance.vtable.SetSize(self.instance, size))  # type: ignore
+
+
+class NativeFdOutStream(NativeOutStream):
+    """
+    Native IOutStream writing to an OS file descriptor.
+
+    The stream uses its own duplicate of the descriptor's handle, so the
+    caller may close `fd` as soon as the stream has been created.
+    """
+
+    def __init__(self, fd: int) -> None:
+        stream_ptr = ffi.new("FFI7Z_IOutStream **")
+        _check_native(lib.CreateNativeFdOutStream(fd, stream_ptr))  # type: ignore
+        super().__init__(stream_ptr[0])
+
+
+class NativeMemOutStream(NativeOutStream):
+    """
+    Native IOutStream collecting output in a growable C buffer.
+
+    With `capacity` set to the final size (e.g. an item's `size` property),
+    output is written exactly once into place.
+    """
+
+    def __init__(self, capacity: int = 0) -> None:
+        stream_ptr = ffi.new("FFI7Z_IOutStream **")
+        _check_native(lib.CreateNativeMemOutStream(capacity, stream_ptr))  # type: ignore
+        super().__init__(stream_ptr[0])
+
+    def getvalue(self) -> bytes:
+        """Get a copy of the written bytes."""
+        data, size = _native_mem_buffer(self.instance)
+        if not size:
+            return b""
+        return ffi.buffer(data, size)[:]
+
+
+class NativeBufferOutStream(NativeOutStream):
+    """
+    Native IOutStream writing into a bytearray, e.g. one presized from an item's `size` property.
+
+    Output is written exactly once, into place. If it outgrows the
+    bytearray, the native stream carries on in a C buffer of its own. The
+    bytearray is borrowed until `close()`.
+    """
+
+    def __init__(self, buffer: bytearray) -> None:
+        self.buffer = buffer
+        self.base = ffi.from_buffer(buffer, require_writable=True)
+        stream_ptr = ffi.new("FFI7Z_IOutStream **")
+        try:
+            _check_native(lib.CreateNativeBufferOutStream(self.base, len(buffer), stream_ptr))  # type: ignore
+        except Exception:
+            ffi.release(self.base)
+            raise
+        super().__init__(stream_ptr[0])
+
+    def getvalue(self) -> bytearray:
+        """Get the written bytes: `buffer` itself if they filled it exactly, otherwise a copy."""
+        data, size = _native_mem_buffer(self.instance)
+        if size == len(self.buffer) and data == ffi.cast("void *", self.base):
+            return self.buffer
+        return bytearray(ffi.buffer(data, size)) if size else bytearray()
+
+    def close(self) -> None:
+        """Release the native stream and the bytearray."""
+        if self.instance is not None:
+            super().close()
+            ffi.release(self.base)
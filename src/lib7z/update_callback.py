@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: archive update callbacks
+"""
+
+from collections import deque
+from enum import IntEnum
+from typing import Callable, Deque, NamedTuple, Optional, Sequence, Union
+
+from .archive import ArchiveProps
+from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
+from .hresult import HRESULT
+from .iids import (
+    IID_IArchiveUpdateCallback,
+    IID_ICompressProgressInfo,
+    IID_ICryptoGetTextPassword,
+    IID_ICryptoGetTextPassword2,
+    IID_ISequentialInStream,
+)
+from .parallel import Progress
+from .propvariant import VARTYPE, encode_propvariant
+from .stream import NativeStream
+from .unknown import PyUnknown
+
+InStream = Union[NativeStream, PyUnknown]
+
+
+class UpdateResult(IntEnum):
+    """
+    Values for the op_result argument in IArchiveUpdateCallback.SetOperationResult.
+    """
+
+    OK = 0
+    ERROR = 1
+
+
+class UpdateItem(NamedTuple):
+    """
+    An item of an archive being written.
+
+    `open` opens the item's contents as an input stream, and is None for
+    directories. `mtime` is a FILETIME tick count. `size` is only a hint for
+    the handler (e.g. for zip64 headers): the item is as long as its stream.
+    Items with an `index_in_archive` are copied, data and properties, from
+    that item of the archive being updated.
+    """
+
+    path: str
+    is_dir: bool
+    size: int
+    mtime: Optional[int]
+    attrib: Optional[int]
+    open: Optional[Callable[[], InStream]]
+    index_in_archive: Optional[int] = None
+
+
+class ArchiveUpdateCallback(PyUnknown):
+    """
+    Archive update callback that feeds 7-zip a sequence of new and copied items.
+
+    Handlers may open several input streams before finishing the first one
+    (e.g. zip, when compressing items on several threads), but finish items in
+    order. Native streams are closed as their items are finished; Python
+    streams belong to the caller. The first error raised while opening or
+    reading an item is kept in `error`.
+    """
+
+    # pylint: disable=invalid-name
+
+    IIDS = (
+        IID_IArchiveUpdateCallback,
+        IID_ICryptoGetTextPassword,
+        IID_ICryptoGetTextPassword2,
+        IID_ICompressProgressInfo,
+    )
+
+    def __init__(self, items: Sequence[UpdateItem], password, progress: Optional[Progress] = None):
+        self.items = items
+        self.password = password
+        self.progress = progress
+        self.total = 0
+        self.last_op_result: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        # One entry per GetStream call, None where no stream was opened.
+        self._streams: Deque[Optional[InStream]] = deque()
+        super().__init__()
+
+    def __finish_stream(self, stream: Optional[InStream]) -> None:
+        if stream is None:
+            return
+        if self.error is None:
+            self.error = getattr(stream, "error", None)
+        if isinstance(stream, NativeStream):
+            stream.close()
+
+    def SetTotal(self, total):
+        self.total = total
+        return HRESULT.S_OK
+
+    def SetCompleted(self, complete_value):
+        if self.progress is not None and complete_value != ffi.NULL:
+            self.progress(complete_value[0], self.total)
+        return HRESULT.S_OK
+
+    def SetRatioInfo(self, in_size, out_size):
+        return HRESULT.S_OK
+
+    def GetUpdateItemInfo(self, index, new_data, new_props, index_in_archive):
+        # Copied items keep their packed data, which the handler copies without decoding it.
+        copied = self.items[index].index_in_archive
+        if new_data != ffi.NULL:
+            new_data[0] = copied is None
+        if new_props != ffi.NULL:
+            new_props[0] = copied is None
+        if index_in_archive != ffi.NULL:
+            index_in_archive[0] = 0xFFFFFFFF if copied is None else copied
+        return HRESULT.S_OK
+
+    def GetProperty(self, index, prop_id, value):
+        item = self.items[index]
+        value.vt = VARTYPE.VT_EMPTY
+        if prop_id == ArchiveProps.PATH:
+            encode_propvariant(value, item.path)
+        elif prop_id == ArchiveProps.IS_DIR:
+            encode_propvariant(value, item.is_dir)
+        elif prop_id == ArchiveProps.SIZE:
+            encode_propvariant(value, item.size, VARTYPE.VT_UI8)
+        elif prop_id == ArchiveProps.MTIME:
+            if item.mtime is not None:
+                encode_propvariant(value, item.mtime, VARTYPE.VT_FILETIME)
+        elif prop_id == ArchiveProps.ATTRIB:
+            if item.attrib is not None:
+                encode_propvariant(value, item.attrib, VARTYPE.VT_UI4)
+        elif prop_id == ArchiveProps.IS_ANTI:
+            encode_propvariant(value, False)
+        return HRESULT.S_OK
+
+    def GetStream(self, index, in_stream):
+        in_stream[0] = ffi.NULL
+        item = self.items[index]
+        if item.open is None:
+            self._streams.append(None)
+            return HRESULT.S_OK
+        try:
+            stream = item.open()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            if self.error is None:
+                self.error = exc
+            return HRESULT.E_FAIL
+        self._streams.append(stream)
+        if isinstance(stream, NativeStream):
+            # 7-zip releases the stream after the item; keep our own reference.
+            in_stream[0] = stream.new_reference(IID_ISequentialInStream)
+        else:
+            in_stream[0] = stream.get_instance(IID_ISequentialInStream)
+        return HRESULT.S_OK
+
+    def SetOperationResult(self, op_result):
+        self.last_op_result = op_result
+        if self._streams:
+            self.__finish_stream(self._streams.popleft())
+        return HRESULT.S_OK
+
+    def CryptoGetTextPassword(self, password):
+        if self.password:
+            password[0] = lib.SysAllocStringLen(self.password, len(self.password))
+        else:
+            password[0] = ffi.NULL
+        return HRESULT.S_OK
+
+    def CryptoGetTextPassword2(self, has_password, password):
+        if has_password != ffi.NULL:
+            has_password[0] = bool(self.password)
+        if password != ffi.NULL:
+            if self.password:
+                password[0] = lib.SysAllocStringLen(self.password, len(self.password))
+            else:
+                password[0] = ffi.NULL
+        return HRESULT.S_OK
+
+    def cleanup(self):
+        while self._streams:
+            self.__finish_stream(self._streams.popleft())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: multi-volume archives
+"""
+
+import os
+from logging import getLogger
+from os import PathLike
+from queue import Queue
+from threading import Lock, Thread
+from typing import Callable, List, Optional, Union
+
+from .stream import FileInStream
+
+__all__ = (
+    "VolumeInStream",
+    "VolumePrefetcher",
+    "VolumeResolver",
+    "sibling_volume_resolver",
+)
+
+log = getLogger("lib7z")
+
+# Maps the name of a volume a handler asks for (e.g. "photos.7z.002") to its
+# path, or None if there is no such volume.
+VolumeResolver = Callable[[str], Union[None, PathLike, str]]
+
+
+def sibling_volume_resolver(filename: Union[PathLike, str]) -> VolumeResolver:
+    """
+    Get a resolver that finds volumes next to the archive at `filename`.
+
+    Names with directory parts are never resolved, so handlers can't reach
+    files outside the archive's directory.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+
+    def resolve(name: str) -> Optional[str]:
+        if not name or os.path.basename(name) != name or name in (os.curdir, os.pardir):
+            return None
+        path = os.path.join(directory, name)
+        return path if os.path.isfile(path) else None
+
+    return resolve
+
+
+class VolumePrefetcher:
+    """
+    Warms the volumes after the one being read, on a background thread.
+
+    Volumes are numbered in the order handlers open them, which is the order
+    they decode them in; the archive file itself is volume 0, and decoding
+    starts there. Warming reads a volume through once, in `chunk_size`
+    chunks, so that it's in the page cache (or the storage's own cache) by
+    the time the handler reaches it. At most `ahead` volumes past the one
+    most recently read are warmed. Reads are only followed after `start()`,
+    since handlers read headers from any volume while opening the archive
+    (e.g. 7z's, from the last one). `warmed` lists the volumes queued for
+    warming, in order.
+    """
+
+    def __init__(self, filename: Union[PathLike, str], ahead: int = 1, chunk_size: int = 1 << 20) -> None:
+        self.ahead = ahead
+        self.chunk_size = chunk_size
+        self._paths: List[str] = [os.fspath(filename)]
+        self.warmed: List[str] = []
+        self.active = False
+        self._current = 0
+        self._lock = Lock()
+        self._queue: "Queue[Optional[str]]" = Queue()
+        self._thread: Optional[Thread] = None
+        self._closed = False
+
+    def add(self, path: Union[PathLike, str]) -> int:
+        """Register the next volume, and get its number."""
+        with self._lock:
+            self._paths.append(os.fspath(path))
+            self.__schedule()
+            return len(self._paths) - 1
+
+    def start(self) -> None:
+        """Start following reads: the archive is open."""
+        with self._lock:
+            self.active = True
+
+    def reading(self, index: int) -> None:
+        """Volume `index` is being decoded; warm the ones after it."""
+        with self._lock:
+            if self.active and index != self._current:
+                self._current = index
+                self.__schedule()
+
+    def __schedule(self) -> None:
+        if self._closed:
+            return
+        for index in range(self._current + 1, min(self._current + self.ahead + 1, len(self._paths))):
+            path = self._paths[index]
+            if path not in self.warmed:
+                self.warmed.append(path)
+                self._queue.put(path)
+                if self._thread is None:
+                    self._thread = Thread(target=self.__run, name="lib7z-volume-prefetch", daemon=True)
+                    self._thread.start()
+
+    def __run(self) -> None:
+        while (path := self._queue.get()) is not None:
+            try:
+                self.__warm(path)
+            except OSError as exc:
+                log.debug("Failed prefetching volume %r: %s", path, exc)
+
+    def __warm(self, path: str) -> None:
+        with open(path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            buffer = bytearray(self.chunk_size)
+            while not self._closed and f.readinto(buffer):
+                pass
+
+    def close(self) -> None:
+        """Stop warming volumes, and wait for the background thread."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+class VolumeInStream(FileInStream):
+    """
+    IInStream of one volume, which tells `prefetcher` when decoding gets past its middle.
+
+    Reads made while the archive is being opened don't count.
+    """
+
+    # pylint: disable=invalid-name
+
+    def __init__(self, filename: Union[PathLike, str], prefetcher: VolumePrefetcher) -> None:
+        super().__init__(filename)
+        self.prefetcher = prefetcher
+        self.index = prefetcher.add(filename)
+        self._middle = self.stream_size // 2
+        self._reported = False
+
+    def Read(self, array_ptr, bytes_to_read, bytes_read):
+        if not self._reported and self.prefetcher.active and self.stream.tell() + bytes_to_read > self._middle:
+            self._reported = True
+            self.prefetcher.reading(self.index)
+        return super().Read(array_ptr, bytes_to_read, bytes_read)
@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Python bindings for the 7-Zip Library: creating archives
+"""
+
+import os
+import stat
+from datetime import datetime
+from functools import partial
+from io import RawIOBase
+from os import PathLike
+from time import time_ns
+from types import TracebackType
+from typing import BinaryIO, Dict, Iterable, List, Mapping, Optional, Type, Union
+
+from .archive import Archive, ArchiveItem, NotThisArchiveError, UpdateError
+from .ffi7z import ffi, lib  # pylint: disable=no-name-in-module
+from .format_registry import FormatInfo, formats
+from .iids import (
+    CreateObject,
+    IID_IArchiveUpdateCallback,
+    IID_IOutArchive,
+    IID_ISequentialOutStream,
+    IID_ISetProperties,
+    QueryInterface,
+)
+from .parallel import Progress
+from .propvariant import (
+    VARTYPE,
+    datetime_to_filetime,
+    encode_propvariant,
+    ns_to_filetime,
+)
+from .stream import (
+    NativeFdOutStream,
+    NativeMemInStream,
+    PyOutStream,
+    PySequentialInStream,
+    open_in_stream,
+)
+from .update_callback import ArchiveUpdateCallback, UpdateItem, UpdateResult
+
+__all__ = (
+    "ArchiveWriter",
+    "PropValue",
+    "Source",
+)
+
+Source = Union[bytes, bytearray, memoryview, str, PathLike, BinaryIO, Iterable[bytes]]
+PropValue = Union[bool, int, str]
+Time = Union[int, datetime]
+
+_FILE_ATTRIBUTE_READONLY = 0x01
+_FILE_ATTRIBUTE_DIRECTORY = 0x10
+# 7-zip sets this attribute when the high 16 bits hold a POSIX mode.
+_FILE_ATTRIBUTE_UNIX_EXTENSION = 0x8000
+
+_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+# Formats that name coders by their index in the chain ("0=LZMA2"), rather than with "m".
+_CHAINED_METHOD_FORMATS = ("7z", "xz")
+
+
+class _ChunkReader(RawIOBase):
+    """
+    Raw stream reading from an iterable of bytes-like chunks.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore
+        view = memoryview(buffer).cast("B")
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk).cast("B")
+        count = min(len(view), len(self._pending))
+        view[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+
+def _filetime(value: Time) -> int:
+    if isinstance(value, datetime):
+        return datetime_to_filetime(value)
+    return ns_to_filetime(value)
+
+
+def _stat_attrib(stat_result: os.stat_result) -> int:
+    """Get the 7-zip attributes of a file from its `stat_result`."""
+    attrib = getattr(stat_result, "st_file_attributes", None)
+    if attrib is not None:
+        return attrib
+    attrib = _FILE_ATTRIBUTE_UNIX_EXTENSION | (stat_result.st_mode << 16)
+    if stat.S_ISDIR(stat_result.st_mode):
+        attrib |= _FILE_ATTRIBUTE_DIRECTORY
+    if not stat_result.st_mode & stat.S_IWUSR:
+        attrib |= _FILE_ATTRIBUTE_READONLY
+    return attrib
+
+
+def _arcname(name: Union[PathLike, str]) -> str:
+    name = os.fspath(name).replace(os.sep, "/").strip("/")
+    if not name:
+        raise ValueError("Empty archive path.")
+    return name.replace("/", os.sep)
+
+
+def _resolve_format(target: Union[PathLike, str, BinaryIO], fmt: Union[None, str, FormatInfo]) -> FormatInfo:
+    if isinstance(fmt, FormatInfo):
+        resolved = fmt
+    else:
+        if fmt is None:
+            fmt = "7z"
+            if isinstance(target, (str, PathLike)):
+                extension = os.path.splitext(os.fspath(target))[1][1:].lower()
+                fmt = next((info.name for info in formats.by_extension.get(extension, ()) if info.updatable), fmt)
+        resolved = next((info for info in formats if info.name.lower() == fmt.lower()), None)  # type: ignore
+        if resolved is None:
+            raise UpdateError(f"Unknown archive format: {fmt!r}")
+    if not resolved.updatable:
+        raise UpdateError(f"7-zip can't write {resolved.name} archives.")
+    return resolved
+
+
+class ArchiveWriter:
+    """
+    Creates an archive from Python sources, in-process.
+
+    Items are queued by `add()`, `add_dir()` and `add_path()`, and written by
+    `close()` in a single pass of 7-zip's encoder; leaving a `with` block
+    closes the writer, unless an exception was raised, in which case nothing
+    is written. The format is taken from `target`'s extension, and defaults
+    to 7z.
+
+    Compression settings are given to the handler as properties: `level`
+    (0-9), `method` (e.g. "LZMA2" or "Deflate"), `dictionary` (in bytes, or a
+    size such as "64m"), `solid` (a bool, or a block size such as "4g"), and
+    `threads` (7-zip's "mt": a bool, or a thread count). Unset ones keep
+    7-zip's defaults, which compress on every core where the method allows.
+    Any other handler property can be set through `properties`, e.g.
+    `{"em": "AES256"}` for zip encryption.
+
+    With a `base` archive, the new archive is written by base's own handler,
+    in base's format, and `copy()` adds base's items without decoding and
+    recompressing them. `base` must not be used by anything else until the
+    writer is closed.
+    """
+
+    def __init__(
+        self,
+        target: Union[PathLike, str, BinaryIO],
+        format: Union[None, str, FormatInfo] = None,  # pylint: disable=redefined-builtin
+        *,
+        password: Optional[str] = None,
+        level: Optional[int] = None,
+        method: Optional[str] = None,
+        dictionary: Union[None, int, str] = None,
+        solid: Union[None, bool, str] = None,
+        threads: Union[None, bool, int] = None,
+        encrypt_headers: Optional[bool] = None,
+        properties: Optional[Mapping[str, PropValue]] = None,
+        progress: Optional[Progress] = None,
+        base: Optional[Archive] = None,
+    ) -> None:
+        self.target = target
+        self.base = base
+        self.format = _resolve_format(target, format if base is None else base.format)
+        self.password = password
+        self.progress = progress
+        self.items: List[UpdateItem] = []
+        self.closed = False
+        self._created = False
+
+        props: Dict[str, PropValue] = {}
+        if level is not None:
+            props["x"] = level
+        if method is not None:
+            props["0" if self.format.name.lower() in _CHAINED_METHOD_FORMATS else "m"] = method
+        if dictionary is not None:
+            props["d"] = f"{dictionary}b" if isinstance(dictionary, int) else dictionary
+        if solid is not None:
+            props["s"] = solid
+        if threads is not None:
+            props["mt"] = threads
+        if encrypt_headers is not None:
+            props["he"] = encrypt_headers
+        props.update(properties or {})
+        self.properties = props
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.closed = True
+
+    def __check_open(self) -> None:
+        if self.closed:
+            raise UpdateError("The archive has already been written.")
+
+    def add(
+        self,
+        arcname: Union[PathLike, str],
+        source: Source,
+        *,
+        size: Optional[int] = None,
+        mtime: Optional[Time] = None,
+        attrib: Optional[int] = None,
+    ) -> None:
+        """
+        Add a file named `arcname` with the contents of `source`.
+
+        `source` is a bytes-like object, the path of a file, a binary file
+        object (read from its current position when the archive is written),
+        or an iterable of bytes-like chunks. `mtime` is a datetime or
+        nanoseconds since the Unix epoch, and defaults to the file's for paths,
+        or to now. Give the `size` of file objects and iterables when it is
+        known: some handlers need it to choose their headers for large items.
+        """
+        self.__check_open()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            size = memoryview(source).nbytes if size is None else size
+            opener = partial(NativeMemInStream, source)
+        elif isinstance(source, (str, PathLike)):
+            stat_result = os.stat(source)
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise UpdateError(f"Not a regular file: {os.fspath(source)!r}")
+            size = stat_result.st_size if size is None else size
+            mtime = stat_result.st_mtime_ns if mtime is None else mtime
+            attrib = _stat_attrib(stat_result) if attrib is None else attrib
+            opener = partial(open_in_stream, source)
+        elif hasattr(source, "readinto"):
+            if size is None and source.seekable():  # type: ignore
+                position = source.tell()  # type: ignore
+                size = source.seek(0, os.SEEK_END) - position  # type: ignore
+                source.seek(position)  # type: ignore
+            opener = partial(PySequentialInStream, source)
+        else:
+            opener = partial(PySequentialInStream, _ChunkReader(source))  # type: ignore
+        self.__append(arcname, False, size or 0, mtime, attrib, opener)
+
+    def add_dir(self, arcname: Union[PathLike, str], *, mtime: Optional[Time] = None, attrib: Optional[int] = None) -> None:
+        """
+        Add an empty directory named `arcname`.
+        """
+        self.__check_open()
+        self.__append(arcname, True, 0, mtime, attrib, None)
+
+    def copy(self, item: ArchiveItem) -> None:
+        """
+        Add `item` of the base archive as it is, packed data and properties.
+        """
+        self.__check_open()
+        if self.base is None or item.archive() is not self.base:
+            raise NotThisArchiveError()
+        self.items.append(UpdateItem(item.path, bool(item.is_dir), item.size or 0, None, None, None, item.index))
+
+    def add_path(self, path: Union[PathLike, str], arcname: Union[None, PathLike, str] = None, *, recursive: bool = True) -> None:
+        """
+        Add the file or directory at `path`, as `arcname` (by default, its base name).
+
+        Directories are added with everything in them, unless `recursive` is
+        False. Symbolic links to directories are added as empty directories.
+        """
+        self.__check_open()
+        path = os.fspath(path)
+        if arcname is None:
+            arcname = os.path.basename(os.path.normpath(path))
+        arcname = _arcname(arcname)
+        stat_result = os.stat(path)
+        if not stat.S_ISDIR(stat_result.st_mode):
+            self.add(arcname, path)
+            return
+
+        self.__append(arcname, True, 0, stat_result.st_mtime_ns, _stat_attrib(stat_result), None)
+        if not recursive:
+            return
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            relative = os.path.relpath(dirpath, path)
+            prefix = arcname if relative == os.curdir else os.path.join(arcname, relative)
+            for name in dirnames:
+                dir_stat = os.stat(os.path.join(dirpath, name))
+                self.__append(os.path.join(prefix, name), True, 0, dir_stat.st_mtime_ns, _stat_attrib(dir_stat), None)
+            for name in sorted(filenames):
+                self.add(os.path.join(prefix, name), os.path.join(dirpath, name))
+
+    def __append(self, arcname, is_dir, size, mtime, attrib, opener) -> None:
+        mtime = time_ns() if mtime is None else mtime
+        self.items.append(UpdateItem(_arcname(arcname), is_dir, size, _filetime(mtime), attrib, opener))
+
+    def __set_properties(self, handler: ffi.CData) -> None:
+        if not self.properties:
+            return
+        setter = QueryInterface(handler, IID_ISetProperties)
+        if setter is None:
+            raise UpdateError(f"{self.format.name} archives have no settings.")
+        try:
+            names = [ffi.new("wchar_t[]", name) for name in self.properties]
+            values = ffi.new("PROPVARIANT[]", len(names))
+            try:
+                for value, prop in zip(values, self.properties.values()):
+                    encode_propvariant(value, prop)
+                result = setter.vtable.SetProperties(setter, ffi.new("wchar_t *[]", names), values, len(names))  # type: ignore
+            finally:
+                for value in values:
+                    if value.vt == VARTYPE.VT_BSTR:
+                        lib.SysFreeString(value.bstrVal)
+            if result & 0x80000000:
+                raise UpdateError(f"Invalid {self.format.name} settings {self.properties!r}: HRESULT(0x{result:#08x})")
+        finally:
+            ffi.release(setter)
+
+    def __open_target(self) -> Union[NativeFdOutStream, PyOutStream]:
+        if not isinstance(self.target, (str, PathLike)):
+            return PyOutStream(self.target)  # type: ignore
+        fd = os.open(self.target, _OPEN_FLAGS, 0o666)
+        self._created = True
+        try:
+            return NativeFdOutStream(fd)
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        """
+        Write the archive. Nothing more can be added afterwards.
+
+        If writing fails, a partially written target file is removed.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        handler = self.__create_handler()
+        try:
+            self.__set_properties(handler)
+            self.__write(handler)
+        except BaseException:
+            if self._created:
+                os.remove(self.target)  # type: ignore
+            raise
+        finally:
+            ffi.release(handler)
+
+    def __create_handler(self) -> ffi.CData:
+        if self.base is not None:
+            handler = QueryInterface(self.base.archive, IID_IOutArchive)
+            if handler is None:
+                raise UpdateError(f"7-zip can't update {self.format.name} archives.")
+            return handler
+        try:
+            return CreateObject(self.format.clsid, IID_IOutArchive)
+        except RuntimeError as exc:
+            raise UpdateError(f"7-zip can't write {self.format.name} archives.") from exc
+
+    def __write(self, handler: ffi.CData) -> None:
+        update_callback = ArchiveUpdateCallback(self.items, self.password, self.progress)
+        out_stream = self.__open_target()
+        try:
+            result = handler.vtable.UpdateItems(  # type: ignore
+                handler,
+                out_stream.get_instance(IID_ISequentialOutStream),
+                len(self.items),
+                update_callback.get_instance(IID_IArchiveUpdateCallback),
+            )
+        finally:
+            update_callback.cleanup()
+            if isinstance(out_stream, NativeFdOutStream):
+                out_stream.close()
+            else:
+                out_stream.stream.flush()
+        if update_callback.error is not None:
+            raise UpdateError(str(update_callback.error)) from update_callback.error
+        if result & 0x80000000:
+            raise UpdateError(f"HRESULT(0x{result:#08x})")
+        if update_callback.last_op_result not in (None, UpdateResult.OK):
+            raise UpdateError(f"Update failed: {update_callback.last_op_result}")
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from lib7z.aio import AsyncArchive
+
+SIMPLE_ARCHIVES = ("tests/simple.7z", "tests/simple.zip")
+
+
+@pytest.mark.parametrize("path", SIMPLE_ARCHIVES)
+def test_async_read(path):
+    """
+    Items can be listed and read from a coroutine.
+    """
+
+    async def main():
+        async with await AsyncArchive.open(path) as archive:
+            items = await archive.items()
+            assert len(items) == 1
+            assert await archive.read_bytes(items[0]) == b"Hello World!\n"
+            chunks = [chunk async for chunk in archive.iter_bytes(items[0], max_pending=1)]
+            assert b"".join(chunks) == b"Hello World!\n"
+
+    asyncio.run(main())
+
+
+def test_async_iter_close_early():
+    """
+    Abandoning a streaming read frees the archive for other reads.
+    """
+
+    async def main():
+        async with await AsyncArchive.open("tests/simple.7z") as archive:
+            item = await archive.item(0)
+            chunks = archive.iter_bytes(item, max_pending=1)
+            async for _ in chunks:
+                break
+            await chunks.aclose()
+            assert await archive.read_bytes(item) == b"Hello World!\n"
+
+    asyncio.run(main())
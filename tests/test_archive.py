@@ -1,15 +1,33 @@
 # -*- coding: utf-8 -*-
+import gzip
+import hashlib
+import io
 import logging
 import os
+import shutil
+import stat
 import sys
+import tarfile
 from collections import namedtuple
+from itertools import chain
 from typing import Generator
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
 import pytest
 
-from lib7z import Archive
+import lib7z.archive
+import lib7z.extract_callback
+from lib7z import Archive, ArchiveWriter
 from lib7z.archive import ExtractError
+from lib7z.content_cache import CacheStats, ContentCache
+from lib7z.extract_callback import ArchiveTestCallback, EventIndexType, OperationResult
+from lib7z.extract_plan import ExtractPlan
+from lib7z.iids import IID_IArchiveExtractCallbackMessage2
+from lib7z.instrument import MetricsCollector
+from lib7z.listing_cache import ListingCache
+from lib7z.path_index import PathIndex
+from lib7z.planner import batch_groups, group_by_block
+from lib7z.propvariant import filetime_to_ns
 
 log = logging.getLogger("lib7z")
 
@@ -26,6 +44,20 @@ def IX(is_dir=False, crc=None, contents=""):  # pylint: disable=invalid-name
 
 J = os.path.join
 
+
+class FakeSnapshot:
+    "Stand-in for an ArchiveSnapshot, holding plain lists as columns."
+
+    def __init__(self, **columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def column(self, name):
+        return self.columns.get(name, [None] * len(self))
+
+
 COMPLEX_MD = {
     J("complex", "articles"): IX(True),
     J("complex", "articles", "the definate article.txt"): IX(False, 0x3C456DE6, "the"),
@@ -89,18 +121,141 @@ def test_extract_stream(path):
         assert archive[0].read_text() == "Hello World!\n"
 
 
+@pytest.mark.parametrize("native_streams", (True, False))
+@pytest.mark.parametrize("use_mmap", (True, False))
+def test_read_with_and_without_mmap(use_mmap, native_streams):
+    """
+    Archives read the same from a memory map or a file, through native or Python streams.
+    """
+    with Archive("tests/complex.7z", use_mmap=use_mmap, native_streams=native_streams) as archive:
+        for item in archive:
+            md = COMPLEX_MD.get(item.path)
+            if md and not md.is_dir:
+                assert item.read_text() == md.contents
+
+
+@pytest.mark.parametrize("native_streams", (True, False))
 @pytest.mark.parametrize("path", SIMPLE_ARCHIVES)
-def test_extract_dir(path, tmpdir):
+def test_extract_dir(path, native_streams, tmpdir):
     """
     Files can be extracted to a directory.
     """
-    with Archive(path) as archive:
+    with Archive(path, native_streams=native_streams) as archive:
         archive.extract(tmpdir)
 
     with open(os.path.join(tmpdir, "hello.txt"), "rb") as f:
         assert f.read() == b"Hello World!\n"
 
 
+def test_extract_restores_mtime(tmpdir):
+    """
+    Extracted files and directories get the modification times stored in the archive.
+    """
+    with Archive("tests/complex.7z") as archive:
+        archive.extract(tmpdir)
+        snapshot = archive.snapshot(("path", "mtime"))
+
+    mtimes = snapshot.column("mtime")
+    for row in snapshot:
+        filetime = mtimes.filetime(row.index)
+        if filetime is not None:
+            assert os.stat(os.path.join(tmpdir, row.path)).st_mtime_ns == filetime_to_ns(filetime)
+
+
+def test_extract_preallocates(tmpdir, monkeypatch):
+    """
+    Files are extended to their expected size before writing, and truncated to what was written.
+    """
+    sizes = []
+    truncate = lib7z.extract_callback.NativeFdOutStream.truncate
+
+    def record_truncate(self, size):
+        sizes.append(size)
+        truncate(self, size)
+
+    size = ExtractPlan.size
+    monkeypatch.setattr(ExtractPlan, "size", lambda self, index: size(self, index) + 4096)
+    monkeypatch.setattr(lib7z.extract_callback.NativeFdOutStream, "truncate", record_truncate)
+    with Archive("tests/simple.7z") as archive:
+        archive.extract(tmpdir)
+
+    assert sizes == [len(b"Hello World!\n") + 4096, len(b"Hello World!\n")]
+    with open(os.path.join(tmpdir, "hello.txt"), "rb") as f:
+        assert f.read() == b"Hello World!\n"
+
+
+def test_extract_refuses_links(tmpdir):
+    """
+    Files are never written through a link planted at an item's path.
+    """
+    target = os.path.join(tmpdir, "target.txt")
+    with open(target, "wb") as f:
+        f.write(b"untouched")
+    dest_dir = os.path.join(tmpdir, "out")
+    os.mkdir(dest_dir)
+    try:
+        os.symlink(target, os.path.join(dest_dir, "hello.txt"))
+    except OSError:
+        pytest.skip("creating symlinks is not permitted")
+
+    with Archive("tests/simple.7z") as archive:
+        with pytest.raises(ExtractError):
+            archive.extract(dest_dir)
+
+    with open(target, "rb") as f:
+        assert f.read() == b"untouched"
+
+
+def test_extract_skips_unsafe_paths(tmpdir):
+    """
+    Items whose paths would escape the destination directory are never planned.
+    """
+    snapshot = FakeSnapshot(
+        path=["ok.txt", os.path.join("..", "escape.txt"), os.path.join("sub", "file.txt")],
+        is_dir=[False, False, False],
+    )
+    plan = ExtractPlan(snapshot, tmpdir)
+    assert plan.unsafe == {1}
+    assert sorted(plan.files) == [0, 2]
+    plan.create_directories()
+    assert os.path.isdir(os.path.join(tmpdir, "sub"))
+
+
+@pytest.mark.parametrize("name", ("simple.bin", "simple"))
+def test_open_by_signature(name, tmpdir):
+    """
+    Archives with a misleading or missing extension are detected by signature.
+    """
+    renamed_path = os.path.join(tmpdir, name)
+    shutil.copyfile("tests/simple.7z", renamed_path)
+    with Archive(renamed_path) as archive:
+        assert archive[0].read_text() == "Hello World!\n"
+
+
+def test_open_misnamed_without_signature(tmpdir):
+    """
+    Archives without a signature in their header open even when their extension belongs to another format.
+    """
+    data = b"Hello World!\n"
+    tar_file = io.BytesIO()
+    with tarfile.open(fileobj=tar_file, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+        info = tarfile.TarInfo("hello.txt")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    # Pre-POSIX tar headers have no "ustar" magic; clear it and fix up the header checksum.
+    header = bytearray(tar_file.getvalue())
+    header[257:265] = bytes(8)
+    header[148:156] = b" " * 8
+    header[148:156] = b"%06o\0 " % sum(header[:512])
+    path = os.path.join(tmpdir, "old.zip")
+    with open(path, "wb") as f:
+        f.write(header)
+
+    with Archive(path) as archive:
+        assert archive.format.name == "tar"
+        assert archive[0].read_bytes() == data
+
+
 def test_extract_with_pass():
     """
     Files can be extracted with a password.
@@ -144,3 +299,471 @@ def test_extract_extract_many_files_to_dir(tmpdir):
 
     with Archive(temp_zip_path) as archive:
         archive.extract(tmpdir)
+
+
+def test_snapshot_complex():
+    """
+    Item metadata can be read in bulk, and agrees with per-item properties.
+    """
+    with Archive("tests/complex.7z") as archive:
+        snapshot = archive.snapshot(("path", "is_dir", "crc", "size"))
+        assert len(snapshot) == len(archive)
+        for row, item in zip(snapshot, archive):
+            assert row.index == item.index
+            assert row.path == item.path
+            assert row.is_dir == item.is_dir
+            assert row.crc == item.crc
+            assert row.size == item.size
+
+        paths = {row.path for row in snapshot}
+        assert set(COMPLEX_MD) <= paths
+        with pytest.raises(TypeError, match="slicing"):
+            snapshot[1:3]
+
+
+@pytest.mark.parametrize("cache_item_properties", (True, False))
+def test_item_properties_cache(cache_item_properties):
+    """
+    Item properties read the same whether or not they are remembered.
+    """
+    with Archive("tests/complex.7z", cache_item_properties=cache_item_properties) as archive:
+        for item in archive:
+            first = (item.path, item.is_dir, item.crc)
+            assert (item.path, item.is_dir, item.crc) == first
+            item.invalidate()
+            assert (item.path, item.is_dir, item.crc) == first
+
+
+@pytest.mark.parametrize("path", SIMPLE_ARCHIVES)
+def test_open_item_stream(path):
+    """
+    Items can be read as a stream, in small chunks.
+    """
+    with Archive(path) as archive:
+        with archive[0].open(buffer_size=4) as item_stream:
+            chunks = iter(lambda: item_stream.read(3), b"")
+            assert b"".join(chunks) == b"Hello World!\n"
+
+
+def test_open_item_stream_close_early():
+    """
+    Closing an item stream early frees the archive for other reads.
+    """
+    with Archive("tests/simple.7z") as archive:
+        item_stream = archive[0].open(buffer_size=4)
+        assert item_stream.read(5) == b"Hello"
+        item_stream.close()
+        assert archive[0].read_bytes() == b"Hello World!\n"
+
+
+@pytest.mark.parametrize("path", SIMPLE_ARCHIVES)
+def test_feed_item(path):
+    """
+    Item contents can be passed to a sink without an intermediate copy.
+    """
+    with Archive(path) as archive:
+        hasher = hashlib.sha256()
+        archive[0].feed(hasher.update)
+        assert hasher.digest() == hashlib.sha256(b"Hello World!\n").digest()
+
+
+def test_extract_parallel(tmpdir):
+    """
+    Non-solid archives can be extracted by several worker processes.
+    """
+    temp_zip_path = os.path.join(tmpdir, "parallel.zip")
+    with ZipFile(temp_zip_path, "w") as temp_zip:
+        for index in range(64):
+            temp_zip.writestr(f"dir-{index % 4}/file-{index}", f"This is file {index}.")
+
+    dest_dir = os.path.join(tmpdir, "out")
+    progress = []
+    with Archive(temp_zip_path) as archive:
+        archive.extract(dest_dir, workers=2, progress=lambda done, total: progress.append((done, total)))
+
+    for index in range(64):
+        with open(os.path.join(dest_dir, f"dir-{index % 4}", f"file-{index}"), encoding="utf-8") as f:
+            assert f.read() == f"This is file {index}."
+    # Progress is reported once per partition, as each finishes.
+    assert len(progress) > 1
+    assert all(earlier[0] < later[0] for earlier, later in zip(progress, progress[1:]))
+    assert progress[-1][0] == progress[-1][1]
+
+
+def test_extract_parallel_restores_directories(tmpdir):
+    """
+    Directory metadata is restored once every worker has finished, so read-only directories still get all their files.
+    """
+    temp_tar_path = os.path.join(tmpdir, "parallel.tar")
+    with tarfile.open(temp_tar_path, "w") as tar:
+        info = tarfile.TarInfo("readonly")
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o555
+        info.mtime = 1_000_000_000
+        tar.addfile(info)
+        for index in range(64):
+            data = f"This is file {index}.".encode()
+            info = tarfile.TarInfo(f"readonly/file-{index}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    dest_dir = os.path.join(tmpdir, "out")
+    with Archive(temp_tar_path) as archive:
+        archive.extract(dest_dir, workers=2)
+
+    directory = os.path.join(dest_dir, "readonly")
+    try:
+        assert sorted(os.listdir(directory)) == sorted(f"file-{index}" for index in range(64))
+        assert os.stat(directory).st_mtime == 1_000_000_000
+        if os.name != "nt":
+            assert stat.S_IMODE(os.stat(directory).st_mode) == 0o555
+    finally:
+        os.chmod(directory, 0o755)
+
+
+@pytest.mark.parametrize("native_streams", (True, False))
+def test_read_bytes_bytearray(native_streams):
+    """
+    Contents are always read into a bytearray of their own, whichever streams decode them and whether or not they were cached.
+    """
+    with Archive("tests/simple.7z", native_streams=native_streams, content_cache=ContentCache()) as archive:
+        first = archive[0].read_bytes()
+        first[:5] = b"Jello"
+        second = archive[0].read_bytes()
+        assert type(first) is bytearray and type(second) is bytearray
+        assert second == b"Hello World!\n"
+        assert archive.content_cache.stats.hits == 1
+        assert all(type(data) is bytearray for _, data in archive.read_many(list(archive)))
+
+
+def test_read_many_complex():
+    """
+    Many items can be read with one pass over each solid block.
+    """
+    with Archive("tests/complex.7z") as archive:
+        files = [item for item in archive if not item.is_dir]
+        contents = archive.read_many(files)
+        assert sorted(item.index for item, _ in contents) == sorted(item.index for item in files)
+        for item, data in contents:
+            md = COMPLEX_MD.get(item.path)
+            if md:
+                assert data.decode("utf-8") == md.contents
+
+
+def test_read_many_interleaved_blocks(monkeypatch, tmpdir):
+    """
+    Batches are extracted in index order, even where block-less items sit between items of one solid block.
+    """
+    # Groups are ordered by their first item, so joining them can leave a batch unsorted.
+    groups = group_by_block([0, 1, 2, 3], {0: None, 1: 0, 2: None, 3: 0})
+    assert list(batch_groups(groups, {0: 0, 1: 10, 2: 0, 3: 10}, 1 << 20)) == [[0, 1, 3, 2]]
+
+    target = os.path.join(tmpdir, "interleaved.7z")
+    with ArchiveWriter(target, solid=True) as writer:
+        for index in range(8):
+            # Empty files have no block.
+            writer.add(f"file{index}.txt", f"This is file {index}.".encode() if index % 2 else b"")
+
+    # Whatever order 7-zip stored the items in, hand every batch over in reverse.
+    monkeypatch.setattr(lib7z.archive, "batch_groups", lambda groups, sizes, limit: iter([sorted(chain(*groups), reverse=True)]))
+    with Archive(target) as archive:
+        contents = archive.read_many(list(archive), max_batch_size=1)
+        assert sorted(item.index for item, _ in contents) == list(range(len(archive)))
+        for item, data in contents:
+            index = int(item.path[4:-4])
+            assert data == (f"This is file {index}.".encode() if index % 2 else b"")
+
+
+def test_path_index():
+    """
+    Paths are looked up, listed and globbed without regard to separators, and case folded if asked.
+    """
+    paths = ["data", "data/a.json", "data\\Sub\\b.JSON", "data/Sub/c.txt", "other/d.json", None]
+    is_dirs = [True, False, False, False, False, None]
+    index = PathIndex(paths, is_dirs, case_sensitive=False)
+    assert len(index) == 5
+    assert index.lookup("./DATA/sub/C.TXT") == 3
+    assert "data/sub" not in index and index.is_dir("data/sub")
+    assert "other" not in index and index.is_dir("other")
+    assert index.listdir() == ["data", "other"]
+    assert index.listdir("data") == ["a.json", "Sub"]
+    assert sorted(index.glob("**/*.json")) == [1, 2, 4]
+    assert sorted(index.glob("data/*")) == [1]
+    with pytest.raises(NotADirectoryError):
+        index.listdir("data/a.json")
+    with pytest.raises(FileNotFoundError):
+        index.listdir("missing")
+
+    index = PathIndex(paths, is_dirs, case_sensitive=True)
+    assert "DATA/a.json" not in index
+    assert sorted(index.glob("**/*.json")) == [1, 4]
+
+
+def test_archive_paths_complex():
+    """
+    Archive items can be found by path, listed by directory and globbed.
+    """
+    with Archive("tests/complex.7z") as archive:
+        assert J("complex", "hello.txt") in archive
+        assert "complex/missing.txt" not in archive
+        assert archive["complex/hello.txt"].read_text() == "Hello!"
+        with pytest.raises(FileNotFoundError):
+            archive["complex/missing.txt"]  # pylint: disable=pointless-statement
+        assert sorted(archive.listdir("complex")) == ["articles", "empty", "empty.txt", "goodbye.txt", "hello.txt"]
+        assert sorted(item.path for item in archive.glob("**/the *.txt")) == [
+            J("complex", "articles", "the definate article.txt"),
+            J("complex", "articles", "the indefinate article.txt"),
+        ]
+
+
+def test_listing_cache(tmpdir):
+    """
+    Cached listings answer metadata queries without opening a handler, which opens on demand.
+    """
+    with ListingCache(os.path.join(tmpdir, "listings.db")) as cache:
+        with Archive("tests/complex.7z", listing_cache=cache) as archive:
+            expected = [(item.path, item.is_dir, item.size, item.mtime, item.crc) for item in archive]
+
+        with Archive("tests/complex.7z", listing_cache=cache) as archive:
+            assert archive.stream is None
+            assert [(item.path, item.is_dir, item.size, item.mtime, item.crc) for item in archive] == expected
+            assert archive.snapshot().column("path")[0] == expected[0][0]
+            assert archive.stream is None
+            assert archive["complex/hello.txt"].read_text() == "Hello!"
+            assert archive.stream is not None
+
+        shutil.copy("tests/complex.7z", os.path.join(tmpdir, "copy.7z"))
+        with Archive(os.path.join(tmpdir, "copy.7z"), listing_cache=cache) as archive:
+            assert len(archive) == len(expected)
+        with open(os.path.join(tmpdir, "copy.7z"), "ab") as f:
+            f.write(b"\0")
+        with Archive(os.path.join(tmpdir, "copy.7z"), listing_cache=cache) as archive:
+            assert archive.stream is not None
+
+
+def test_content_cache():
+    """
+    Repeated reads are served from the content cache, within its byte budget.
+    """
+    cache = ContentCache(64, max_item_size=64)
+    with Archive("tests/complex.7z", content_cache=cache) as archive:
+        assert archive["complex/hello.txt"].read_text() == "Hello!"
+        assert archive["complex/hello.txt"].read_text() == "Hello!"
+        assert archive["complex/goodbye.txt"].read_bytes() == b"Goodbye!"
+        assert cache.stats == CacheStats(hits=1, misses=2, evictions=0, size=14, count=2)
+
+    with Archive("tests/complex.7z", content_cache=cache) as archive:
+        assert archive["complex/goodbye.txt"].read_bytes() == b"Goodbye!"
+        assert cache.hits == 2
+
+    cache = ContentCache(10, max_item_size=10)
+    with Archive("tests/complex.7z", content_cache=cache) as archive:
+        archive["complex/hello.txt"].read_bytes()
+        archive["complex/goodbye.txt"].read_bytes()
+        assert cache.stats == CacheStats(hits=0, misses=2, evictions=1, size=8, count=1)
+
+
+@pytest.mark.parametrize("path", SIMPLE_ARCHIVES)
+def test_read_range(path):
+    """
+    Byte ranges of items can be read, directly or by decoding up to the end of the range.
+    """
+    with Archive(path) as archive:
+        item = archive[0]
+        assert item.read_range(6, 5) == b"World"
+        assert item.read_range(0, 100) == b"Hello World!\n"
+        assert item.read_range(20, 5) == b""
+        assert item.read_range(3, 0) == b""
+        # The archive is free for other reads afterwards.
+        assert item.read_bytes() == b"Hello World!\n"
+
+
+@pytest.mark.parametrize("path", SIMPLE_ARCHIVES)
+def test_open_item_seek(path):
+    """
+    Item streams can seek forwards and backwards.
+    """
+    with Archive(path) as archive:
+        with archive[0].open() as f:
+            assert f.seekable()
+            f.seek(6)
+            assert f.read(5) == b"World"
+            f.seek(0)
+            assert f.read(5) == b"Hello"
+            f.seek(-2, os.SEEK_END)
+            assert f.read() == b"!\n"
+            assert f.tell() == 13
+
+
+def test_test_complex():
+    """
+    Items can be tested without writing them anywhere.
+    """
+    with Archive("tests/complex.7z") as archive:
+        results = archive.test()
+        assert sorted(results) == list(range(len(archive)))
+        assert set(results.values()) == {OperationResult.OK}
+
+    with Archive("tests/simple_crypt.7z", password="notthepass") as archive:
+        assert archive.test()[0] != OperationResult.OK
+
+
+def test_test_reported_results():
+    """
+    Per-item results reported through ReportExtractResult are kept; reports about no item or about blocks are not.
+    """
+    callback = ArchiveTestCallback(None)
+    message = callback.get_instance(IID_IArchiveExtractCallbackMessage2)
+    message.vtable.ReportExtractResult(message, EventIndexType.IN_ARC_INDEX, 3, OperationResult.CRC_ERROR)
+    message.vtable.ReportExtractResult(message, EventIndexType.NO_INDEX, 0, OperationResult.UNAVAILABLE)
+    message.vtable.ReportExtractResult(message, EventIndexType.BLOCK_INDEX, 1, OperationResult.DATA_ERROR)
+    assert callback.results == {3: OperationResult.CRC_ERROR}
+
+
+def test_test_parallel(tmpdir):
+    """
+    Non-solid archives can be tested by several worker processes.
+    """
+    temp_zip_path = os.path.join(tmpdir, "parallel.zip")
+    with ZipFile(temp_zip_path, "w") as temp_zip:
+        for index in range(64):
+            temp_zip.writestr(f"file-{index}", f"This is file {index}.")
+
+    progress = []
+    with Archive(temp_zip_path) as archive:
+        results = archive.test(workers=2, progress=lambda done, total: progress.append((done, total)))
+    assert results == {index: OperationResult.OK for index in range(64)}
+    assert len(progress) > 1
+    assert all(earlier[0] < later[0] for earlier, later in zip(progress, progress[1:]))
+    assert progress[-1][0] == progress[-1][1]
+
+
+def test_metrics_collector(tmpdir):
+    """
+    Opens, operations, items and callback time are reported to an instrument.
+    """
+    metrics = MetricsCollector()
+    with Archive("tests/complex.7z", instrument=metrics) as archive:
+        assert archive["complex/hello.txt"].read_text() == "Hello!"
+        archive.extract(tmpdir)
+
+    counters = metrics.as_dict()
+    assert counters["opens"]["7z"]["count"] == 1
+    assert counters["operations"]["read"]["count"] == 1
+    assert counters["operations"]["extract"]["count"] == 1
+    assert counters["items"]["count"] >= 2
+    assert counters["item_errors"] == 0
+    assert counters["callback_seconds"] > 0
+    text = metrics.to_prometheus()
+    assert 'lib7z_opens_total{format="7z",success="true"} 1' in text
+    assert 'lib7z_operations_total{kind="extract"} 1' in text
+
+
+def split_file(path, directory, num_volumes):
+    """Split `path` into `num_volumes` .001, .002, ... volumes in `directory`, and get their names."""
+    with open(path, "rb") as f:
+        data = f.read()
+    volume_size = len(data) // num_volumes + 1
+    names = [f"{os.path.basename(path)}.{number:03}" for number in range(1, num_volumes + 1)]
+    for index, name in enumerate(names):
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data[index * volume_size : (index + 1) * volume_size])
+    return names
+
+
+def read_files(archive):
+    return {item.path: item.read_bytes() for item in archive if not item.is_dir}
+
+
+@pytest.mark.parametrize("prefetch_volumes", [0, 2])
+def test_multi_volume(prefetch_volumes, tmpdir):
+    """
+    Split archives are opened from their first volume, with volumes found next to it or by a resolver.
+    """
+    with Archive("tests/complex.7z") as archive:
+        expected = read_files(archive)
+    names = split_file("tests/complex.7z", tmpdir, 3)
+
+    with Archive(os.path.join(tmpdir, names[0]), prefetch_volumes=prefetch_volumes) as archive:
+        assert archive.format.name == "7z"
+        assert [os.path.basename(path) for path in archive.volumes] == names
+        assert read_files(archive) == expected
+
+    # Volumes are only looked for where the resolver says.
+    moved = os.path.join(tmpdir, "moved")
+    os.mkdir(moved)
+    for name in names[1:]:
+        shutil.move(os.path.join(tmpdir, name), moved)
+    requested = []
+
+    def resolver(name):
+        requested.append(name)
+        path = os.path.join(moved, name)
+        return path if os.path.exists(path) else None
+
+    with Archive(os.path.join(tmpdir, names[0]), volume_resolver=resolver) as archive:
+        assert read_files(archive) == expected
+    assert requested[:2] == names[1:]
+
+
+def test_volume_prefetch(tmpdir):
+    """
+    Volumes are warmed one at a time ahead of decoding, not as the handler reads headers while opening.
+    """
+    source = os.path.join(tmpdir, "data.7z")
+    with ArchiveWriter(source, solid=False) as writer:
+        for index in range(5):
+            writer.add(f"file{index}.bin", os.urandom(64 << 10))
+    names = split_file(source, tmpdir, 5)
+    with Archive(os.path.join(tmpdir, names[0]), prefetch_volumes=1) as archive:
+        prefetcher = archive.open_callback.prefetcher
+        # Opening read the 7z header from the last volume, but decoding starts at the first.
+        assert [os.path.basename(path) for path in prefetcher.warmed] == names[1:2]
+        read_files(archive)
+        assert [os.path.basename(path) for path in prefetcher.warmed] == names[1:]
+
+
+@pytest.mark.parametrize("compression", [ZIP_STORED, ZIP_DEFLATED, "tar.gz"])
+def test_open_nested(compression, tmpdir):
+    """
+    Archives inside items are listed and read without extracting them first.
+    """
+    contents = {"a.txt": b"a" * 100000, "dir/b.txt": b"Hello World!\n"}
+    inner = io.BytesIO()
+    if compression == "tar.gz":
+        with tarfile.open(fileobj=inner, mode="w") as tar:
+            for name, data in contents.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        outer = os.path.join(tmpdir, "nested.tar.gz")
+        with open(outer, "wb") as f:
+            f.write(gzip.compress(inner.getvalue()))
+    else:
+        with ZipFile(inner, "w", ZIP_DEFLATED) as zf:
+            for name, data in contents.items():
+                zf.writestr(name, data)
+        outer = os.path.join(tmpdir, "nested.zip")
+        with ZipFile(outer, "w", compression) as zf:
+            zf.writestr("inner.zip", inner.getvalue())
+
+    with Archive(outer) as archive:
+        with archive.open_nested(None if compression == "tar.gz" else "inner.zip") as nested:
+            assert nested.format.name == ("tar" if compression == "tar.gz" else "zip")
+            assert {item.path.replace(os.sep, "/"): item.read_bytes() for item in nested if not item.is_dir} == contents
+            dest = os.path.join(tmpdir, "dest")
+            nested.extract(dest)
+            with open(os.path.join(dest, "dir", "b.txt"), "rb") as f:
+                assert f.read() == contents["dir/b.txt"]
+        # The outer archive is free again once the nested one is closed.
+        assert archive[0].read_bytes() == inner.getvalue()
+
+
+def test_open_nested_failure_releases_outer():
+    """
+    When the nested archive fails to open, the outer one is free for other extractions.
+    """
+    with Archive("tests/simple_crypt.7z", password="password") as archive:
+        with pytest.raises(RuntimeError):
+            archive.open_nested(0, password="notthepass")
+        assert archive[0].read_bytes() == b"Hello World!\n"
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import io
+
+import pytest
+
+from lib7z import codecs
+
+DATA = b"".join(b"%d: Hello World!\n" % line for line in range(10000))
+
+
+class FailingWriter(io.RawIOBase):
+    "Destination stream whose writes fail."
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        raise ValueError("disk full")
+
+
+@pytest.mark.parametrize("method", ["LZMA2", "LZMA", "Deflate", "BZip2", "PPMD"])
+def test_round_trip(method):
+    """
+    Raw streams decode with the properties of the encoder that wrote them.
+    """
+    with codecs.Compressor(method, level=9) as compressor:
+        packed = compressor.compress(DATA)
+    assert len(packed) < len(DATA)
+
+    assert codecs.decompress(packed, method, properties=compressor.properties, size=len(DATA)) == DATA
+    if method == "LZMA2":
+        assert codecs.decompress(codecs.compress(DATA, level=9), level=9) == DATA
+
+    dest = io.BytesIO()
+    with codecs.Decompressor(method, properties=compressor.properties) as decompressor:
+        decompressor.decompress_stream(io.BytesIO(packed), dest, size=len(DATA))
+    assert dest.getvalue() == DATA
+
+
+def test_compress_many():
+    """
+    One compressor packs many small buffers into independent streams.
+    """
+    buffers = [b"blob %d " % index * index for index in range(100)]
+    with codecs.Compressor("LZMA2", dictionary_size=1 << 20) as compressor:
+        packed = compressor.compress_many(buffers)
+        properties = compressor.properties
+    with codecs.Decompressor("LZMA2", properties=properties) as decompressor:
+        assert [decompressor.decompress(data) for data in packed] == buffers
+
+
+def test_filters_and_errors():
+    """
+    Filters round-trip in place; unknown methods and properties, multi-stream methods and corrupt data raise.
+    """
+    code = bytes(range(256)) * 64 + b"\xe8\x00\x01\x02\x03" * 100
+    filtered = codecs.compress(code, "BCJ")
+    assert codecs.decompress(filtered, "BCJ") == code
+
+    with pytest.raises(codecs.CodecError):
+        codecs.compress(DATA, "no such method")
+    with pytest.raises(codecs.CodecError):
+        codecs.compress(DATA, "BCJ2")
+    with pytest.raises(TypeError):
+        codecs.compress(DATA, no_such_property=1)
+    with pytest.raises(codecs.CodecError):
+        codecs.decompress(b"\x01garbage" * 100, "Deflate")
+
+
+def test_stream_write_errors():
+    """
+    Exceptions raised by the destination of a streamed operation are reported as the cause.
+    """
+    with codecs.Compressor("LZMA2") as compressor:
+        with pytest.raises(codecs.CodecError, match="disk full") as excinfo:
+            compressor.compress_stream(io.BytesIO(DATA), FailingWriter())
+    assert isinstance(excinfo.value.__cause__, ValueError)
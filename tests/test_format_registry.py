@@ -5,6 +5,8 @@
 Tests for lib7z.formats
 """
 
+import dataclasses
+
 import pytest
 
 import lib7z.format_registry
@@ -98,3 +100,67 @@ def test_format_multi_signature():
             return
 
     pytest.skip(msg="No multi-signature formats found in registry.")
+
+
+def test_signature_offsets():
+    """
+    Signature offsets are readable.
+    """
+    for fmt in lib7z.format_registry.formats:
+        assert fmt.signature_offset >= 0
+
+
+def test_signature_index_match():
+    """
+    The signature index ranks the 7z handler first for a 7z header.
+    """
+    index = lib7z.format_registry.formats.signature_index
+    with open("tests/simple.7z", "rb") as archive_file:
+        header = archive_file.read(index.header_size)
+    matches = index.match(header)
+    assert matches
+    assert matches[0].name == "7z"
+
+
+def test_signature_index_search():
+    """
+    Signatures of formats that may start anywhere are found past the fixed-offset header, within the search window.
+    """
+    index = lib7z.format_registry.formats.signature_index
+    assert index.search_size > index.header_size
+    with open("tests/simple.7z", "rb") as archive_file:
+        data = archive_file.read()
+    stub = b"\0" * (index.header_size + 1000)
+    assert "7z" in [fmt.name for fmt in index.search(stub + data)]
+    assert "7z" not in [fmt.name for fmt in index.search(b"\0" * index.search_size + data)]
+
+
+def test_registry_indexes():
+    """
+    Formats can be looked up by name, extension and class id.
+    """
+    formats = lib7z.format_registry.formats
+    for fmt in formats:
+        assert formats.by_name[fmt.name] is fmt
+        assert formats.by_clsid[fmt.clsid] is fmt
+        for extension in fmt.extensions:
+            assert fmt in formats.by_extension[extension.lower()]
+
+
+def test_format_info_is_immutable():
+    """
+    FormatInfo is read once and can't be modified.
+    """
+    fmt = lib7z.format_registry.formats[0]
+    assert lib7z.format_registry.formats[0] is fmt
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        fmt.name = "renamed"  # type: ignore
+
+
+def test_updatable_formats():
+    """
+    7z and zip archives can be written, but rar archives can't.
+    """
+    assert lib7z.format_registry.formats.by_name["7z"].updatable
+    assert lib7z.format_registry.formats.by_name["zip"].updatable
+    assert not lib7z.format_registry.formats.by_name["Rar"].updatable
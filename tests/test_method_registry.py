@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for lib7z.method_registry
+"""
+
+import pytest
+
+import lib7z.method_registry
+
+pytestmark = pytest.mark.skipif(
+    lib7z.method_registry._get_num_methods() == 0,  # pylint: disable=protected-access
+    reason="FFI reports no supported methods",
+)
+
+
+def test_iterate_methods():
+    """
+    Methods can be iterated over.
+    """
+    for method in lib7z.method_registry.methods:
+        assert method.name
+
+
+def test_method_indexes():
+    """
+    Methods can be looked up by name and id.
+    """
+    methods = lib7z.method_registry.methods
+    for method in methods:
+        assert methods.by_name[method.name].name == method.name
+        assert methods.by_id[method.id].id == method.id
+
+
+def test_lzma_has_codecs():
+    """
+    Well-known methods have encoder and decoder class ids.
+    """
+    lzma = lib7z.method_registry.methods.by_name["LZMA"]
+    assert lzma.encoder is not None
+    assert lzma.decoder is not None
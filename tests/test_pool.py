@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from lib7z.pool import ArchivePool
+
+
+def test_pool_reuses_handles():
+    """
+    Returned handles are lent out again instead of reopening the archive.
+    """
+    with ArchivePool(max_handles=2) as pool:
+        with pool.acquire("tests/simple.7z") as first:
+            pass
+        with pool.acquire("tests/simple.7z") as second:
+            assert second is first
+            with pool.acquire("tests/simple.7z") as third:
+                assert third is not first
+        assert len(pool) == 2
+    assert first.closed and third.closed
+
+
+def test_pool_threads():
+    """
+    Concurrent borrowers never share a handle, and the per-file limit holds.
+    """
+    with ArchivePool(max_handles=2) as pool:
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda _: pool.read_bytes("tests/simple.7z", 0), range(32)))
+        assert results == [b"Hello World!\n"] * 32
+        assert len(pool) <= 2
+
+
+def test_pool_limits_and_invalidation(tmpdir):
+    """
+    The least recently used idle handle is evicted when the pool is full, and changed files are reopened.
+    """
+    path = os.path.join(tmpdir, "copy.7z")
+    shutil.copy("tests/simple.7z", path)
+    with ArchivePool(max_open=1) as pool:
+        with pool.acquire(path) as first:
+            pass
+        with pool.acquire("tests/simple.zip") as other:
+            assert first.closed
+            assert other[0].read_bytes() == b"Hello World!\n"
+        assert len(pool) == 1
+
+        with pool.acquire(path) as before:
+            pass
+        # The idle handle keeps the file open, which rules out replacing it on Windows; changing its mtime works everywhere.
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        with pool.acquire(path) as after:
+            assert after is not before
+            assert after[0].read_bytes() == b"Hello World!\n"
+        assert before.closed
+
+        pool.invalidate(path)
+        assert after.closed
+        shutil.copy("tests/simple.zip", path + ".new")
+        os.replace(path + ".new", path)
+        with pool.acquire(path) as replaced:
+            assert replaced.format.name == "zip"
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from lib7z import Archive, ArchiveWriter
+from lib7z.archive import UpdateError
+
+
+def test_write_sources(tmpdir):
+    """
+    Bytes, paths, file objects and chunk iterables are all written, with their metadata.
+    """
+    source = os.path.join(tmpdir, "source.txt")
+    with open(source, "wb") as f:
+        f.write(b"from a file\n")
+    target = os.path.join(tmpdir, "out.7z")
+    mtime = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    with ArchiveWriter(target, level=9, threads=2) as writer:
+        writer.add("bytes.txt", b"Hello World!\n", mtime=mtime)
+        writer.add("dir/path.txt", source)
+        writer.add("dir/stream.txt", io.BytesIO(b"from a stream\n"))
+        writer.add("chunks.txt", (bytes([byte]) * 1000 for byte in range(256)))
+        writer.add_dir("empty")
+
+    with Archive(target) as archive:
+        assert archive.format.name == "7z"
+        assert archive["bytes.txt"].read_bytes() == b"Hello World!\n"
+        assert archive["bytes.txt"].mtime == mtime
+        assert archive["dir/path.txt"].read_bytes() == b"from a file\n"
+        assert archive["dir/stream.txt"].read_bytes() == b"from a stream\n"
+        assert archive["chunks.txt"].read_bytes() == b"".join(bytes([byte]) * 1000 for byte in range(256))
+        assert archive["empty"].is_dir
+
+
+@pytest.mark.parametrize("extension", ["7z", "zip", "tar"])
+def test_write_path_round_trip(extension, tmpdir):
+    """
+    A directory tree written by add_path extracts to the same files, in any writable format.
+    """
+    source = os.path.join(tmpdir, "tree")
+    os.makedirs(os.path.join(source, "sub"))
+    contents = {"a.txt": b"a" * 100000, os.path.join("sub", "b.txt"): b"b\n"}
+    for name, data in contents.items():
+        with open(os.path.join(source, name), "wb") as f:
+            f.write(data)
+
+    target = os.path.join(tmpdir, f"tree.{extension}")
+    with ArchiveWriter(target) as writer:
+        writer.add_path(source)
+
+    dest = os.path.join(tmpdir, "dest")
+    with Archive(target) as archive:
+        archive.extract(dest)
+    for name, data in contents.items():
+        with open(os.path.join(dest, "tree", name), "rb") as f:
+            assert f.read() == data
+
+
+def test_write_encrypted(tmpdir):
+    """
+    Encrypted archives can only be read back with the password.
+    """
+    target = os.path.join(tmpdir, "crypt.7z")
+    with ArchiveWriter(target, password="secret", encrypt_headers=False) as writer:
+        writer.add("secret.txt", b"Hello World!\n")
+
+    with Archive(target, password="secret") as archive:
+        assert archive[0].read_bytes() == b"Hello World!\n"
+
+
+def test_write_failures(tmpdir):
+    """
+    Failing sources and unknown formats raise UpdateError, and leave no file behind.
+    """
+
+    def failing():
+        yield b"partial"
+        raise ValueError("source failed")
+
+    target = os.path.join(tmpdir, "failed.7z")
+    writer = ArchiveWriter(target)
+    writer.add("failing.txt", failing())
+    with pytest.raises(UpdateError):
+        writer.close()
+    assert not os.path.exists(target)
+
+    with pytest.raises(UpdateError):
+        ArchiveWriter(target, "no such format")
+
+
+def test_update(tmpdir):
+    """
+    Updates add, replace and delete items, and copy the untouched ones as they were packed.
+    """
+    target = os.path.join(tmpdir, "update.7z")
+    with ArchiveWriter(target, solid=False) as writer:
+        writer.add("keep.txt", b"kept\n" * 1000)
+        writer.add("old.txt", b"old\n")
+        writer.add("dir/gone.txt", b"gone\n")
+        writer.add_dir("dir")
+
+    with Archive(target) as archive:
+        kept = archive["keep.txt"]
+        kept_props = (kept.crc, kept.pack_size, kept.mtime)
+        archive.update(add={"new.txt": b"new\n"}, replace={"old.txt": b"replaced\n"}, delete=["dir"])
+
+        assert sorted(item.path for item in archive) == ["keep.txt", "new.txt", "old.txt"]
+        kept = archive["keep.txt"]
+        assert (kept.crc, kept.pack_size, kept.mtime) == kept_props
+        assert archive["new.txt"].read_bytes() == b"new\n"
+        assert archive["old.txt"].read_bytes() == b"replaced\n"
+
+        with pytest.raises(FileExistsError):
+            archive.update(add={"keep.txt": b""})
+        with pytest.raises(FileNotFoundError):
+            archive.update(delete=["missing.txt"])
+    assert os.listdir(tmpdir) == ["update.7z"]